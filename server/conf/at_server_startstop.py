@@ -22,7 +22,14 @@ def at_server_start():
     This is called every time the server starts up, regardless of
     how it was shut down.
     """
-    pass
+    from world.space import snapshot
+    from world.space.engine import get_engine
+    from world.space.templates import compile_templates
+    compile_templates()
+    # Before the engine starts, so it re-arms from the snapshot. This runs
+    # on reloads as well as cold starts.
+    snapshot.restore()
+    get_engine()
 
 
 def at_server_stop():
@@ -30,7 +37,10 @@ def at_server_stop():
     This is called just before the server is shut down, regardless
     of it is for a reload, reset or shutdown.
     """
-    pass
+    from world.space import shards, snapshot, state
+    state.flush_all()
+    snapshot.save()
+    shards.stop()
 
 
 def at_server_reload_start():
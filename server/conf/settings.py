@@ -93,6 +93,28 @@ DEFAULT_CHANNELS = [
      "locks": "control:perm(Immortals);listen:perm(Admin);send:all()"}
 ]
 TYPECLASS_PATHS = ["typeclasses", "evennia", "evennia.contrib", "evennia.contrib.tutorial_examples", "world.space"]
+# Space system. 'numpy' evaluates the positions of all moving spaceobjs in
+# one array pass (requires numpy); 'python' evaluates them one at a time.
+SPACE_KINEMATICS_BACKEND = 'python'
+# Seconds ahead that sensor range crossings are predicted before each sensor
+# sweep is repeated.
+SPACE_SENSOR_HORIZON = 30.0
+# Worker processes that plan sensor crossings, each owning a share of the
+# space locations. 0 plans them in the server process.
+SPACE_SHARDS = 0
+# Threads that run big sensor sweeps and contact reports off the reactor.
+# 0 runs them inline.
+SPACE_OFFLOAD_THREADS = 2
+# Ticks between batch writes of cached position, speed, heading, course and
+# system power levels. Pending changes are also written on stop and reload.
+SPACE_STATE_FLUSH_INTERVAL = 30
+# Only run sensors for spaceobjs someone is watching (a manned console or a
+# player aboard), and steer turning ships in empty sectors in coarse steps.
+SPACE_INTEREST_MANAGEMENT = True
+# Ticks between binary snapshots of the space state, restored on start so
+# reloads don't read every spaceobj's attributes. Snapshots are also taken
+# on stop and reload; 0 takes them only then.
+SPACE_SNAPSHOT_INTERVAL = 300
 GAME_INDEX_LISTING = {
     'game_status': 'pre-alpha',
     # Optional, comment out or remove if N/A
@@ -10,6 +10,7 @@ creation commands.
 from evennia import DefaultCharacter
 from evennia.utils import lazy_property
 from world.traits import TraitHandler
+from world.space import interest
 
 class Character(DefaultCharacter):
     """
@@ -47,6 +48,21 @@ class Character(DefaultCharacter):
     def unfindable(self):
         return self.db.hidden
 
+    def at_after_move(self, source_location, **kwargs):
+        super(Character, self).at_after_move(source_location, **kwargs)
+        # Boarding or leaving a ship changes who is watching it.
+        interest.refresh_room(source_location)
+        interest.refresh_room(self.location)
+
+    def at_post_puppet(self, **kwargs):
+        super(Character, self).at_post_puppet(**kwargs)
+        interest.refresh_room(self.location)
+
+    def at_post_unpuppet(self, account, session=None, **kwargs):
+        location = self.location
+        super(Character, self).at_post_unpuppet(account, session=session, **kwargs)
+        interest.refresh_room(location)
+
     def at_before_move(self, destination):
         """
         Called just before starting to move this object to
@@ -64,9 +80,11 @@ class Character(DefaultCharacter):
 
         """
         if self.db.console:
-            self.msg('You unman %s.' % self.db.console)
-            self.db.console.db.operator = None
+            console = self.db.console
+            self.msg('You unman %s.' % console)
+            console.db.operator = None
             self.db.console = None
+            console.update_bus()
         return True
     def announce_move_from(self, destination, msg=None, mapping=None):
         """
@@ -113,6 +131,7 @@ class Character(DefaultCharacter):
     def man(self, console):
         self.db.console = console
         console.db.operator = self
+        console.update_bus()
         self.db.doing.append('manning %s' % console)
         self.notify_location('You man %s.' %
                              console, '%s mans %s.' % (self, console))
@@ -122,6 +141,7 @@ class Character(DefaultCharacter):
         self.db.doing.remove('manning %s' % console)
         del console.db.operator
         del self.db.console
+        console.update_bus()
         self.notify_location('You unman %s.' % console,
                              'location: %s unmans %s.' % (self, console))
 
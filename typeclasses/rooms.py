@@ -7,6 +7,7 @@ Rooms are simple containers that has no location of their own.
 
 from evennia import DefaultRoom
 from evennia.utils.utils import inherits_from
+from world.space import links
 
 def to_english(list):
     if len(list) == 0:
@@ -32,6 +33,10 @@ class Room(DefaultRoom):
     def at_object_creation(self):
         self.db.spaceobj = None
 
+    def at_object_delete(self):
+        links.detach(self, links.ROOM)
+        return True
+
     def return_appearance(self, looker):
         from evennia.utils import pad
         """
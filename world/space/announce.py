@@ -0,0 +1,105 @@
+"""
+Space channel announcements
+
+Everything the space system tells staff goes to the Space channel through
+`announce()`. The channel is looked up once and cached, instead of one
+`search_channel` query per message.
+
+Announcements are also rate limited. The first one in a quiet spell goes
+out at once and opens a window of `ANNOUNCE_INTERVAL` seconds; anything
+announced while the window is open is queued and sent as one channel
+message when it closes. Within that message, runs of more than
+`SUMMARY_THRESHOLD` announcements of the same kind collapse into a single
+summary line, so attaching a deck full of consoles or spawning a fleet
+produces a couple of lines rather than hundreds.
+"""
+from collections import OrderedDict
+from evennia import search_channel
+from evennia.utils import delay, logger
+
+CHANNEL_KEY = 'Space'
+# Seconds announcements are collected for after one has been sent.
+ANNOUNCE_INTERVAL = 2.0
+# More announcements of one kind than this per window become a summary.
+SUMMARY_THRESHOLD = 3
+# Subjects named in a summary line before it just counts the rest.
+SUMMARY_NAMES = 5
+
+_CHANNEL = []
+# summary -> [(message, subject)], in the order the kinds first appeared.
+_PENDING = OrderedDict()
+_WINDOW = [False]
+
+
+def get_channel():
+    """Return the Space channel, looking it up only when the cached handle
+    is missing or has been deleted."""
+    if _CHANNEL and _CHANNEL[0].pk:
+        return _CHANNEL[0]
+    del _CHANNEL[:]
+    found = search_channel(CHANNEL_KEY)
+    if not found:
+        logger.log_err("Space channel '%s' not found." % CHANNEL_KEY)
+        return None
+    _CHANNEL.append(found[0])
+    return found[0]
+
+
+def send(message):
+    """Send `message` to the Space channel straight away."""
+    channel = get_channel()
+    if channel is not None:
+        channel.msg(message)
+
+
+def announce(message, summary=None, subject=None):
+    """Announce `message` on the Space channel.
+    Args:
+        message (str): the full announcement
+        summary (str): what a burst of announcements like this one is, e.g.
+            'consoles attached'; announcements sharing it are summarized
+            together. Defaults to the message itself.
+        subject (str): what the announcement is about, named in summaries
+    """
+    if not _WINDOW[0]:
+        _WINDOW[0] = True
+        send(message)
+        delay(ANNOUNCE_INTERVAL, flush)
+        return
+    _PENDING.setdefault(summary or message, []).append((message, subject))
+
+
+def flush():
+    """Send everything queued as one message and keep the window open for
+    another interval, or close it if nothing was queued.
+    Returns:
+        (int): number of announcements sent
+    """
+    if not _PENDING:
+        _WINDOW[0] = False
+        return 0
+    pending = list(_PENDING.items())
+    _PENDING.clear()
+    lines = []
+    sent = 0
+    for summary, entries in pending:
+        sent += len(entries)
+        if len(entries) <= SUMMARY_THRESHOLD:
+            lines.extend(message for message, subject in entries)
+        else:
+            lines.append(summarize(summary, entries))
+    send('\n'.join(lines))
+    delay(ANNOUNCE_INTERVAL, flush)
+    return sent
+
+
+def summarize(summary, entries):
+    """One line standing for all of `entries`."""
+    subjects = [str(subject) for message, subject in entries if subject]
+    line = '%d %s' % (len(entries), summary)
+    if subjects:
+        named = ', '.join(subjects[:SUMMARY_NAMES])
+        if len(subjects) > SUMMARY_NAMES:
+            named += ' and %d more' % (len(subjects) - SUMMARY_NAMES)
+        line += ': ' + named
+    return line + '.'
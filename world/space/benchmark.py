@@ -0,0 +1,248 @@
+"""
+Space benchmark
+
+Offline benchmark of the space simulation's hot paths. It runs the real
+world/space code - typeclasses, templates, SystemHandler, state cache,
+spatial index, engine phases - on the stand-ins for Evennia, Django and
+Twisted in world/space/tests/standins.py, whose objects keep their `db`,
+`ndb` and `attributes` in plain dicts. It needs neither a running server
+nor an Evennia install, runs on Python 2 and 3, and never touches the game
+database.
+
+For each fleet size it spawns that many ships from the templates in
+world/space/templates.py, scatters them through one sector at a constant
+density, gives every ship a new heading, speed and sensor power setting and
+then runs the engine for a number of ticks on a simulated clock that advances
+one engine interval per tick, so timed events fire as they would live. It
+reports:
+
+    spawn       seconds to spawn and initialize the fleet
+    memory      bytes allocated per ship while spawning (tracemalloc, so
+                Python 3 only; blank on Python 2)
+    ticks/s     engine ticks per second with the whole fleet active
+    scan        mean microseconds per full sensor sweep and prediction
+                of the observed ships
+    writes      attribute writes per tick, flush included
+
+`--observed` sets the share of the fleet treated as watched by a player
+(see world/space/interest.py); the rest have their sensors asleep.
+
+Per-phase timings come from the tick profiler, so they are the same numbers
+`@spacestat` shows on a live game.
+
+Usage (from the game directory):
+    python -m world.space.benchmark
+    python -m world.space.benchmark --sizes 10,100,1000 --ticks 50
+    python -m world.space.benchmark --backend numpy --json bench.json
+    python -m world.space.benchmark --observed 0.1
+"""
+import argparse
+import json
+import random
+import sys
+from timeit import default_timer
+from world.space.tests import standins
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+DEFAULT_TICKS = 20
+# Ships per cubic light second. Sensor sweep cost depends on how many ships
+# share a sensor bubble, so the sector grows with the fleet to keep it fixed.
+DEFAULT_DENSITY = 1000.0
+# Share of the fleet watched by players.
+DEFAULT_OBSERVED = 1.0
+
+
+#------------------------------------------------------------
+#
+# Scenario
+#
+#------------------------------------------------------------
+
+def spawn(ship_class, count, sector, density, rng):
+    """Create `count` ships of `ship_class` in `sector` with their template
+    systems. The stand-in constructor skips at_object_creation, so nothing
+    is announced."""
+    from world.space.templates import SHIP_TEMPLATES, apply_template
+    from world.space.utils import Vector3, head2course
+    from world.space import links, spatial
+    side = (count / density) ** (1.0 / 3)
+    ships = []
+    for i in range(count):
+        ship = ship_class('Ship %d' % i, sector)
+        db = ship.db
+        db.heading = {'xy': 0, 'z': 0}
+        db.d_heading = {'xy': 0, 'z': 0}
+        db.speed = 0.0
+        db.d_speed = 0.0
+        db.course = head2course(0, 0)
+        db.pos = Vector3(rng.uniform(0, side), rng.uniform(0, side),
+                         rng.uniform(0, side))
+        apply_template(ship, SHIP_TEMPLATES[i % len(SHIP_TEMPLATES)])
+        for key in ('reactor', 'core', 'sensors', 'power_grid'):
+            system = ship.systems.get(key)
+            system.set_power = system.current_power = system.max_power
+        links.register(ship)
+        spatial.update_position(ship)
+        ships.append(ship)
+    return ships
+
+
+def drive(ships, rng):
+    """Give every ship a new heading and speed, and move its sensor power
+    so the power phase has ramps to schedule."""
+    from world.space.systems import UpdatePower, UpdateSensors
+    for ship in ships:
+        UpdateSensors(ship)
+        ship.setheading((rng.uniform(0, 360), rng.uniform(-90, 90)))
+        ship.setspeed(rng.uniform(10, ship.maxspeed()))
+        sensors = ship.systems.sensors
+        sensors.set_power = rng.uniform(sensors.min_power, sensors.max_power)
+        UpdatePower(ship)
+
+
+def run_size(count, ticks=DEFAULT_TICKS, density=DEFAULT_DENSITY, seed=0,
+             observed=DEFAULT_OBSERVED):
+    """Benchmark one fleet size.
+    Returns:
+        (dict): measurements, including the full tick profile
+    """
+    from evennia import create_script
+    from typeclasses.objects import Object
+    from world.space import engine as engine_module
+    from world.space import interest, links, snapshot, spatial, state
+    from world.space.objects import Ship
+    from world.space.profiler import get_profiler
+    from world.space.systems import UpdateSensors
+    rng = random.Random(seed)
+    clock = [0.0]
+    engine_module.set_clock(lambda: clock[0])
+    engine = create_script(engine_module.SpaceEngine, key=engine_module.ENGINE_KEY)
+    engine_module._ENGINE = engine
+    sector = Object('Sector')
+
+    memory = None
+    if tracemalloc is not None:
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+    started = default_timer()
+    ships = spawn(Ship, count, sector, density, rng)
+    # Half away from zero, as round() does on Python 2 but not on 3.
+    watched = ships[:int(count * observed + 0.5)]
+    for ship in watched:
+        interest.watch(ship)
+    drive(ships, rng)
+    spawned = default_timer() - started
+    if tracemalloc is not None:
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+    profiler = get_profiler()
+    profiler.reset()
+    # Flush once per run so the writes column includes a batch flush.
+    flush_interval = state.FLUSH_INTERVAL
+    state.FLUSH_INTERVAL = ticks
+    # Let every tick finish its step, however long it takes, so the runs
+    # measure the same work.
+    frame_budget = engine_module.FRAME_BUDGET
+    engine_module.FRAME_BUDGET = None
+    # The benchmark's ships have no business in a snapshot.
+    snapshot_interval = snapshot.SNAPSHOT_INTERVAL
+    snapshot.SNAPSHOT_INTERVAL = 0
+    started = default_timer()
+    try:
+        for tick in range(ticks):
+            clock[0] += engine.interval
+            engine.at_repeat()
+    finally:
+        state.FLUSH_INTERVAL = flush_interval
+        engine_module.FRAME_BUDGET = frame_budget
+        snapshot.SNAPSHOT_INTERVAL = snapshot_interval
+    elapsed = default_timer() - started
+    profile = profiler.as_dict()
+
+    started = default_timer()
+    for ship in watched:
+        UpdateSensors(ship)
+    scan = default_timer() - started
+
+    result = {'ships': count,
+              'ticks': ticks,
+              'spawn_s': spawned,
+              'memory_per_ship': None if memory is None else float(memory) / count,
+              'ticks_per_s': ticks / elapsed if elapsed else 0.0,
+              'observed': len(watched),
+              'scan_us': scan * 1e6 / len(watched) if watched else 0.0,
+              'writes_per_tick': profile['db_writes']['per_tick'],
+              'profile': profile}
+
+    state.flush_all()
+    for ship in ships:
+        links.forget(ship)
+        interest.forget(ship)
+        snapshot.forget(ship)
+    spatial.drop_index(sector)
+    interest.drop_sector(sector)
+    engine_module._ENGINE = None
+    engine_module.set_clock()
+    standins.reset()
+    return result
+
+
+def run(sizes=DEFAULT_SIZES, ticks=DEFAULT_TICKS, density=DEFAULT_DENSITY,
+        seed=0, out=sys.stdout, observed=DEFAULT_OBSERVED):
+    """Benchmark every fleet size in `sizes`, printing a table to `out`.
+    Returns:
+        (list): one result dict per size, see `run_size`
+    """
+    results = []
+    out.write('%8s %10s %14s %10s %10s %10s\n' % (
+        'Ships', 'Spawn s', 'Bytes/ship', 'Ticks/s', 'Scan us', 'Writes/t'))
+    for count in sizes:
+        result = run_size(count, ticks, density, seed, observed)
+        results.append(result)
+        memory = result['memory_per_ship']
+        out.write('%8d %10.2f %14s %10.2f %10.2f %10.1f\n' % (
+            count, result['spawn_s'], '' if memory is None else '%.0f' % memory,
+            result['ticks_per_s'], result['scan_us'],
+            result['writes_per_tick']))
+        out.flush()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the space simulation without a server.')
+    parser.add_argument('--sizes', default=','.join(str(n) for n in DEFAULT_SIZES),
+                        help='comma separated fleet sizes')
+    parser.add_argument('--ticks', type=int, default=DEFAULT_TICKS,
+                        help='engine ticks to run per fleet size')
+    parser.add_argument('--density', type=float, default=DEFAULT_DENSITY,
+                        help='ships per cubic light second')
+    parser.add_argument('--backend', choices=('python', 'numpy'),
+                        help='override SPACE_KINEMATICS_BACKEND')
+    parser.add_argument('--observed', type=float, default=DEFAULT_OBSERVED,
+                        help='share of the fleet watched by players, 0 to 1')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args(argv)
+
+    settings = {}
+    if args.backend:
+        settings['SPACE_KINEMATICS_BACKEND'] = args.backend
+    standins.install(**settings)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = run(sizes, args.ticks, args.density, args.seed,
+                  observed=args.observed)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+    main()
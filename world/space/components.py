@@ -38,8 +38,8 @@ class TemplateException(Exception):
     def __init__(self, msg):
         self.msg = msg
 
-SHIP_TEMPLATES = ('galaxy')
-STATION_TEMPLATES = ('')
+SHIP_TEMPLATES = ('galaxy',)
+STATION_TEMPLATES = ()
 
 ALL_TEMPLATES = (SHIP_TEMPLATES + STATION_TEMPLATES)
 
@@ -58,7 +58,7 @@ def apply_template(spaceobj, template, reset=False):
     spaceobj.db.spaceframe = template.name
     if reset:
         spaceobj.systems.clear()
-    for key, kwargs in template.systems.iteritems():
+    for key, kwargs in template.systems.items():
         spaceobj.systems.add(key, **kwargs)
 
 def load_template(template):
@@ -82,7 +82,7 @@ class Template(object):
             'core': {'type': 'producer', 'name': 'Core', 'extra': {}},
             'ftl_engines': {'name': 'FTL Engines', 'extra': {}},
             'sublight_engines': {'name': 'Sublight Engines', 'extra': {}},
-            'sensors': {'name': 'Sensors', 'extra': ({'contacts': {}})},
+            'sensors': {'name': 'Sensors', 'extra': {}},
             'beam_control': {'name': 'Beam Control', 'extra': {}},
             'torpedo_control': {'name': 'Torpedo Control', 'extra': {}},
             'shield_manager': {'name': 'Shield Manager', 'extra': {}},
@@ -68,6 +68,7 @@ class CmdMode(Command):
             if mode == 'diagnostic':
                 self.obj.cmdset.delete(DiagnosticConsole)
             self.obj.db.current_modes.remove(str(mode))
+        self.obj.update_bus()
         self.caller.msg('%s mode %s %s console.' % (
             'added' if oper == 'add' else 'removed', mode, 'to' if oper == 'add' else 'from'))
 
@@ -84,4 +85,5 @@ class HelmConsole(CmdSet):
         self.add(CmdNavset())
         self.add(CmdNavstat())
         self.add(CmdSrep())
+        self.add(CmdSensorWatch())
         self.add(CmdLand())
@@ -1,8 +1,11 @@
 from evennia import Command, utils
+from evennia.utils import logger
 #from evennia.utils import search
 #from objects import *
 import re
 from world.space.objects import *
+from world.space import display, links
+from world.space.display import format_contact, sensor_footer, sensor_header
 from evennia.utils.utils import inherits_from
 
 class CmdMan(Command):
@@ -109,7 +112,7 @@ class CmdNavset(Command):
                     console.notify(
                         "You cannot exceed 120% of the maximum rated setting.")
                     return
-                cspeed = spaceobj.db.speed
+                cspeed = spaceobj.speed()
                 mspeed = spaceobj.maxspeed()
                 dspeed = round(mspeed * (self.args / 100), 2)
                 if dspeed == cspeed:
@@ -126,7 +129,7 @@ class CmdNavset(Command):
             if match:
                 heading = [round(float(match.group(1)), 2),
                            round(float(match.group(3)), 2)]
-                if heading[0] == spaceobj.db.heading['xy'] and heading[1] == spaceobj.db.heading['z']:
+                if heading == spaceobj.heading():
                     console.notify("The ship is already heading %s." %
                                    format_bearing(heading))
                     return
@@ -141,8 +144,9 @@ class CmdNavset(Command):
             match = re.match(
                 "^([-\+]?\d+(\.\d+)?)([-\+]\d+(\.\d+)?)$", self.args)
             if match:
-                heading = [(round(float(match.group(1)), 2) + spaceobj.db.heading['xy'] + 360) %
-                           360, (round(float(match.group(3)), 2) + spaceobj.db.heading['z'] + 360) % 360]
+                current = spaceobj.heading()
+                heading = [(round(float(match.group(1)), 2) + current[0] + 360) %
+                           360, (round(float(match.group(3)), 2) + current[1] + 360) % 360]
                 console.notify("Bringing the ship to %s." %
                                format_bearing(heading), cmode)
                 spaceobj.setheading(heading)
@@ -204,28 +208,59 @@ class CmdSrep(Command):
         if not spaceobj.systems.sensors.online():
             self.caller.db.console.notify("Sensors are offline.")
             return
-        header = '|[B|w[|ySensor Report|w]|n Max Range: {}\n'.format(format_distance(spaceobj.sensor_range()))
-        header += '|C-' * 78 + '\n' + '|c%1s %-20s %-22s %-14s%-12s %-7s' % (
-            'T', 'Contact', 'ID', 'Bearing', 'Range', 'Speed') + '\n' + '|C-' * 78
-        sort_list = sorted(spaceobj.systems.sensors.contacts.keys(), key=lambda o:o.dist3d(self.obj.db.spaceobj))
-        contacts = ''
-        for contact in sort_list:
-            try:
-                contacts += '\n%1s |w%-20s|n %-22s%-15s |n%-12s |n%-7s' % (contact.tflag(),
-                                                                           contact.name, "[" + contact.name + "]",
-                                                                           format_heading(spaceobj.bearing_to(
-                                                                               contact)),
-                                                                           format_distance(spaceobj.dist3d(
-                                                                               contact)),
-                                                                           contact.db.speed)
-            except:
-                # if we can't run that, it shouldn't be in here!
-                self.caller.msg("Error!")
-                del spaceobj.db.contacts[contact]
-        if not contacts:
-            contacts = "\n|rNo contacts|n"
-        footer = '\n' + '|C-' * 78
-        self.caller.msg(header + contacts + footer)
+        header = sensor_header(spaceobj)
+        caller = self.caller
+
+        contacts = get_contacts(spaceobj)
+
+        def report(solution):
+            rows = []
+            for contact, distance, bearing, _ in zip(*solution):
+                contacts.note(contact, distance, bearing)
+                rows.append('\n' + format_contact(contact, distance, bearing))
+            rows = ''.join(rows)
+            if not rows:
+                rows = "\n|rNo contacts|n"
+            caller.msg(header + rows + sensor_footer())
+
+        # Large contact lists are solved and sorted off the reactor.
+        deferred = spaceobj.contact_solution_deferred(contacts.objects())
+        deferred.addCallback(report).addErrback(
+            lambda failure: logger.log_err("srep failed for %s:\n%s" % (
+                spaceobj, failure.getTraceback())))
+
+class CmdSensorWatch(Command):
+    """
+    Usage:
+        sensorwatch || sensorwatch off
+
+    Keeps the sensor report on your screen: shows the full report once,
+    then every few seconds only what changed - new contacts (+), lost
+    contacts (-), and contacts that moved noticeably (~).
+    """
+    key = 'sensorwatch'
+    aliases = 'swatch'
+    locks = 'cmd:is_operator()'
+    help_category = 'Console'
+
+    def func(self):
+        console = self.obj
+        if self.args.strip() == 'off':
+            if display.unsubscribe(console):
+                console.notify("Live sensor display stopped.")
+            else:
+                console.notify("No live sensor display to stop.")
+            return
+        spaceobj = links.spaceobj_of(console)
+        if not spaceobj:
+            console.notify("This console isn't connected to anything.")
+            return
+        if not spaceobj.systems.sensors.online():
+            console.notify("Sensors are offline.")
+            return
+        if not display.subscribe(console, spaceobj):
+            # Nobody mans it as far as the bus knows; tell the caller.
+            self.caller.msg("You're not manning this console.")
 
 class CmdEngstat(Command):
     key = 'engstat'
@@ -243,11 +278,11 @@ class CmdEngstat(Command):
                 string = "|x{}: |RDESTROYED\n".format(system.name)
             else:
                 string = "{}{}:|n {} / {}\n".format('|w' if system.online() else '|R', system.name, system.current_power, system.max_power)
-            if system._data['type'] == 'producer':
+            if system.type == 'producer':
                 producers += string
-            elif system._data['type'] == 'router':
+            elif system.type == 'router':
                 routers += string
-            elif system._data['type'] == 'consumer':
+            elif system.type == 'consumer':
                 consumers += string
         #for system in systems:
             #string += "{}: {} / {} ({})".format(system.name, system.actual, system.max, system.percent)
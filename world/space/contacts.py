@@ -0,0 +1,135 @@
+"""
+Sensor contacts
+
+What each spaceobj's sensors can currently see, kept in memory only.
+Contacts change every time a ship crosses somebody's sensor range, and all
+of it can be worked out again from positions and sensor ranges, so writing
+it to the database bought nothing but writes.
+
+Each observer has a ContactTable of compact Contact records keyed by the
+contact's dbref, holding when it was first seen, its quality and the range
+and bearing it was last reported at:
+
+    contacts = get_contacts(spaceobj)
+    if ship in contacts:
+        contacts.get(ship).range
+
+A second index, contact -> observers, lets a deleted spaceobj be dropped
+from every table that holds it without looking at any other ship.
+
+Tables start empty after a reload; the sensor sweeps the engine runs when
+it starts (see UpdateSensors in world/space/systems.py) fill them again.
+"""
+
+# observer -> ContactTable
+_TABLES = {}
+# contact dbref -> set of observers whose tables hold it
+_SEEN_BY = {}
+
+
+def get_contacts(observer):
+    """Return the ContactTable of `observer`, creating it on first use."""
+    table = _TABLES.get(observer)
+    if table is None:
+        table = _TABLES[observer] = ContactTable(observer)
+        # Contacts used to be kept in the sensors' persistent extra data.
+        sensors = observer.systems.sensors
+        if sensors is not None and hasattr(sensors, 'contacts'):
+            del sensors.contacts
+    return table
+
+
+def drop_contacts(obj):
+    """Forget `obj` as an observer and as a contact, e.g. when it is
+    deleted.
+    Returns:
+        (list): observers that had `obj` as a contact
+    """
+    table = _TABLES.pop(obj, None)
+    if table is not None:
+        table.clear()
+    observers = list(_SEEN_BY.get(obj.id, ()))
+    for observer in observers:
+        _TABLES[observer].lose(obj)
+    return observers
+
+
+class Contact(object):
+    """
+    One spaceobj seen by one observer.
+    Args:
+        obj (SpaceObject): the spaceobj seen
+        first_seen (float): simulation time it was first seen
+        quality (int): how good the sensor lock is, 0-100
+        range (float): distance when last measured
+    """
+    __slots__ = ('obj', 'dbref', 'first_seen', 'quality', 'range', 'bearing')
+
+    def __init__(self, obj, first_seen, quality=100, range=None):
+        self.obj = obj
+        self.dbref = obj.id
+        self.first_seen = first_seen
+        self.quality = quality
+        self.range = range
+        self.bearing = None
+
+
+class ContactTable(object):
+    """
+    The contacts of one observer. Membership tests take the spaceobj;
+    iterating gives the contact spaceobjs, as a snapshot, so contacts can
+    be gained and lost while walking it.
+    """
+    __slots__ = ('observer', 'records')
+
+    def __init__(self, observer):
+        self.observer = observer
+        self.records = {}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, obj):
+        return obj.id in self.records
+
+    def __iter__(self):
+        return iter(self.objects())
+
+    def get(self, obj):
+        """The Contact record for `obj`, or None."""
+        return self.records.get(obj.id)
+
+    def objects(self):
+        """The contact spaceobjs, as a list."""
+        return [record.obj for record in self.records.values()]
+
+    def gain(self, obj, at, range=None):
+        """Add `obj`, first seen at time `at`. Returns its record."""
+        record = self.records.get(obj.id)
+        if record is None:
+            record = self.records[obj.id] = Contact(obj, at, range=range)
+            _SEEN_BY.setdefault(obj.id, set()).add(self.observer)
+        return record
+
+    def lose(self, obj):
+        """Remove `obj`. Returns its record, or None if it wasn't held."""
+        record = self.records.pop(obj.id, None)
+        if record is not None:
+            observers = _SEEN_BY.get(obj.id)
+            if observers is not None:
+                observers.discard(self.observer)
+                if not observers:
+                    del _SEEN_BY[obj.id]
+        return record
+
+    def note(self, obj, range, bearing=None):
+        """Remember the range and bearing `obj` was last reported at."""
+        record = self.records.get(obj.id)
+        if record is not None:
+            record.range = range
+            if bearing is not None:
+                record.bearing = bearing
+
+    def clear(self):
+        for obj in self.objects():
+            self.lose(obj)
@@ -0,0 +1,234 @@
+"""
+Live sensor display
+
+`fullscan`/`srep` builds and sends the whole sensor table every time it is
+typed, and helm operators type it over and over to watch contacts move. A
+console can instead subscribe to a live view (the `sensorwatch` command):
+its operator gets the full table once, then every `DISPLAY_INTERVAL`
+seconds of simulation time only the rows that changed -
+
+    + a new contact
+    - a lost contact
+    ~ a contact whose range changed by more than `RANGE_CHANGE` (as a
+      fraction) or whose bearing moved more than `BEARING_CHANGE` degrees
+      since the operator was last sent it
+
+and nothing at all when nothing did. Each spaceobj with subscribers has one
+SensorView, which solves and sorts its contacts once per frame however many
+consoles watch it, and formats a row only when some console is sent it, at
+most once per frame.
+
+Frames run as space engine timers, so their output is batched with
+everything else the tick tells an operator. Subscriptions live in memory
+only and end on reload, when the console is unmanned, or when the sensors
+go offline.
+"""
+from evennia.utils import logger
+from world.space.contacts import get_contacts
+from world.space.engine import get_engine, now
+from world.space.notify import post
+from world.space.utils import format_distance, format_heading
+
+# Simulation seconds between frames of a live display.
+DISPLAY_INTERVAL = 2.0
+# A contact's row is re-sent once its range has changed by this fraction...
+RANGE_CHANGE = 0.01
+# ...or its bearing by this many degrees.
+BEARING_CHANGE = 0.5
+WIDTH = 78
+
+# spaceobj -> SensorView
+_VIEWS = {}
+
+
+def sensor_header(spaceobj, title='Sensor Report'):
+    """Title and column headings of the sensor table."""
+    header = '|[B|w[|y{}|w]|n Max Range: {}\n'.format(
+        title, format_distance(spaceobj.sensor_range()))
+    return header + '|C-' * WIDTH + '\n' + '|c%1s %-20s %-22s %-14s%-12s %-7s' % (
+        'T', 'Contact', 'ID', 'Bearing', 'Range', 'Speed') + '\n' + '|C-' * WIDTH
+
+
+def sensor_footer():
+    return '\n' + '|C-' * WIDTH
+
+
+def format_contact(contact, distance, bearing):
+    """One row of the sensor table."""
+    return '%1s |w%-20s|n %-22s%-15s |n%-12s |n%-7s' % (
+        contact.tflag(), contact.name, "[" + contact.name + "]",
+        format_heading(bearing), format_distance(distance), contact.speed())
+
+
+def subscribe(console, spaceobj):
+    """Start the live sensor display of `spaceobj` on `console`.
+    Returns:
+        (bool): False if `console` isn't manned
+    """
+    unsubscribe(console)
+    if spaceobj.bus.operator(console) is None:
+        return False
+    view = _VIEWS.get(spaceobj)
+    if view is None:
+        view = _VIEWS[spaceobj] = SensorView(spaceobj)
+    view.subscribe(console)
+    return True
+
+
+def unsubscribe(console):
+    """Stop the live display on `console`.
+    Returns:
+        (bool): True if it had one
+    """
+    for view in list(_VIEWS.values()):
+        if view.unsubscribe(console):
+            return True
+    return False
+
+
+def subscribed(console):
+    """True if `console` shows a live display."""
+    return any(console in view.operators for view in _VIEWS.values())
+
+
+def _moved(last, distance, bearing):
+    """True if a contact has moved enough since `last` = (range, bearing)
+    was sent to be worth sending again."""
+    last_distance, last_bearing = last
+    if abs(distance - last_distance) > RANGE_CHANGE * last_distance:
+        return True
+    turned = abs((bearing[0] - last_bearing[0] + 180.0) % 360.0 - 180.0)
+    return (turned > BEARING_CHANGE or
+            abs(bearing[1] - last_bearing[1]) > BEARING_CHANGE)
+
+
+class SensorView(object):
+    """
+    The live sensor display of one spaceobj.
+    Args:
+        obj (SpaceObject): the spaceobj whose contacts are shown
+    """
+    def __init__(self, obj):
+        self.obj = obj
+        # console -> the operator it was subscribed for
+        self.operators = {}
+        # console -> {dbref: (range, bearing) last sent to it}, or None
+        # until it has had the full table
+        self.sent = {}
+        # The latest frame: (dbref, range, bearing) in range order, or None
+        # before the first, and dbref -> contact for it and the one before.
+        self.order = None
+        self.contacts = {}
+        self.previous = {}
+        # dbref -> row, formatted at most once per frame
+        self.rows = {}
+        self.stamp = 0
+
+    def subscribe(self, console):
+        """Send `console` the full table and add it to the next frames."""
+        self.operators[console] = self.obj.bus.operator(console)
+        self.sent[console] = None
+        if len(self.operators) == 1:
+            self.stamp += 1
+            self.frame(self.stamp)
+        elif self.order is not None:
+            self._send(console)
+
+    def unsubscribe(self, console):
+        if self.operators.pop(console, None) is None:
+            return False
+        self.sent.pop(console, None)
+        if not self.operators:
+            self.stop()
+        return True
+
+    def stop(self):
+        """Drop every subscriber; pending frames go stale."""
+        self.operators.clear()
+        self.sent.clear()
+        self.stamp += 1
+        if _VIEWS.get(self.obj) is self:
+            del _VIEWS[self.obj]
+
+    def frame(self, stamp):
+        """Solve the contacts and push a frame to every subscriber."""
+        obj = self.obj
+        if stamp != self.stamp:
+            return
+        if not obj.pk:
+            return self.stop()
+        bus = obj.bus
+        # Unmanned, or manned by somebody else since subscribing.
+        for console, operator in list(self.operators.items()):
+            if bus.operator(console) != operator:
+                self.unsubscribe(console)
+        if stamp != self.stamp:
+            return
+        if not obj.systems.sensors.online():
+            for console in self.operators:
+                bus.send(console, "Sensors are offline; live display stopped.")
+            return self.stop()
+        deferred = obj.contact_solution_deferred(get_contacts(obj).objects())
+        deferred.addCallback(self._solved, stamp).addErrback(
+            lambda failure: logger.log_err("Sensor display failed for %s:\n%s" % (
+                obj, failure.getTraceback())))
+
+    def _solved(self, solution, stamp):
+        if stamp != self.stamp:
+            return
+        contacts, ranges, bearings, _ = solution
+        self.order = [(contact.id, distance, bearing) for contact, distance, bearing
+                      in zip(contacts, ranges, bearings)]
+        self.previous = self.contacts
+        self.contacts = dict((contact.id, contact) for contact in contacts)
+        self.rows = {}
+        for console in list(self.operators):
+            self._send(console)
+        get_engine().schedule(now() + DISPLAY_INTERVAL, _frame_due, self.obj, stamp)
+
+    def _row(self, dbref, distance, bearing):
+        row = self.rows.get(dbref)
+        if row is None:
+            row = self.rows[dbref] = format_contact(self.contacts[dbref], distance, bearing)
+        return row
+
+    def _send(self, console):
+        """Send `console` what changed since its last frame, or the full
+        table if it hasn't had one."""
+        operator = self.operators[console]
+        last = self.sent[console]
+        shown = {}
+        lines = []
+        if last is None:
+            for dbref, distance, bearing in self.order:
+                lines.append('\n' + self._row(dbref, distance, bearing))
+                shown[dbref] = (distance, bearing)
+            self.sent[console] = shown
+            post(operator, sensor_header(self.obj) + (
+                ''.join(lines) or "\n|rNo contacts|n") + sensor_footer())
+            return
+        for dbref, distance, bearing in self.order:
+            previous = last.get(dbref)
+            if previous is None:
+                lines.append('\n|g+|n ' + self._row(dbref, distance, bearing))
+            elif _moved(previous, distance, bearing):
+                lines.append('\n|y~|n ' + self._row(dbref, distance, bearing))
+            else:
+                shown[dbref] = previous
+                continue
+            shown[dbref] = (distance, bearing)
+        for dbref in last:
+            if dbref not in shown:
+                contact = self.previous.get(dbref)
+                lines.append('\n|r-|n   |w%-20s|n lost' % (
+                    contact.name if contact is not None else '#%s' % dbref))
+        self.sent[console] = shown
+        if lines:
+            post(operator, '|[B|w[|ySensor Update|w]|n' + ''.join(lines))
+
+
+def _frame_due(spaceobj, stamp):
+    """Engine timer callback for the next frame of a live display."""
+    view = _VIEWS.get(spaceobj)
+    if view is not None:
+        view.frame(stamp)
@@ -0,0 +1,384 @@
+"""
+Space engine
+
+A single global script that drives the whole space simulation. Instead of
+every moving or sensing spaceobj owning its own ticking script, spaceobjs
+subscribe to one or more update phases on the engine. Once per tick the
+engine runs every phase in order over the objects subscribed to it, so the
+simulation costs one timer no matter how many ships are active.
+
+Usage:
+    from world.space.engine import get_engine
+    get_engine().subscribe(spaceobj, 'sensors')
+
+The registry is kept in memory for the tick loop. Phases whose subscribers
+changed are mirrored to the script's `db.registry` with the batch flush of
+the space state (see world/space/state.py), in one write however many ships
+subscribed or left since the last one. After a restart the registry is read
+from the space snapshot when there is one (see world/space/snapshot.py),
+which is also written here on flush ticks.
+
+Phases listed in POLLED_PHASES run over their members every tick. The rest
+are event driven: they keep their members in the registry but only run when
+a timer set with `schedule()` comes due, and once for every member when the
+engine starts, so they can re-arm their timers after a reload. Heading,
+position, sensors and power are all event driven, so an idle tick costs only
+a look at the timer queue.
+
+The engine runs on a fixed timestep. Each tick simulates from where the last
+one stopped up to the present in steps of `interval`, firing every timer at
+the simulation time it was due (see `now()`), so when the reactor is busy
+and ticks arrive late the simulation catches up rather than drifting. Steps
+with nothing due are skipped over, and a tick that has used FRAME_BUDGET of
+the interval stops and leaves the rest for the next one; how far behind the
+simulation runs is reported as lag.
+
+Each tick is timed phase by phase by the tick profiler (see
+world/space/profiler.py and `@spacestat`). Console messages raised during a
+tick are held and sent in one batch per operator when it ends (see
+world/space/notify.py). With sector shards enabled, each tick starts by
+collecting the crossings the shard workers planned and ends by sending them
+the next requests (see world/space/shards.py).
+"""
+from heapq import heappush, heappop
+from itertools import count
+from time import time
+from timeit import default_timer
+from evennia import DefaultScript, create_script, search_script
+from evennia.utils import logger
+from world.space import notify, shards, snapshot, spatial, state
+from world.space.profiler import get_profiler
+
+ENGINE_KEY = 'space_engine'
+ENGINE_TYPECLASS = 'world.space.engine.SpaceEngine'
+
+# Order in which phases are re-armed at start and polled each tick. Heading
+# comes first so that position plans along the freshly updated course.
+PHASES = ('heading', 'position', 'sensors', 'power')
+# Phases whose members are run every tick; the rest are woken by timers.
+POLLED_PHASES = ()
+
+# Share of the engine interval one frame may spend running timers; what
+# is left over waits for the next frame.
+FRAME_BUDGET = 0.5
+
+_ENGINE = None
+_SEQUENCE = count()
+
+
+_CLOCK = [time]
+# Simulation time while the engine runs, None when it doesn't.
+_SIM = [None]
+
+
+def now():
+    """The simulation clock, in seconds. While the engine runs this is the
+    time it has simulated up to - inside a timer callback, the time the
+    timer was due - so everything sees events in order even when the
+    engine is behind the wall clock."""
+    sim = _SIM[0]
+    return _CLOCK[0]() if sim is None else sim
+
+
+def set_clock(clock=None):
+    """Drive the simulation from `clock`, a callable returning seconds, e.g.
+    a simulated clock for offline runs. None restores wall-clock time."""
+    _CLOCK[0] = clock or time
+    _SIM[0] = None
+
+
+def lag():
+    """Seconds the simulation is behind the clock driving it."""
+    sim = _SIM[0]
+    return 0.0 if sim is None else max(_CLOCK[0]() - sim, 0.0)
+
+
+def get_engine():
+    """Return the global SpaceEngine, creating it on first use.
+    Returns:
+        (SpaceEngine): the running engine script
+    """
+    global _ENGINE
+    if _ENGINE is None or not _ENGINE.pk:
+        found = search_script(ENGINE_KEY)
+        if found:
+            _ENGINE = found[0]
+        else:
+            _ENGINE = create_script(ENGINE_TYPECLASS, key=ENGINE_KEY)
+    return _ENGINE
+
+
+def _phase_actions():
+    """Map each phase to the update function that advances it."""
+    from world.space.systems import (UpdateHeading, UpdatePosition,
+                                     UpdateSensors, UpdatePower)
+    return (('heading', UpdateHeading),
+            ('position', UpdatePosition),
+            ('sensors', UpdateSensors),
+            ('power', UpdatePower))
+
+
+class SpaceEngine(DefaultScript):
+    """
+    Advances every active spaceobj once per tick.
+    """
+
+    def at_script_creation(self):
+        self.key = ENGINE_KEY
+        self.desc = "Drives the space simulation."
+        self.interval = 1
+        self.persistent = True
+        self.db.registry = dict((phase, []) for phase in PHASES)
+
+    def at_start(self):
+        self._load_registry()
+        self.ndb.ticks = 0
+        self.ndb.timers = []
+        self.ndb.rearm = True
+        # Everything in the database happened before now; simulate from here.
+        self.ndb.sim_time = _SIM[0] = _CLOCK[0]()
+
+    def at_stop(self):
+        _SIM[0] = None
+
+    def _load_registry(self):
+        """Rebuild the in-memory registry from the space snapshot, in one
+        query, or else from its persistent mirror."""
+        registry = snapshot.registry()
+        if registry is None:
+            registry = self.db.registry or {}
+        phases = {}
+        for phase in PHASES:
+            # Deleted objects unpickle as None; drop them here.
+            phases[phase] = set(obj for obj in registry.get(phase, ()) if obj)
+        self.ndb.phases = phases
+        return phases
+
+    @property
+    def phases(self):
+        """dict: phase name -> set of subscribed spaceobjs."""
+        phases = self.ndb.phases
+        if phases is None:
+            phases = self._load_registry()
+        return phases
+
+    def _save_phase(self, phase):
+        """Queue `phase` for the next batch flush."""
+        unsaved = self.ndb.unsaved
+        if unsaved is None:
+            unsaved = self.ndb.unsaved = set()
+        unsaved.add(phase)
+        state.mark_dirty(self)
+
+    def flush(self):
+        """Mirror every phase changed since the last flush to `db.registry`.
+        Returns the number of phases written."""
+        unsaved = self.ndb.unsaved
+        if not unsaved or not self.pk:
+            return 0
+        registry = dict(self.db.registry or {})
+        for phase in unsaved:
+            registry[phase] = list(self.phases[phase])
+        written = len(unsaved)
+        unsaved.clear()
+        self.db.registry = registry
+        state.count_writes()
+        return written
+
+    def subscribe(self, obj, phase):
+        """Add `obj` to `phase`. Returns True if it was not already there."""
+        if phase not in PHASES:
+            raise ValueError("Unknown space engine phase: {}".format(phase))
+        members = self.phases[phase]
+        if obj in members:
+            return False
+        members.add(obj)
+        self._save_phase(phase)
+        return True
+
+    def unsubscribe(self, obj, phase):
+        """Remove `obj` from `phase`. Returns True if it was subscribed."""
+        members = self.phases[phase]
+        if obj not in members:
+            return False
+        members.discard(obj)
+        self._save_phase(phase)
+        return True
+
+    def is_subscribed(self, obj, phase):
+        return obj in self.phases[phase]
+
+    def remove(self, obj):
+        """Remove `obj` from every phase, e.g. when it is deleted."""
+        for phase in PHASES:
+            self.unsubscribe(obj, phase)
+
+    def active(self):
+        """Return the set of all spaceobjs subscribed to any phase."""
+        active = set()
+        for members in self.phases.values():
+            active.update(members)
+        return active
+
+    def schedule(self, when, callback, *args):
+        """Call `callback(*args)` on the first tick at or after `when`.
+        Timers live in memory only; event-driven phases re-arm them when
+        the engine starts.
+        """
+        if self.ndb.timers is None:
+            self.ndb.timers = []
+        heappush(self.ndb.timers, (when, next(_SEQUENCE), callback, args))
+
+    def _run_timers(self, until, deadline=None):
+        """Fire every timer due by simulation time `until`, in order, each
+        with the clock set to the time it was due. Stops early once
+        `default_timer()` passes `deadline`, though never before one has
+        run, so a slow server still makes progress.
+        Returns:
+            (tuple): number of timers fired, and whether every due one ran
+        """
+        timers = self.ndb.timers
+        fired = 0
+        while timers and timers[0][0] <= until:
+            if fired and deadline is not None and default_timer() > deadline:
+                return fired, False
+            when, seq, callback, args = heappop(timers)
+            # Timers scheduled in the past run at the present.
+            _SIM[0] = max(when, _SIM[0])
+            fired += 1
+            try:
+                callback(*args)
+            except Exception:
+                logger.log_trace(
+                    "SpaceEngine: timer {} failed.".format(callback))
+        return fired, True
+
+    def _rearm(self):
+        """Run every member of the event-driven phases once. While this
+        runs `ndb.rearming` is set, so updates can tell they are rebuilding
+        state after a reload rather than reacting to something new."""
+        self.ndb.rearm = False
+        self.ndb.rearming = True
+        handled = 0
+        try:
+            for phase, action in _phase_actions():
+                if phase in POLLED_PHASES:
+                    continue
+                for obj in list(self.phases[phase]):
+                    if not obj.pk:
+                        self.unsubscribe(obj, phase)
+                        continue
+                    handled += 1
+                    try:
+                        action(obj)
+                    except Exception:
+                        logger.log_trace(
+                            "SpaceEngine: {} failed for {}.".format(phase, obj))
+        finally:
+            self.ndb.rearming = False
+        return handled
+
+    def at_repeat(self):
+        profiler = get_profiler()
+        profiler.interval = self.interval or 1
+        profiler.start_tick()
+        # Hold console messages so every operator gets one batch per tick.
+        notify.hold()
+        try:
+            handled = self._tick(profiler)
+        finally:
+            started = profiler.clock()
+            profiler.record('notify', started, notify.release())
+        profiler.end_tick(handled)
+
+    def _tick(self, profiler):
+        """Simulate from where the last frame stopped up to the clock, in
+        fixed steps of the engine interval. Steps with nothing due are
+        skipped over in one go; timers run at the times they were due, so a
+        late or busy frame changes when results are seen but not what they
+        are. A frame stops after FRAME_BUDGET of the interval and leaves the
+        rest for the next one; how far behind that leaves the simulation is
+        reported to the profiler.
+        Returns the number of objects and timers handled."""
+        phases = self.phases
+        step = self.interval or 1
+        target = _CLOCK[0]()
+        sim = self.ndb.sim_time
+        if sim is None or _SIM[0] is None:
+            sim = _SIM[0] = target - step
+        deadline = None
+        if FRAME_BUDGET is not None:
+            deadline = default_timer() + FRAME_BUDGET * step
+        handled = 0
+        spatial.advance(_SIM[0])
+        if shards.enabled():
+            started = profiler.clock()
+            profiler.record('shards', started, shards.exchange())
+        if self.ndb.rearm is not False:
+            started = profiler.clock()
+            count = self._rearm()
+            profiler.record('rearm', started, count)
+            handled += count
+        steps = 0
+        caught_up = True
+        worked = False
+        while sim + step <= target:
+            end = sim + step
+            timers = self.ndb.timers
+            if not POLLED_PHASES and not (timers and timers[0][0] <= end):
+                # Nothing due in this step; jump to the one holding the
+                # next timer, or to the present.
+                due = min(timers[0][0], target) if timers else target
+                skip = max(int((due - sim) // step), 1)
+                sim += skip * step
+                steps += skip
+                continue
+            if worked and deadline is not None and default_timer() > deadline:
+                caught_up = False
+                break
+            worked = True
+            _SIM[0] = max(sim, _SIM[0])
+            spatial.advance(_SIM[0])
+            for phase, action in _phase_actions():
+                if phase not in POLLED_PHASES:
+                    continue
+                started = profiler.clock()
+                count = 0
+                # Actions may unsubscribe their target, so walk a snapshot.
+                for obj in list(phases[phase]):
+                    if not obj.pk:
+                        self.unsubscribe(obj, phase)
+                        continue
+                    count += 1
+                    try:
+                        action(obj)
+                    except Exception:
+                        logger.log_trace(
+                            "SpaceEngine: {} failed for {}.".format(phase, obj))
+                profiler.record(phase, started, count)
+                handled += count
+            started = profiler.clock()
+            count, done = self._run_timers(end, deadline)
+            profiler.record('timers', started, count)
+            handled += count
+            if not done:
+                caught_up = False
+                break
+            sim = end
+            steps += 1
+        self.ndb.sim_time = sim
+        _SIM[0] = max(sim, _SIM[0])
+        # Commands until the next frame see positions as of the new time.
+        spatial.advance(_SIM[0])
+        # Send what this tick asked of the shards so they work in between.
+        shards.flush()
+        self.ndb.ticks = (self.ndb.ticks or 0) + 1
+        if self.ndb.ticks % state.FLUSH_INTERVAL == 0:
+            started = profiler.clock()
+            profiler.record('flush', started, state.flush_all())
+            interval = snapshot.SNAPSHOT_INTERVAL
+            if interval and self.ndb.ticks % interval == 0:
+                started = profiler.clock()
+                profiler.record('snapshot', started, snapshot.save())
+        profiler.record_lag(target - sim, steps, not caught_up)
+        return handled
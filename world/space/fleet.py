@@ -0,0 +1,109 @@
+"""
+Fleet spawning
+
+Creates many spaceobjs from one template in a single database transaction,
+for events and load tests. Creating them one by one with `create_object`
+runs SpaceObject.at_object_creation for each: a Space channel lookup and
+message, fifteen attribute writes, two tag writes and a template apply.
+`spawn_fleet` instead creates each object with its attributes, tags and
+template systems already attached, so Evennia saves them with its batch
+attribute and tag inserts, then announces the whole fleet once and adds it
+to the spatial index (and the shard owning the location) in one pass.
+"""
+import random
+from math import pi, sin, cos, acos
+from django.db import transaction
+from evennia.utils.create import create_object
+from world.space import links, objects, shards, spatial
+from world.space.announce import announce
+from world.space.templates import STATION_TEMPLATES, get_template
+from world.space.utils import Vector3
+
+# Largest fleet one call will create.
+MAX_FLEET = 1000
+
+
+class FleetException(Exception):
+    def __init__(self, msg):
+        self.msg = msg
+
+
+def scatter(center, spread, count, rng=random):
+    """Positions for `count` spaceobjs spread evenly through a sphere.
+    Args:
+        center (Vector3): middle of the fleet
+        spread (float): radius of the sphere, in light seconds
+        count (int): number of positions
+    Returns:
+        (list): Vector3 positions
+    """
+    positions = []
+    for i in range(count):
+        r = spread * rng.random() ** (1.0 / 3)
+        xy = rng.uniform(0, 2 * pi)
+        z = acos(rng.uniform(-1, 1))
+        positions.append(Vector3(center.x + r * sin(z) * cos(xy),
+                                 center.y + r * sin(z) * sin(xy),
+                                 center.z + r * cos(z)))
+    return positions
+
+
+def spawn_fleet(template, count, location, center, spread=0.0, prefix=None,
+                typeclass=None, quiet=False):
+    """Create `count` spaceobjs from `template` around `center`.
+    Args:
+        template (str): name of the template every spaceobj gets
+        count (int): number of spaceobjs to create
+        location (Object): space location (sector room) to put them in
+        center (Vector3): middle of the fleet
+        spread (float): radius they are scattered over, in light seconds
+        prefix (str): names are '<prefix> <n>'; defaults to the template name
+        typeclass (class): Ship or Station; defaults by template
+        quiet (bool): don't send the summary to the Space channel
+    Returns:
+        (list): the new spaceobjs
+    """
+    compiled = get_template(template)
+    if not 0 < count <= MAX_FLEET:
+        raise FleetException("Fleet size must be between 1 and %d." % MAX_FLEET)
+    if typeclass is None:
+        if template.lower() in STATION_TEMPLATES:
+            typeclass = objects.Station
+        else:
+            typeclass = objects.Ship
+    prefix = prefix or compiled.name
+    kind = typeclass.kind
+
+    fleet = []
+    objects._SPAWNING[0] += 1
+    try:
+        with transaction.atomic():
+            for i, pos in enumerate(scatter(center, spread, count)):
+                name = '%s %d' % (prefix, i + 1)
+                attributes = dict(objects.initial_attributes(pos))
+                attributes['spaceframe'] = compiled.name
+                attributes['systems'] = compiled.build()
+                tags = [(name, 'spaceobj')]
+                if kind:
+                    tags.append((name, kind))
+                fleet.append(create_object(typeclass, key=name,
+                                           location=location,
+                                           attributes=list(attributes.items()),
+                                           tags=tags))
+    finally:
+        objects._SPAWNING[0] -= 1
+
+    register(fleet)
+    if not quiet:
+        announce(
+            '%d %s added to space system around %s: %s to %s.' % (
+                count, compiled.name, center, fleet[0].name, fleet[-1].name))
+    return fleet
+
+
+def register(fleet):
+    """Add freshly created spaceobjs to the simulation in one pass."""
+    for obj in fleet:
+        links.register(obj)
+        spatial.update_position(obj, obj.db.pos)
+        shards.track(obj)
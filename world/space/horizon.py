@@ -0,0 +1,262 @@
+"""
+Sensor horizon
+
+Predicts when a contact will cross an observer's sensor range, so contact
+acquisition can be driven by engine timers instead of re-checking every
+pair each tick. Given the motion segments of both objects (see
+world/space/motion.py) and the observer's sensor power, `next_crossing`
+returns the first moment within `HORIZON` seconds at which the distance
+between them passes `sensor_range()`.
+
+For the common case - both objects at constant velocity and the sensors at
+a steady setting - the crossing is a root of a quadratic. A sensor power ramp
+keeps it quadratic, since the range then changes linearly with time. While
+either object is accelerating, the gap between their distance and the range
+is sampled and the crossing found by bisection, up to the end of the
+acceleration only. Each sample steps ahead only as far as that gap could
+close at the top speeds both objects reach in the meantime, so a contact
+can't slip in and out of range between two samples.
+
+The solver works on Tracks, plain-data snapshots of the motion and sensors
+of a spaceobj, so it can run wherever the tracks are sent (see
+world/space/shards.py). UpdateSensors in world/space/systems.py schedules
+the predicted crossings and re-plans a pair whenever one of the two changes
+course or speed.
+"""
+from math import sqrt
+from django.conf import settings
+from world.space import motion
+from world.space.motion import LIGHT_SPEED
+from world.space.power import ramp_value
+
+# Seconds ahead that crossings are predicted. Observers re-plan from scratch
+# when the horizon runs out, which also picks up ships that arrived from
+# beyond the search radius.
+HORIZON = getattr(settings, 'SPACE_SENSOR_HORIZON', 30.0)
+# Precision, and shortest sampling step, in seconds, for non-linear motion.
+PRECISION = 0.01
+
+_MAX_RANGE = [0.0]
+
+
+def note_range(radius):
+    """Remember the largest sensor range in use, for `reach()`."""
+    if radius > _MAX_RANGE[0]:
+        _MAX_RANGE[0] = radius
+
+
+def reach(obj, radius=None, horizon=HORIZON):
+    """Search radius, in light seconds, that holds every object that could
+    cross a sensor range of `radius` (default: the largest seen) around
+    `obj` within the horizon. Ships share the same hardcoded top speed.
+    `obj` may be a spaceobj or a Track."""
+    if radius is None:
+        radius = _MAX_RANGE[0]
+    maxspeed = obj.maxspeed
+    if callable(maxspeed):
+        maxspeed = maxspeed()
+    return radius + 2 * maxspeed * horizon / LIGHT_SPEED
+
+
+class Track(object):
+    """
+    What crossing prediction needs to know about one spaceobj at one moment.
+    Args:
+        pos (sequence): position, used when there is no segment
+        segment (tuple): motion segment, see world/space/motion.py
+        power (float): sensor power level at the start of `ramp`
+        ramp (tuple): running sensor power ramp, see `System.ramp`
+        scale (float): sensor range per unit of power
+        maxspeed (float): top speed, km/s
+        sensing (bool): True if it is looking for contacts
+    """
+    __slots__ = ('pos', 'segment', 'power', 'ramp', 'scale', 'maxspeed',
+                 'sensing')
+
+    def __init__(self, pos, segment=None, power=0.0, ramp=None, scale=0.0,
+                 maxspeed=0.0, sensing=False):
+        self.pos = tuple(pos)
+        self.segment = segment
+        self.power = power
+        self.ramp = ramp
+        self.scale = scale
+        self.maxspeed = maxspeed
+        self.sensing = sensing
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, values):
+        for name, value in zip(self.__slots__, values):
+            setattr(self, name, value)
+
+    @classmethod
+    def of(cls, obj):
+        """Snapshot spaceobj `obj`."""
+        state = obj.state
+        sensors = obj.systems.sensors
+        if sensors is None:
+            return cls(state.pos, state.segment, maxspeed=obj.maxspeed())
+        return cls(state.pos, state.segment, sensors.ramp_start, sensors.ramp,
+                   obj.sensor_scale(), obj.maxspeed(),
+                   obj.ndb.sensor_pairs is not None)
+
+    def position(self, at):
+        if self.segment is None:
+            return self.pos
+        return motion.position_at(self.segment, at)
+
+    def sensor_range(self, at):
+        return ramp_value(self.power, self.ramp, at) * self.scale
+
+    @property
+    def ramp_end(self):
+        """Time the sensor ramp reaches its target, or None."""
+        ramp = self.ramp
+        if ramp is None or not ramp[1]:
+            return None
+        start, slope, target = ramp
+        return start + (target - self.power) / slope
+
+
+def _velocity(track):
+    """Velocity of `track` in light seconds per second once its
+    acceleration has ended."""
+    segment = track.segment
+    if segment is None:
+        return (0.0, 0.0, 0.0)
+    epoch, origin, course, speed, accel, until = segment
+    speed = (speed + accel * (until - epoch)) / LIGHT_SPEED
+    return (course[0] * speed, course[1] * speed, course[2] * speed)
+
+
+def _top_speed(track, start, end):
+    """Highest speed of `track` between `start` and `end`, in light seconds
+    per second. Speed changes linearly while accelerating, so it is the
+    faster of the two ends."""
+    segment = track.segment
+    if segment is None:
+        return 0.0
+    epoch, origin, course, speed, accel, until = segment
+    fastest = max(abs(speed + accel * (min(max(at, epoch), until) - epoch))
+                  for at in (start, end))
+    return fastest / LIGHT_SPEED
+
+
+def _gap(observer, contact, at):
+    """Distance minus sensor range at time `at`; negative inside it."""
+    ox, oy, oz = observer.position(at)
+    cx, cy, cz = contact.position(at)
+    dx = cx - ox
+    dy = cy - oy
+    dz = cz - oz
+    return sqrt(dx * dx + dy * dy + dz * dz) - observer.sensor_range(at)
+
+
+def next_crossing(observer, contact, at, horizon=HORIZON):
+    """First time in (`at`, `at` + `horizon`] at which spaceobj `contact`
+    enters or leaves the sensor range of spaceobj `observer`.
+    Returns:
+        (float or None): time of the crossing, or None if there is none
+    """
+    return crossing(Track.of(observer), Track.of(contact), at, horizon)
+
+
+def crossing(observer, contact, at, horizon=HORIZON):
+    """`next_crossing` for two Tracks."""
+    end = at + horizon
+    accelerated = min(max(_accelerating(observer, at),
+                          _accelerating(contact, at)), end)
+    if accelerated > at:
+        found = _sampled_crossing(observer, contact, at, accelerated - at)
+        if found is not None:
+            return found
+        at = accelerated
+    vo = _velocity(observer)
+    vc = _velocity(contact)
+    # The range changes linearly up to the end of a sensor ramp, then holds.
+    for stop in (observer.ramp_end, end):
+        if stop is None or stop <= at:
+            continue
+        stop = min(stop, end)
+        found = _linear_crossing(observer, contact, vo, vc, at, stop - at)
+        if found is not None:
+            return found
+        at = stop
+    return None
+
+
+def crossings(observer, contacts, at, horizon=HORIZON):
+    """`crossing` for one observer Track and a list of contact Tracks.
+    Returns:
+        (list): time of the next crossing or None, parallel to contacts
+    """
+    return [crossing(observer, contact, at, horizon) for contact in contacts]
+
+
+def _accelerating(track, at):
+    """Time `track` stops accelerating, or `at` if it already has."""
+    segment = track.segment
+    if segment is not None and segment[4] and segment[5] > at:
+        return segment[5]
+    return at
+
+
+def _linear_crossing(observer, contact, vo, vc, at, horizon):
+    """Closed-form crossing over a window in which both ships hold their
+    velocity and the sensor range changes at a constant rate."""
+    ox, oy, oz = observer.position(at)
+    cx, cy, cz = contact.position(at)
+    px = cx - ox
+    py = cy - oy
+    pz = cz - oz
+    vx = vc[0] - vo[0]
+    vy = vc[1] - vo[1]
+    vz = vc[2] - vo[2]
+    radius = observer.sensor_range(at)
+    growth = (observer.sensor_range(at + horizon) - radius) / horizon
+    # |p + v t|^2 - (radius + growth t)^2 = a t^2 + b t + c
+    a = vx * vx + vy * vy + vz * vz - growth * growth
+    b = 2 * (px * vx + py * vy + pz * vz - radius * growth)
+    c = px * px + py * py + pz * pz - radius * radius
+    if not a:
+        roots = (-c / b,) if b else ()
+    else:
+        disc = b * b - 4 * a * c
+        if disc <= 0:
+            return None
+        root = sqrt(disc)
+        roots = sorted(((-b - root) / (2 * a), (-b + root) / (2 * a)))
+    for t in roots:
+        if 0 < t <= horizon:
+            # Land PRECISION past the root, so the check at the crossing
+            # sees the contact on its new side even with rounding, and a
+            # contact sitting right on the edge isn't checked in a tight loop.
+            return at + t + PRECISION
+    return None
+
+
+def _sampled_crossing(observer, contact, at, horizon):
+    end = at + horizon
+    # Fastest the gap can change: both ships flat out towards each other,
+    # plus the sensor range ramping.
+    rate = _top_speed(observer, at, end) + _top_speed(contact, at, end)
+    if observer.ramp is not None:
+        rate += abs(observer.ramp[1]) * observer.scale
+    gap = _gap(observer, contact, at)
+    inside = gap <= 0
+    before = at
+    while before < end:
+        step = abs(gap) / rate if rate else horizon
+        after = min(before + max(step, PRECISION), end)
+        gap = _gap(observer, contact, after)
+        if (gap <= 0) != inside:
+            while after - before > PRECISION:
+                middle = (before + after) / 2
+                if (_gap(observer, contact, middle) <= 0) == inside:
+                    before = middle
+                else:
+                    after = middle
+            return after
+        before = after
+    return None
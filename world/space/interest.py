@@ -0,0 +1,192 @@
+"""
+Interest management
+
+Sorts spaceobjs, and the space locations (sectors) holding them, into
+observed and unobserved, so the simulation spends its time where players
+are looking.
+
+A spaceobj is observed while one of its consoles is manned, while a player
+is in one of its rooms (see world/space/links.py), or while something has
+asked to `watch()` it. A sector is awake while any spaceobj in it is
+observed.
+
+What sleeps:
+
+- Sensors. An unobserved spaceobj keeps its sensor power but neither sweeps
+  nor plans range crossings; its contact list is left as it was. When it
+  becomes observed it runs a full UpdateSensors, which brings the contact
+  list up to date from the ships' current positions in one pass.
+- Crossing checks for the contacts of a sleeping sector, since nothing in
+  it is sensing.
+- Turn steering. A ship turning in a sleeping sector corrects its course
+  every IDLE_TURN_STEP seconds instead of every TURN_STEP, and is re-planned
+  straight away when the sector wakes.
+
+What doesn't: motion and power are already analytic, so positions, speeds
+and power levels are exact whenever somebody next looks, and an unobserved
+ship still shows up on the sensors of observed ones.
+
+Observation is recomputed only when something that affects it happens -
+manning or unmanning a console, a player entering or leaving a ship's room
+or going link-dead, a room or console being attached or detached - so it
+costs nothing per tick. `SPACE_INTEREST_MANAGEMENT = False` treats every
+spaceobj as observed.
+"""
+from django.conf import settings
+from evennia.utils.utils import inherits_from
+from world.space import links
+
+# Seconds between course corrections of a ship turning in a sleeping sector.
+IDLE_TURN_STEP = 10.0
+
+# spaceobj -> True/False, computed on first use
+_OBSERVED = {}
+# location -> set of observed spaceobjs in it, built on first use
+_SECTORS = {}
+# spaceobjs kept observed by watch()
+_WATCHED = set()
+
+
+def enabled():
+    """True if unobserved spaceobjs are put to sleep."""
+    return getattr(settings, 'SPACE_INTEREST_MANAGEMENT', True)
+
+
+def _is_spaceobj(obj):
+    return inherits_from(obj, "world.space.objects.SpaceObject")
+
+
+def _compute(obj):
+    """Work out from scratch whether anyone is watching `obj`."""
+    if obj in _WATCHED or obj.bus.manned():
+        return True
+    for room in links.rooms(obj):
+        for thing in room.contents:
+            if thing.has_account:
+                return True
+    return False
+
+
+def observed(obj):
+    """True if `obj` should be simulated in full."""
+    if not enabled():
+        return True
+    try:
+        return _OBSERVED[obj]
+    except KeyError:
+        seen = _OBSERVED[obj] = _compute(obj)
+        sector = _SECTORS.get(obj.location)
+        if sector is not None and seen:
+            sector.add(obj)
+        return seen
+
+
+def _sector(location):
+    sector = _SECTORS.get(location)
+    if sector is None:
+        sector = _SECTORS[location] = set()
+        for obj in location.contents:
+            if _is_spaceobj(obj) and observed(obj):
+                sector.add(obj)
+    return sector
+
+
+def sector_awake(location):
+    """True if anything in `location` is observed."""
+    if not enabled() or location is None:
+        return True
+    return bool(_sector(location))
+
+
+def refresh(obj):
+    """Re-check whether `obj` is observed after something that affects it
+    changed, waking or putting it to sleep if the answer changed."""
+    if obj is None or not obj.pk or not enabled():
+        return
+    was = _OBSERVED.get(obj)
+    seen = _OBSERVED[obj] = _compute(obj)
+    if was == seen:
+        return
+    location = obj.location
+    sector = _SECTORS.get(location)
+    woke = sector is not None and not sector and seen
+    if sector is not None:
+        if seen:
+            sector.add(obj)
+        else:
+            sector.discard(obj)
+    if seen:
+        _wake(obj)
+    else:
+        _sleep(obj)
+    if woke:
+        _wake_sector(location)
+
+
+def refresh_room(room):
+    """Re-check the spaceobj `room` belongs to, if any."""
+    if room is not None:
+        refresh(links.spaceobj_of(room))
+
+
+def watch(obj):
+    """Keep `obj` observed, e.g. for staff events or load tests."""
+    _WATCHED.add(obj)
+    refresh(obj)
+
+
+def unwatch(obj):
+    _WATCHED.discard(obj)
+    refresh(obj)
+
+
+def relocate(obj, source_location):
+    """Move `obj` from the sector of `source_location` to its current one."""
+    old = _SECTORS.get(source_location)
+    if old is not None:
+        old.discard(obj)
+    sector = _SECTORS.get(obj.location)
+    if sector is not None and observed(obj):
+        woke = not sector
+        sector.add(obj)
+        if woke:
+            _wake_sector(obj.location)
+
+
+def forget(obj):
+    """Drop `obj`, e.g. when it is deleted."""
+    _OBSERVED.pop(obj, None)
+    _WATCHED.discard(obj)
+    sector = _SECTORS.get(obj.location)
+    if sector is not None:
+        sector.discard(obj)
+
+
+def drop_sector(location):
+    """Forget what is known about `location`; it is rebuilt on next use."""
+    _SECTORS.pop(location, None)
+
+
+def _wake(obj):
+    """Catch the sensors of `obj` up with the present."""
+    from world.space.systems import UpdateSensors
+    sensors = obj.systems.sensors
+    if sensors is not None and obj.ndb.sensor_pairs is None and sensors.online():
+        UpdateSensors(obj)
+
+
+def _sleep(obj):
+    """Stop sweeping; pending crossings and sweeps go stale."""
+    from world.space import shards
+    if obj.ndb.sensor_pairs is not None:
+        obj.ndb.sensor_pairs = None
+        obj.ndb.sensor_sweep = None
+        shards.track(obj)
+
+
+def _wake_sector(location):
+    """Put every ship turning in `location` back on full-rate steering."""
+    from world.space.systems import UpdatePosition
+    for obj in location.contents:
+        if _is_spaceobj(obj) and obj.state.turn is not None:
+            UpdatePosition(obj)
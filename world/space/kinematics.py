@@ -0,0 +1,131 @@
+"""
+Kinematics backend
+
+Optional vectorized evaluation of motion segments (see world/space/motion.py).
+The segment of every moving spaceobj is mirrored into contiguous NumPy arrays
+(one row per object), so the positions of all of them at one moment come out
+of a handful of array operations instead of one Python evaluation per ship.
+Spatial grids use it to refresh their moving members before a sensor query.
+
+The arrays are only a mirror: the segment in `SpaceObject.state` stays
+authoritative and UpdatePosition keeps the two in step with `load()` and
+`remove()`.
+
+Enable it with `SPACE_KINEMATICS_BACKEND = 'numpy'` in settings. Without
+NumPy installed the setting is ignored and segments are evaluated one at a
+time in Python.
+"""
+from django.conf import settings
+from world.space.motion import LIGHT_SPEED
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+_BACKEND = None
+
+
+def enabled():
+    """True if the NumPy backend is configured and importable."""
+    return (np is not None and
+            getattr(settings, 'SPACE_KINEMATICS_BACKEND', 'python') == 'numpy')
+
+
+def get_backend():
+    """Return the shared KinematicsBackend, creating it on first use."""
+    global _BACKEND
+    if _BACKEND is None:
+        _BACKEND = KinematicsBackend()
+    return _BACKEND
+
+
+class KinematicsBackend(object):
+    """Structure-of-arrays mirror of moving spaceobjs' segments.
+    Args:
+        capacity (int): initial number of rows to allocate
+    """
+    def __init__(self, capacity=64):
+        self.rows = {}
+        self.objs = []
+        self._evaluated = None
+        self._allocate(capacity)
+
+    def __len__(self):
+        return len(self.objs)
+
+    def __contains__(self, obj):
+        return obj in self.rows
+
+    def _allocate(self, capacity):
+        used = len(self.objs)
+        origin = np.zeros((capacity, 3))
+        course = np.zeros((capacity, 3))
+        scalars = np.zeros((4, capacity))
+        if used:
+            origin[:used] = self.origin[:used]
+            course[:used] = self.course[:used]
+            scalars[:, :used] = self._scalars[:, :used]
+        self.origin = origin
+        self.course = course
+        self._scalars = scalars
+        # Views into one block so a resize moves all four at once.
+        self.epoch = scalars[0]
+        self.speed = scalars[1]
+        self.accel = scalars[2]
+        self.until = scalars[3]
+
+    def load(self, obj, segment):
+        """Mirror `segment` as the motion of `obj`, adding a row if needed."""
+        row = self.rows.get(obj)
+        if row is None:
+            row = len(self.objs)
+            if row == len(self.origin):
+                self._allocate(row * 2)
+            self.rows[obj] = row
+            self.objs.append(obj)
+        epoch, origin, course, speed, accel, until = segment
+        self.origin[row] = origin
+        self.course[row] = course
+        self._scalars[:, row] = (epoch, speed, accel, until)
+        self._evaluated = None
+        return row
+
+    def remove(self, obj):
+        """Stop mirroring `obj`."""
+        row = self.rows.pop(obj, None)
+        if row is None:
+            return
+        last = len(self.objs) - 1
+        if row != last:
+            moved = self.objs[last]
+            self.origin[row] = self.origin[last]
+            self.course[row] = self.course[last]
+            self._scalars[:, row] = self._scalars[:, last]
+            self.objs[row] = moved
+            self.rows[moved] = row
+        self.objs.pop()
+        self._evaluated = None
+
+    def evaluate(self, at):
+        """Positions of every loaded object at time `at`.
+        Returns:
+            (dict): obj -> (x, y, z)
+        """
+        cached = self._evaluated
+        if cached is not None and cached[0] == at:
+            return cached[1]
+        n = len(self.objs)
+        table = {}
+        if n:
+            epoch = self.epoch[:n]
+            speed = self.speed[:n]
+            accel = self.accel[:n]
+            elapsed = np.maximum(at - epoch, 0.0)
+            ramp = np.minimum(elapsed, np.maximum(self.until[:n] - epoch, 0.0))
+            dist = (speed * ramp + 0.5 * accel * ramp * ramp +
+                    (speed + accel * ramp) * (elapsed - ramp))
+            pos = self.origin[:n] + self.course[:n] * (dist / LIGHT_SPEED)[:, None]
+            table = dict(zip(self.objs, map(tuple, pos.tolist())))
+        self._evaluated = (at, table)
+        return table
@@ -0,0 +1,140 @@
+"""
+Spaceobj links
+
+Which rooms and consoles belong to which spaceobj, kept consistent in both
+directions.
+
+The persistent record is on the member: `db.spaceobj` points at the
+spaceobj, as the rest of the game already expects, and a tag keyed by the
+spaceobj's id (category "spaceobj_room" or "spaceobj_console") lets the
+database find all members of a spaceobj through its tag index. On top of
+that an in-memory cache answers both "which spaceobj is this room or
+console on" and "all rooms / consoles of this spaceobj" with a dict lookup.
+The member sets of a spaceobj are loaded with one tag query the first time
+they are needed; new spaceobjs are registered empty and never query.
+
+Spaceobjs created before this existed kept their members in the
+`db.local` and `db.consoles` lists; those are moved over to tags the first
+time the spaceobj's members are loaded.
+"""
+from evennia import search_tag
+
+ROOM = 'room'
+CONSOLE = 'console'
+KINDS = (ROOM, CONSOLE)
+CATEGORIES = {ROOM: 'spaceobj_room', CONSOLE: 'spaceobj_console'}
+# Attributes the members used to be listed in, by kind.
+LEGACY_ATTRIBUTES = {ROOM: 'local', CONSOLE: 'consoles'}
+
+# member -> spaceobj (or None)
+_SPACEOBJ = {}
+# spaceobj -> {kind: set of members}
+_MEMBERS = {}
+
+
+def _tag(spaceobj):
+    return str(spaceobj.id)
+
+
+def register(spaceobj):
+    """Start `spaceobj` off with no rooms or consoles, so a new spaceobj
+    never has to ask the database for its members."""
+    if spaceobj not in _MEMBERS:
+        _MEMBERS[spaceobj] = dict((kind, set()) for kind in KINDS)
+
+
+def _members(spaceobj):
+    """The member sets of `spaceobj`, loading them on first use."""
+    members = _MEMBERS.get(spaceobj)
+    if members is None:
+        register(spaceobj)
+        members = _MEMBERS[spaceobj]
+        for kind in KINDS:
+            for member in search_tag(_tag(spaceobj), category=CATEGORIES[kind]):
+                members[kind].add(member)
+                _SPACEOBJ[member] = spaceobj
+        for kind, attr in LEGACY_ATTRIBUTES.items():
+            legacy = spaceobj.attributes.get(attr)
+            if legacy is None:
+                continue
+            for member in legacy:
+                if member and member.pk:
+                    attach(member, spaceobj, kind)
+            spaceobj.attributes.remove(attr)
+    return members
+
+
+def spaceobj_of(member):
+    """The spaceobj `member` (a room or console) belongs to, or None."""
+    try:
+        return _SPACEOBJ[member]
+    except KeyError:
+        spaceobj = member.db.spaceobj or None
+        _SPACEOBJ[member] = spaceobj
+        return spaceobj
+
+
+def rooms(spaceobj):
+    """The rooms of `spaceobj`. The set is live; copy it to iterate while
+    attaching or detaching."""
+    return _members(spaceobj)[ROOM]
+
+
+def consoles(spaceobj):
+    """The consoles of `spaceobj`. The set is live; copy it to iterate
+    while attaching or detaching."""
+    return _members(spaceobj)[CONSOLE]
+
+
+def attach(member, spaceobj, kind):
+    """Make `member` a room or console (see `kind`) of `spaceobj`, taking
+    it off any other spaceobj first.
+    Returns:
+        (SpaceObject): the spaceobj it was on before, or None
+    """
+    previous = detach(member, kind)
+    member.db.spaceobj = spaceobj
+    member.tags.add(_tag(spaceobj), category=CATEGORIES[kind])
+    _members(spaceobj)[kind].add(member)
+    _SPACEOBJ[member] = spaceobj
+    if kind == CONSOLE:
+        spaceobj.bus.update(member)
+    _refresh(spaceobj)
+    return previous
+
+
+def detach(member, kind):
+    """Take `member` off its spaceobj.
+    Returns:
+        (SpaceObject): the spaceobj it was on, or None
+    """
+    spaceobj = spaceobj_of(member)
+    if spaceobj is None:
+        return None
+    if kind == CONSOLE:
+        spaceobj.bus.forget(member)
+    members = _MEMBERS.get(spaceobj)
+    if members is not None:
+        members[kind].discard(member)
+    if member.pk:
+        member.tags.remove(_tag(spaceobj), category=CATEGORIES[kind])
+        member.db.spaceobj = None
+    _SPACEOBJ.pop(member, None)
+    _refresh(spaceobj)
+    return spaceobj
+
+
+def _refresh(spaceobj):
+    """Re-evaluate whether `spaceobj` is observed now its members changed."""
+    # Imported here: world/space/interest.py imports this module.
+    from world.space import interest
+    interest.refresh(spaceobj)
+
+
+def forget(spaceobj):
+    """Detach every room and console of `spaceobj`, e.g. when it is
+    deleted."""
+    for kind in KINDS:
+        for member in list(_members(spaceobj)[kind]):
+            detach(member, kind)
+    _MEMBERS.pop(spaceobj, None)
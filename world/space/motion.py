@@ -0,0 +1,105 @@
+"""
+Motion
+
+Dead-reckoning model of a spaceobj's movement. Instead of integrating the
+position every tick, motion is stored as one segment:
+
+    (epoch, origin, course, speed, accel, until)
+
+The ship left `origin` at time `epoch` along the unit vector `course` at
+`speed` km/s, accelerating by `accel` km/s per second until time `until` and
+cruising at the speed it reached from then on. Position and speed at any
+moment are evaluated from the segment on demand, so a cruising ship costs
+nothing until somebody looks at it.
+
+The segment lives in `SpaceObject.state.segment`. UpdatePosition in
+world/space/systems.py replaces it whenever speed, heading or position
+changes, and wakes itself when an acceleration ends.
+"""
+from world.space.utils import Vector3, add_scaled_all
+
+# km/s per light second; converts speed into distance.
+LIGHT_SPEED = 299792.0
+# Acceleration in km/s per second; hardcoded until engines provide one.
+ACCEL_RATE = 10.0
+# Speeds closer than this, in km/s, count as already reached.
+SPEED_TOLERANCE = 1e-6
+
+
+def plan(pos, course, speed, dspeed, maxspeed, at):
+    """Start a segment at `pos` and time `at`.
+    Args:
+        pos (sequence): x, y, z position in light seconds
+        course (sequence): unit course vector
+        speed (float): current speed, km/s
+        dspeed (float): desired speed, km/s
+        maxspeed (float): top speed, km/s
+        at (float): the segment's epoch
+    Returns:
+        (tuple): the segment
+    """
+    target = min(dspeed, maxspeed) if dspeed > speed else dspeed
+    speed = float(speed)
+    if abs(target - speed) < SPEED_TOLERANCE:
+        # Snap rounding residue from the end of a ramp onto the target.
+        speed = float(target)
+        accel = 0.0
+        until = at
+    else:
+        accel = ACCEL_RATE if target > speed else -ACCEL_RATE
+        until = at + abs(target - speed) / ACCEL_RATE
+    return (at, tuple(pos), tuple(course), speed, accel, until)
+
+
+def ramping(segment):
+    """True if the segment is still changing speed at some point."""
+    return segment[4] != 0.0
+
+
+def moving(segment):
+    """True if the ship is, or will be, moving under `segment`."""
+    return segment[3] != 0.0 or segment[4] != 0.0
+
+
+def final_speed(segment):
+    """Speed reached once the acceleration ends."""
+    epoch, origin, course, speed, accel, until = segment
+    return speed + accel * (until - epoch)
+
+
+def speed_at(segment, at):
+    """Speed in km/s under `segment` at time `at`."""
+    epoch, origin, course, speed, accel, until = segment
+    if at >= until:
+        return speed + accel * (until - epoch)
+    if at <= epoch:
+        return speed
+    return speed + accel * (at - epoch)
+
+
+def distance_at(segment, at):
+    """Kilometres travelled since the epoch at time `at`."""
+    epoch, origin, course, speed, accel, until = segment
+    elapsed = at - epoch
+    if elapsed <= 0:
+        return 0.0
+    ramp = min(elapsed, until - epoch)
+    return (speed * ramp + 0.5 * accel * ramp * ramp +
+            (speed + accel * ramp) * (elapsed - ramp))
+
+
+def position_at(segment, at):
+    """Position as a Vector3 under `segment` at time `at`."""
+    return Vector3(segment[1]).add_scaled(
+        segment[2], distance_at(segment, at) / LIGHT_SPEED)
+
+
+def positions_at(segments, at):
+    """`position_at` for many segments at once.
+    Returns:
+        (list): Vector3 positions, parallel to segments
+    """
+    positions = [Vector3(segment[1]) for segment in segments]
+    add_scaled_all(positions, [segment[2] for segment in segments],
+                   [distance_at(segment, at) / LIGHT_SPEED for segment in segments])
+    return positions
@@ -0,0 +1,143 @@
+"""
+Console notifications
+
+Notification bus for the consoles of one spaceobj, available as
+`SpaceObject.bus`. It keeps an in-memory index of which consoles are manned,
+by whom, and in which modes, so messaging every helm console costs no
+attribute reads:
+
+    spaceobj.bus.notify("Now heading 090 000.", 'helm')
+
+The index is built from the database on first use and kept current by
+whatever changes a console's operator, modes or spaceobj - `man`/`unman`
+and the console `cmdset` command call `Console.update_bus()`, and attaching
+or detaching a console (see world/space/links.py) updates or forgets it.
+
+While the space engine runs a tick, messages are held and each operator gets
+everything the tick produced in a single message when it ends. Outside a tick
+(a player's own console command, say) messages go out immediately.
+"""
+from collections import OrderedDict
+from world.space import links
+
+_HOLDS = [0]
+_QUEUE = OrderedDict()
+
+
+def hold():
+    """Start queueing messages instead of sending them."""
+    _HOLDS[0] += 1
+
+
+def release():
+    """End a `hold()`. When the outermost hold ends, send the queue.
+    Returns:
+        (int): number of operators messaged
+    """
+    if _HOLDS[0] > 0:
+        _HOLDS[0] -= 1
+    if _HOLDS[0]:
+        return 0
+    return deliver()
+
+
+def deliver():
+    """Send every queued message, one batch per operator."""
+    sent = 0
+    while _QUEUE:
+        operator, lines = _QUEUE.popitem(last=False)
+        if operator.pk:
+            operator.msg('\n'.join(lines))
+            sent += 1
+    return sent
+
+
+def post(operator, text):
+    """Send `text` to `operator`, or queue it while messages are held."""
+    if _HOLDS[0]:
+        lines = _QUEUE.get(operator)
+        if lines is None:
+            lines = _QUEUE[operator] = []
+        lines.append(text)
+    elif operator.pk:
+        operator.msg(text)
+
+
+class ConsoleBus(object):
+    """Index of the manned consoles of one spaceobj, by mode.
+    Args:
+        obj (SpaceObject): the spaceobj whose consoles are indexed
+    """
+    def __init__(self, obj):
+        self.obj = obj
+        self.operators = None
+        self.modes = {}
+
+    def _index(self):
+        if self.operators is None:
+            self.operators = {}
+            self.modes = {}
+            for console in links.consoles(self.obj):
+                self._add(console)
+        return self.operators
+
+    def _add(self, console):
+        operator = console.db.operator
+        if not operator:
+            return
+        self.operators[console] = operator
+        for mode in console.db.current_modes or ():
+            self.modes.setdefault(mode, set()).add(console)
+
+    def _discard(self, console):
+        self.operators.pop(console, None)
+        for members in self.modes.values():
+            members.discard(console)
+
+    def update(self, console):
+        """Re-read the operator and modes of `console`."""
+        if self.operators is None:
+            # Not indexed yet; it will be read when first needed.
+            return
+        self._discard(console)
+        if console.pk and links.spaceobj_of(console) == self.obj:
+            self._add(console)
+
+    def forget(self, console):
+        """Drop `console`, e.g. when it is detached from the spaceobj."""
+        if self.operators is not None:
+            self._discard(console)
+
+    def rebuild(self):
+        """Discard the index; it is rebuilt from the database on next use."""
+        self.operators = None
+        self.modes = {}
+
+    def manned(self, mode=None):
+        """Return the manned consoles, or those in `mode`."""
+        operators = self._index()
+        if mode is None:
+            return list(operators)
+        return list(self.modes.get(mode, ()))
+
+    def operator(self, console):
+        """The character manning `console`, or None."""
+        return self._index().get(console)
+
+    def send(self, console, msg, mode=None):
+        """Show `msg` to the operator of `console`. With `mode`, forward it
+        to every other console in that mode as well."""
+        operator = self._index().get(console)
+        if operator is None:
+            return
+        post(operator, '|w<|g{}: |b{}|w>'.format(console.name.title(), msg))
+        if mode:
+            forward = '|c<From ' + console.name + '> |n' + msg
+            for other in self.manned(mode):
+                if other != console:
+                    self.send(other, forward)
+
+    def notify(self, msg, mode=None):
+        """Show `msg` on every manned console, or on those in `mode`."""
+        for console in self.manned(mode):
+            self.send(console, msg)
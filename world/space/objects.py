@@ -1,86 +1,158 @@
 from typeclasses.objects import Object
-from evennia import search_channel
 from evennia.utils import lazy_property
 from world.space.systems import *
+from world.space.engine import get_engine, now
+from world.space import interest, kinematics, links, motion, shards, snapshot, spatial, turns
+from world.space.announce import announce
+from world.space.contacts import drop_contacts
+from world.space.notify import ConsoleBus
+from world.space.offload import offload
+from world.space.state import SpaceState
 from world.space.templates import apply_template
 
+# Non-zero while world/space/fleet.py is spawning: the batch then supplies
+# the attributes, tags and template that at_object_creation would set.
+_SPAWNING = [0]
+
+def initial_attributes(pos=None):
+    """
+    Attributes every new spaceobj starts with, as (key, value) pairs.
+    """
+    return [('spaceframe', None),
+            #Movement info
+            ('heading', {'xy':0,'z':0}),
+            ('d_heading', {'xy':0,'z':0}),
+            ('speed', 0.0),
+            ('d_speed', 0.0),
+            ('course', head2course(0, 0)),
+            ('dest', Vector3(0, 0, 0)),
+            ('pos', Vector3(0, 0, 0) if pos is None else pos),
+            #Interaction info
+            ('scandata', {"atmosphere":None,"lifesigns":None,"composition":None,"engineering":None}),
+            ('landing_pads', {}),
+            ('docking_ports', {}),
+            ('airlocks', {}),
+            ('docked', None)]
+
 class SpaceObject(Object):
     """
     Base class for all objects in the space system
     """
+    # Tag category naming the kind of spaceobj, besides "spaceobj".
+    kind = None
+    template = None
 
     def at_object_creation(self):
         super(SpaceObject, self).at_object_creation()
-        search_channel('Space')[0].msg(self.name + ' added to space system.')
-        self.db.spaceframe = None
-        self.db.consoles = []
-        self.db.local = []
-        #Movement info
-        self.db.heading = {'xy':0,'z':0}
-        self.db.d_heading = {'xy':0,'z':0}
-        self.db.speed = 0.0
-        self.db.d_speed = 0.0
-        self.db.course = head2course(0, 0)
-        self.db.dest = Vector3(0, 0, 0)
-        self.db.pos = Vector3(0, 0, 0)
-        #Interaction info
-        self.db.scandata = {"atmosphere":None,"lifesigns":None,"composition":None,"engineering":None}
-        self.db.landing_pads = {}
-        self.db.docking_ports = {}
-        self.db.airlocks = {}
-        self.db.docked = None
+        if _SPAWNING[0]:
+            return
+        announce(self.name + ' added to space system.',
+                 'spaceobjs added to space system', self.name)
+        for key, value in initial_attributes():
+            self.attributes.add(key, value)
         self.tags.add(str(self), category="spaceobj")
+        if self.kind:
+            self.tags.add(str(self), category=self.kind)
+        if self.template:
+            apply_template(self, self.template)
+        links.register(self)
+        spatial.update_position(self)
 
     @lazy_property
     def systems(self):
         return SystemHandler(self)
 
+    @lazy_property
+    def state(self):
+        return SpaceState(self)
+
+    @lazy_property
+    def bus(self):
+        return ConsoleBus(self)
+
     def reset(self):
         """Resets the object to sane defaults at 0,0,0"""
-        self.location = self.home
-        self.db.pos = Vector3(0, 0, 0)
-        self.db.speed = 0.0
+        state = self.state
         self.db.d_speed = 0.0
-        self.db.course = head2course(0, 0)
-        self.db.heading = {'xy':0,'z':0}
+        state.course = head2course(0, 0)
+        state.heading = {'xy':0,'z':0}
+        state.turn = None
         self.db.d_heading = {'xy':0,'z':0}
+        get_engine().unsubscribe(self, 'heading')
+        UpdatePosition(self, Vector3(0, 0, 0), 0.0)
+        # Through move_to, so at_after_move moves the ship's index entry,
+        # interest and sensor pairs over to its home.
+        self.move_to(self.home, quiet=True)
 
     def at_object_delete(self):
         """
         Clean up.
         """
-        other = self.location.contents
-        for other in other:
-            if other.db.spaceframe and self in other.systems.sensors.contacts:
-                for console in other.db.consoles:
-                    if "helm" in console.db.current_modes:
-                        console.notify("Lost contact: %s" % (self))
-                del other.systems.sensors.contacts[self]
-        for console in self.db.consoles:
-            console.db.spaceobj = None
-        for room in self.db.local:
-            room.db.spaceobj = None
-        search_channel('Space')[0].msg(
-            "%s removed from space system." % (self.name))
+        for other in drop_contacts(self):
+            other.bus.notify("Lost contact: %s" % (self), "helm")
+        get_engine().remove(self)
+        spatial.forget(self)
+        shards.forget(self)
+        if kinematics.enabled():
+            kinematics.get_backend().remove(self)
+        self.state.discard()
+        snapshot.forget(self)
+        links.forget(self)
+        interest.forget(self)
+        announce("%s removed from space system." % (self.name),
+                 'spaceobjs removed from space system', self.name)
         return 1
+    def get_pos(self, at=None):
+        """
+        Position at time `at` (default now), evaluated from the motion
+        segment.
+        """
+        state = self.state
+        segment = state.segment
+        if segment is None:
+            return state.pos
+        return motion.position_at(segment, now() if at is None else at)
+
+    def moving(self):
+        """
+        True if the ship is moving or about to.
+        """
+        segment = self.state.segment
+        return segment is not None and motion.moving(segment)
+
     def position(self):
-        vector = Vector3.from_points([0,0,0], self.db.pos)
-        x, y, z = vector
-        r = sqrt(x * x + y * y + z * z)
-        xyang = (round(degrees(atan2(x, y)),2)) % 360
-        if xyang > 180:
-            xyang -=360
-        zang = (round(degrees(atan2(z, sqrt(x * x + y * y))),2)) % 360
-        if zang > 180:
-            zang -=360
-        distance = self.dist3d([0, 0, 0])
-        return [xyang, zang, round(distance, 6)]
+        pos = self.get_pos()
+        xyang, zang = bearing_between((0, 0, 0), pos)
+        return [xyang, zang, round(pos.get_length(), 6)]
+
+    def at_after_move(self, source_location, **kwargs):
+        super(SpaceObject, self).at_after_move(source_location, **kwargs)
+        spatial.relocate(self, source_location)
+        interest.relocate(self, source_location)
+        UpdateSensorPairs(self, source_location)
 
     def set_pos(self, x, y, z):
-        self.db.pos = Vector3(x, y, z)
+        UpdatePosition(self, Vector3(x, y, z))
 
     def heading(self):
-        return [self.db.heading['xy'], self.db.heading['z']]
+        """
+        Current heading [xy, z], interpolated if the ship is turning.
+        """
+        state = self.state
+        turn = state.turn
+        if turn is not None:
+            return turns.heading_at(turn, now())
+        heading = state.heading
+        return [heading['xy'], heading['z']]
+
+    def course(self):
+        """
+        Current unit course vector, following the heading through a turn.
+        """
+        state = self.state
+        if state.turn is None:
+            return state.course
+        return head2course(*self.heading())
 
     def setheading(self, heading):
         self.db.d_heading['xy'] = float(heading[0])
@@ -89,10 +161,18 @@ class SpaceObject(Object):
         UpdateHeading(self, 1)
 
     def move_to_coord(self,xyhead, zhead, distance):
-        self.db.pos = Vector3(head2course(xyhead, zhead)).scale(distance)
+        UpdatePosition(self, head2course(xyhead, zhead).scale(distance))
 
     def speed(self):
-        return self.db.speed
+        state = self.state
+        segment = state.segment
+        if segment is None:
+            return state.speed
+        return motion.speed_at(segment, now())
+
+    def velocity(self):
+        """Velocity vector in km/s."""
+        return self.course().get_scalar_mul(self.speed())
 
     def maxspeed(self):
         # TODO: Need to add function to determine max speed
@@ -106,7 +186,7 @@ class SpaceObject(Object):
         powerpool = 0
         for system in self.systems.all:
             system = self.systems[system]
-            if system._data['type'] == 'producer':
+            if system.type == 'producer':
                 powerpool += system.current_power
         return powerpool
     # default, return status. If option is provided, change status and return
@@ -115,11 +195,20 @@ class SpaceObject(Object):
             self.db.sensors = status
         self.db.sensors
 
-    def sensor_range(self):
+    def sensor_range(self, at=None):
+        """
+        Hardcoded sensor range for now. Follows a sensor power ramp to time
+        `at` if given.
+        """
+        sensors = self.systems.sensors
+        power = sensors.current_power if at is None else sensors.value_at(at)
+        return power * self.sensor_scale()
+
+    def sensor_scale(self):
         """
-        Hardcoded sensor range for now.
+        Sensor range, in light seconds, per unit of sensor power.
         """
-        return self.systems.sensors.current_power * 0.00003 * self.systems.sensors.health()
+        return 0.00003 * self.systems.sensors.health()
     def semote(self, msg):
         """
         Broadcasts action to sensors of other spaceobjs
@@ -131,9 +220,9 @@ class SpaceObject(Object):
         return "|yU|n"
 
     def dist3d(self, contact):
-        x, y, z = self.db.pos
+        x, y, z = self.get_pos()
         try:
-            xx, yy, zz = contact.db.pos
+            xx, yy, zz = contact.get_pos()
         except:
             xx, yy, zz = contact
         dx = x - xx
@@ -143,28 +232,61 @@ class SpaceObject(Object):
 
     #returns relative bearing to spaceobj
     def bearing_to(self, contact):
-        vector = Vector3.from_points(self.db.pos, contact.db.pos)
-        x, y, z = vector
-        r = sqrt(x * x + y * y + z * z)
-        xyang = (round(degrees(atan2(x, y)),2) - self.db.heading['xy']) % 360
-        if xyang > 180:
-            xyang -=360
-        zang = (round(degrees(atan2(z, sqrt(x * x + y * y))),2) - self.db.heading['z']) % 360
-        if zang > 180:
-            zang -=360
-        return [xyang, zang]
+        xyhead, zhead = self.heading()
+        return bearing_between(self.get_pos(), contact.get_pos(),
+                               xyhead, zhead)
+
+    def contact_solution(self, contacts, sort=True):
+        """
+        Range, bearing and relative velocity to many contacts in one pass.
+        Args:
+            contacts (iterable): spaceobjs; deleted objects are skipped
+            sort (bool): order the results by increasing range
+        Returns:
+            (tuple): parallel lists (contacts, ranges, bearings, velocities),
+            with relative velocities in km/s
+        """
+        contacts, args = self._contact_snapshot(contacts)
+        return self._contact_result(contacts, rank_contacts(*args, sort=sort))
+
+    def contact_solution_deferred(self, contacts, sort=True):
+        """
+        contact_solution with the math run off the reactor when the contact
+        list is large (see world/space/offload.py).
+        Returns:
+            (Deferred): fires with the contact_solution tuple on the
+            reactor thread; contacts deleted meanwhile are left out
+        """
+        contacts, args = self._contact_snapshot(contacts)
+        deferred = offload(rank_contacts, *args, sort=sort, size=len(contacts))
+        return deferred.addCallback(
+            lambda ranked: self._contact_result(contacts, ranked))
+
+    def _contact_snapshot(self, contacts):
+        """Plain-data arguments for rank_contacts."""
+        contacts = [contact for contact in contacts if contact and contact.pk]
+        return contacts, (tuple(self.get_pos()), self.heading(),
+                          tuple(self.velocity()),
+                          [tuple(contact.get_pos()) for contact in contacts],
+                          [tuple(contact.velocity()) for contact in contacts])
+
+    def _contact_result(self, contacts, ranked):
+        order, ranges, bearings, velocities = ranked
+        keep = [i for i, index in enumerate(order) if contacts[index].pk]
+        if len(keep) < len(order):
+            ranges = [ranges[i] for i in keep]
+            bearings = [bearings[i] for i in keep]
+            velocities = [velocities[i] for i in keep]
+            order = [order[i] for i in keep]
+        return [contacts[i] for i in order], ranges, bearings, velocities
 
 class Ship(SpaceObject):
-    def at_object_creation(self):
-        super(Ship, self).at_object_creation()
-        self.tags.add(str(self), category="ship")
-        apply_template(self, 'DefaultShip')
+    kind = "ship"
+    template = 'DefaultShip'
 
 class Station(SpaceObject):
-    def at_object_creation(self):
-        super(Station, self).at_object_creation()
-        self.tags.add(str(self), category="station")
-        apply_template(self, 'DefaultStation')
+    kind = "station"
+    template = 'DefaultStation'
 
 class Console(Object):
     """
@@ -187,14 +309,13 @@ class Console(Object):
         If the console is dropped in a location on a spaceobj, initialize the console when we drop it so there's nothing to worry about setting up!
         Note - the room must be attached to a spaceobj!
         """
-        try:
-            self.db.spaceobj = self.location.db.spaceobj
-            self.db.spaceobj.db.consoles.append(self)
-            search_channel('Space')[0].msg('Console: %s has been attached to %s.' % (
-                self.name, self.location.db.spaceobj))
-        except:
-            dropper.msg(
+        spaceobj = links.spaceobj_of(self.location) if self.location else None
+        if not spaceobj:
+            return dropper.msg(
                 "|RThis location is not part of a space object so it hasn't been initialized!")
+        links.attach(self, spaceobj, links.CONSOLE)
+        announce('Console: %s has been attached to %s.' % (self.name, spaceobj),
+                 'consoles attached', self.name)
 
     def at_get(self, getter):
         """
@@ -202,14 +323,10 @@ class Console(Object):
         """
         if self.db.operator:
             self.db.operator.unman()
-        if self.db.spaceobj:
-            try:
-                self.db.spaceobj.db.consoles.remove(self)
-            except:
-                search_channel('Space')[0].msg('Console: There was a problem with %s, but it has been corrected.' % self.name)
-            del self.db.spaceobj
-            search_channel('Space')[0].msg('Console: %s removed from %s.' % (
-                self.name, self.location.location.db.spaceobj))
+        spaceobj = links.detach(self, links.CONSOLE)
+        if spaceobj:
+            announce('Console: %s removed from %s.' % (self.name, spaceobj),
+                     'consoles removed', self.name)
 
     def at_object_delete(self):
         """
@@ -217,13 +334,11 @@ class Console(Object):
         """
         if self.db.operator:
             self.db.operator.unman()
-        if self.db.spaceobj:
-            try:
-                self.db.spaceobj.db.consoles.remove(self)
-            except:
-                del self.db.spaceobj
-            search_channel('Space')[0].msg('Console: %s removed from %s on %s.' % (
-                self.name, self.location.location, self.location.db.spaceobj))
+        spaceobj = links.detach(self, links.CONSOLE)
+        if spaceobj:
+            announce('Console: %s removed from %s on %s.' % (
+                self.name, self.location, spaceobj),
+                'consoles removed', self.name)
         return 1
 
     def get_display_name(self, looker, **kwargs):
@@ -244,12 +359,25 @@ class Console(Object):
             self.db.valid_modes) > 1 else '', ', '.join(self.db.valid_modes))
         return string + current_modes + valid_modes
 
+    def update_bus(self):
+        """
+        Re-index this console on its spaceobj's notification bus. Call after
+        changing its operator, modes or spaceobj.
+        """
+        spaceobj = links.spaceobj_of(self)
+        if spaceobj:
+            spaceobj.bus.update(self)
+            interest.refresh(spaceobj)
+
     def notify(self, msg, *args):
+        """
+        Show `msg` to this console's operator. If a mode is given, forward
+        it to the other consoles in that mode too.
+        """
+        spaceobj = links.spaceobj_of(self)
+        if spaceobj:
+            return spaceobj.bus.send(self, msg, args[0] if args else None)
         try:
             self.db.operator.msg('|w<|g{}: |b{}|w>'.format(self.name.title(), msg))
         except:
             return
-        if args:
-            for console in self.db.spaceobj.db.consoles:
-                if args[0] in console.db.current_modes and console != self:
-                    console.notify('|c<From ' + self.name + '> |n' + msg)
@@ -0,0 +1,63 @@
+"""
+Offload
+
+Runs the pure-math stages of expensive space work - full sensor sweeps,
+big contact reports - on a thread pool, so the Twisted reactor keeps
+serving every other player's commands while one ship does something heavy.
+
+Callers split the work in three: snapshot plain data (positions,
+velocities, Tracks) on the reactor thread, hand a function of that data
+alone to `offload()`, and apply its result in a callback on the returned
+Deferred. Twisted runs the callback back on the reactor thread, so game
+objects and the database are only ever touched there. The math is NumPy
+where the batch is large (see utils.solve_contacts), and NumPy releases the
+GIL inside its array kernels.
+
+`SPACE_OFFLOAD_THREADS` sets the pool size; 0 runs every stage inline.
+Batches smaller than `OFFLOAD_MIN` items also run inline, as do all stages
+while the reactor is not running (offline tools such as the benchmark).
+Inline stages fire their Deferred before `offload()` returns, so the
+result is applied synchronously, exactly as before.
+"""
+from django.conf import settings
+from twisted.internet import defer, reactor, threads
+from twisted.python.threadpool import ThreadPool
+
+# Batches below this size run inline: the hand-off costs more than they do.
+OFFLOAD_MIN = 32
+
+_POOL = []
+
+
+def enabled(size=None):
+    """True if a stage over `size` items would run on the pool."""
+    if size is not None and size < OFFLOAD_MIN:
+        return False
+    return (getattr(settings, 'SPACE_OFFLOAD_THREADS', 0) > 0 and
+            reactor.running)
+
+
+def get_pool():
+    """Return the space thread pool, starting it on first use. It is kept
+    apart from the reactor's own pool, which Django queries run on."""
+    if not _POOL:
+        pool = ThreadPool(minthreads=0,
+                          maxthreads=getattr(settings, 'SPACE_OFFLOAD_THREADS', 0),
+                          name='space-offload')
+        pool.start()
+        reactor.addSystemEventTrigger('during', 'shutdown', pool.stop)
+        _POOL.append(pool)
+    return _POOL[0]
+
+
+def offload(func, *args, **kwargs):
+    """Run `func(*args, **kwargs)` off the reactor when worthwhile.
+    Keyword Args:
+        size (int): number of items in the batch, for the OFFLOAD_MIN check
+    Returns:
+        (Deferred): fires with the result, on the reactor thread
+    """
+    size = kwargs.pop('size', None)
+    if not enabled(size):
+        return defer.maybeDeferred(func, *args, **kwargs)
+    return threads.deferToThreadPool(reactor, get_pool(), func, *args, **kwargs)
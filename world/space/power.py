@@ -0,0 +1,95 @@
+"""
+Power flow
+
+Solver for a spaceobj's power grid. The grid (the 'router' system) moves
+`rate` units of power per second, shared evenly between the producers that
+are still ramping towards their set point, and separately between the
+consumers that are. Between two events - a system reaching its set point or
+coming online - every ramp is linear, so the solver hands each ramping
+System a start time and slope (see `System.start_ramp`) and reports when the
+next event is due. Power levels are evaluated lazily from the ramp in the
+meantime; nothing needs to run until that event.
+
+UpdatePower in world/space/systems.py drives this: it settles the ramps at
+each event, turns crossings into console notifications, re-plans, and asks
+the engine to wake it at the next event.
+"""
+
+# System types that draw on the grid's ramp rate, each sharing its own pool.
+RAMP_TYPES = ('producer', 'consumer')
+# Smallest step, relative to the clock value, that an event is scheduled
+# ahead. Times are wall-clock seconds, so a gap of a few microwatts can round
+# to no time at all and stall the ramp; this keeps every plan moving forward.
+MIN_STEP = 1e-15
+
+
+def plan(systems, rate, at):
+    """Start ramps for every system short of its set point.
+    Args:
+        systems (list): System objects of one spaceobj
+        rate (float): grid ramp rate, in power units per second
+        at (float): time the ramps start
+    Returns:
+        (float or None): time of the next event, or None if nothing ramps
+    """
+    upcoming = None
+    if not rate or rate <= 0:
+        return upcoming
+    for kind in RAMP_TYPES:
+        group = [system for system in systems
+                 if system.type == kind and system.current_power != system.set_power]
+        if not group:
+            continue
+        share = float(rate) / len(group)
+        for system in group:
+            current = system.current_power
+            target = system.set_power
+            system.start_ramp(at, share if target > current else -share)
+            due = abs(target - current) / share
+            minimum = system.min_power
+            if current < minimum <= target:
+                # Comes online on reaching its minimum...
+                due = min(due, (minimum - current) / share)
+            elif target < minimum <= current:
+                # ...and offline on dropping below it: at its minimum it is
+                # still online, so the plan made there wakes a MIN_STEP on.
+                due = min(due, (current - minimum) / share)
+            due = max(due, abs(at) * MIN_STEP or MIN_STEP)
+            if upcoming is None or at + due < upcoming:
+                upcoming = at + due
+    return upcoming
+
+
+def ramp_value(level, ramp, at):
+    """Power level at time `at` of a system that was at `level` when `ramp`
+    (start, slope, target) began, or `level` if there is no ramp."""
+    if ramp is None:
+        return level
+    start, slope, target = ramp
+    value = level + slope * (at - start)
+    # Snap to the set point rather than leaving rounding residue.
+    if (slope > 0 and value >= target - 1e-9) or (slope < 0 and value <= target + 1e-9):
+        return target
+    return value
+
+
+def settle(systems, at):
+    """Fix every ramping system at its level at time `at`.
+    Returns:
+        (list): (system, event) tuples, where event is 'online', 'offline'
+        or 'done' (reached its set point)
+    """
+    events = []
+    for system in systems:
+        if not system.ramping:
+            continue
+        before = system.ramp_start
+        after = system.settle(at)
+        minimum = system.min_power
+        if before < minimum <= after:
+            events.append((system, 'online'))
+        elif after < minimum <= before:
+            events.append((system, 'offline'))
+        if after == system.set_power:
+            events.append((system, 'done'))
+    return events
@@ -0,0 +1,186 @@
+"""
+Tick profiler
+
+Built-in instrumentation for the space engine. For every tick it records
+the wall time and number of objects handled by each phase, the total tick
+time, whether the tick overran the engine interval, how many database
+writes the space state layer issued, and how far the simulation clock is
+behind the wall clock (lag). Phase times are kept as histograms so
+occasional spikes show up next to the averages.
+
+Staff read it with `@spacestat`; `@spacestat/json` (or `dump()`) gives the
+same data in machine-readable form.
+"""
+import json
+from time import time
+from timeit import default_timer
+from world.space import state
+
+# Upper bounds of the histogram buckets, in milliseconds. Anything slower
+# than the last bound lands in a final overflow bucket.
+BUCKETS = (0.1, 0.5, 1, 5, 10, 50, 100, 500, 1000)
+
+_PROFILER = None
+
+
+def get_profiler():
+    """Return the shared TickProfiler."""
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = TickProfiler()
+    return _PROFILER
+
+
+class PhaseStats(object):
+    """Running totals and histogram for one phase."""
+    __slots__ = ('calls', 'objects', 'total', 'peak', 'last', 'histogram')
+
+    def __init__(self):
+        self.calls = 0
+        self.objects = 0
+        self.total = 0.0
+        self.peak = 0.0
+        self.last = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, elapsed, objects):
+        self.calls += 1
+        self.objects += objects
+        self.total += elapsed
+        self.last = elapsed
+        if elapsed > self.peak:
+            self.peak = elapsed
+        ms = elapsed * 1000.0
+        for i, bound in enumerate(BUCKETS):
+            if ms <= bound:
+                self.histogram[i] += 1
+                break
+        else:
+            self.histogram[-1] += 1
+
+    def as_dict(self):
+        return {'calls': self.calls,
+                'objects': self.objects,
+                'total_ms': self.total * 1000.0,
+                'mean_ms': self.total * 1000.0 / self.calls if self.calls else 0.0,
+                'peak_ms': self.peak * 1000.0,
+                'last_ms': self.last * 1000.0,
+                'histogram': self.histogram[:]}
+
+
+class TickProfiler(object):
+    """Collects per-tick and per-phase timings for the space engine.
+    Args:
+        interval (float): the engine's tick interval, for overrun detection
+    """
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self.reset()
+
+    def reset(self):
+        self.started = time()
+        self.ticks = 0
+        self.overruns = 0
+        self.last_overrun = None
+        self.writes = 0
+        self.last_writes = 0
+        self.peak_writes = 0
+        self.lag = 0.0
+        self.peak_lag = 0.0
+        self.steps = 0
+        self.deferred = 0
+        self.phases = {}
+        self.tick = PhaseStats()
+        self._tick_start = None
+        self._writes_start = 0
+
+    clock = staticmethod(default_timer)
+
+    def start_tick(self):
+        self._tick_start = default_timer()
+        self._writes_start = state.writes()
+
+    def record(self, phase, started, objects=0):
+        """Record a phase that began at `started` (from `clock()`)."""
+        stats = self.phases.get(phase)
+        if stats is None:
+            stats = self.phases[phase] = PhaseStats()
+        stats.add(default_timer() - started, objects)
+
+    def record_lag(self, lag, steps, deferred=False):
+        """Record how far behind the clock a tick left the simulation, how
+        many fixed steps it covered and whether it ran out of budget."""
+        self.lag = lag
+        if lag > self.peak_lag:
+            self.peak_lag = lag
+        self.steps += steps
+        if deferred:
+            self.deferred += 1
+
+    def end_tick(self, objects=0):
+        if self._tick_start is None:
+            return
+        elapsed = default_timer() - self._tick_start
+        self._tick_start = None
+        self.ticks += 1
+        self.tick.add(elapsed, objects)
+        if elapsed > self.interval:
+            self.overruns += 1
+            self.last_overrun = time()
+        writes = state.writes() - self._writes_start
+        self.writes += writes
+        self.last_writes = writes
+        if writes > self.peak_writes:
+            self.peak_writes = writes
+
+    def as_dict(self):
+        """All collected statistics as plain data."""
+        return {'since': self.started,
+                'interval': self.interval,
+                'ticks': self.ticks,
+                'overruns': self.overruns,
+                'last_overrun': self.last_overrun,
+                'lag': {'last_s': self.lag,
+                        'peak_s': self.peak_lag,
+                        'steps': self.steps,
+                        'deferred_ticks': self.deferred},
+                'db_writes': {'total': self.writes,
+                              'last_tick': self.last_writes,
+                              'peak_tick': self.peak_writes,
+                              'per_tick': float(self.writes) / self.ticks if self.ticks else 0.0},
+                'tick': self.tick.as_dict(),
+                'phases': dict((name, stats.as_dict())
+                               for name, stats in self.phases.items()),
+                'buckets_ms': list(BUCKETS)}
+
+    def dump(self, path=None):
+        """Return the statistics as JSON, also writing them to `path`."""
+        data = json.dumps(self.as_dict(), indent=2, sort_keys=True)
+        if path:
+            with open(path, 'w') as f:
+                f.write(data)
+        return data
+
+    def report(self):
+        """Human-readable summary for staff."""
+        lines = ['|[B|w[|ySpace Engine|w]|n Ticks: {} Overruns: {} DB writes/tick: {:.2f} (peak {})'.format(
+            self.ticks, self.overruns,
+            float(self.writes) / self.ticks if self.ticks else 0.0,
+            self.peak_writes)]
+        lines.append('|nLag: {:.3f}s (peak {:.3f}s) Steps: {} Deferred ticks: {}'.format(
+            self.lag, self.peak_lag, self.steps, self.deferred))
+        lines.append('|C-' * 78)
+        lines.append('|c%-10s %8s %10s %10s %10s %10s' % (
+            'Phase', 'Calls', 'Objects', 'Mean ms', 'Peak ms', 'Last ms'))
+        rows = sorted(self.phases.items()) + [('tick', self.tick)]
+        for name, stats in rows:
+            data = stats.as_dict()
+            lines.append('|n%-10s %8d %10d %10.3f %10.3f %10.3f' % (
+                name, data['calls'], data['objects'], data['mean_ms'],
+                data['peak_ms'], data['last_ms']))
+        lines.append('|C-' * 78)
+        header = ' '.join('<={}'.format(bound) for bound in BUCKETS) + ' more'
+        lines.append('|cHistogram (ms):|n ' + header)
+        for name, stats in rows:
+            lines.append('|n%-10s %s' % (name, ' '.join(str(n) for n in stats.histogram)))
+        return '\n'.join(lines)
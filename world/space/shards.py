@@ -0,0 +1,334 @@
+"""
+Sector shards
+
+Optional multi-process sensor prediction. With `SPACE_SHARDS` set, every
+space location (sector room) is owned by one of that many worker
+processes, which keeps a Track (see world/space/horizon.py) for each
+spaceobj in its sectors and does the expensive part of sensor planning:
+when a spaceobj changes course, speed or sensor power, working out when it
+next crosses the sensor range of every observer near it and when every
+contact near it crosses its own range.
+
+The main process stays authoritative. UpdateSensors and UpdateSensorPairs
+in world/space/systems.py push fresh tracks to the owning shard and ask it
+to plan; a spaceobj moving to another location is handed from one shard to
+the other. Requests are batched and sent when an engine tick ends, the
+workers answer while the reactor is idle, and the engine collects the
+answers when the next tick starts and schedules the crossings as ordinary
+timers. Each worker has at most one batch in flight; while it is busy,
+newer tracks and plan requests for the same spaceobj replace the queued
+ones, so a slow worker falls behind by ticks instead of blocking the
+reactor. Locations are spread over the workers by id, so with as many
+workers as cores a large universe plans on all of them.
+
+With `SPACE_SHARDS = 0` (the default), or if a worker dies, crossings are
+planned in-process as before.
+
+Where multiprocessing has start methods (Python 3), workers are spawned: a
+forked copy of the server would inherit the reactor and the database
+connections. A spawned worker is a fresh interpreter that gets the
+server's sys.path and environment, so importing this module brings in the
+Django settings named by DJANGO_SETTINGS_MODULE, and nothing else of
+Evennia's is set up. Spawning also re-imports the server's main script as
+`__mp_main__`; under twistd that is the twistd launcher, whose `run()` is
+guarded by `if __name__ == '__main__'`, so no second server starts. On
+Python 2 the workers are forked instead; `serve()` never touches the
+reactor or the database, and a worker exits without running the server's
+shutdown handlers.
+"""
+import multiprocessing
+from collections import OrderedDict
+from math import sqrt
+from django.conf import settings
+from evennia.utils import logger
+from world.space import horizon
+
+_POOL = None
+
+
+def enabled():
+    """True if crossings are planned by shard workers."""
+    if _POOL is not None:
+        return not _POOL.broken
+    return getattr(settings, 'SPACE_SHARDS', 0) > 0
+
+
+def get_pool():
+    """Return the shared ShardPool, starting its workers on first use."""
+    global _POOL
+    if _POOL is None:
+        _POOL = ShardPool(getattr(settings, 'SPACE_SHARDS', 0))
+        _POOL.start()
+    return _POOL
+
+
+def track(obj):
+    """Send the current Track of `obj` to the shard owning its location."""
+    if enabled():
+        get_pool().track(obj)
+
+
+def relocate(obj, source_location):
+    """Hand `obj` over after it moved from `source_location`."""
+    if enabled():
+        get_pool().relocate(obj, source_location)
+
+
+def forget(obj):
+    """Drop `obj` from its shard, e.g. when it is deleted."""
+    if _POOL is not None:
+        _POOL.forget(obj)
+
+
+def plan(obj, at):
+    """Ask the shard owning `obj` to plan every sensor crossing involving
+    it from time `at`, with its track brought up to date first."""
+    pool = get_pool()
+    pool.track(obj)
+    pool.plan(obj, at)
+
+
+def exchange():
+    """Send queued requests and apply every answer that has arrived.
+    Returns:
+        (int): number of crossings scheduled
+    """
+    if _POOL is None or _POOL.broken:
+        return 0
+    scheduled = _POOL.collect()
+    _POOL.flush()
+    return scheduled
+
+
+def flush():
+    """Send queued requests without waiting for answers."""
+    if _POOL is not None and not _POOL.broken:
+        _POOL.flush()
+
+
+def stop():
+    """Shut the workers down."""
+    global _POOL
+    if _POOL is not None:
+        _POOL.stop()
+        _POOL = None
+
+
+def _context():
+    """multiprocessing's spawn context, or the module itself (which forks)
+    on Python 2."""
+    get_context = getattr(multiprocessing, 'get_context', None)
+    if get_context is None:
+        return multiprocessing
+    return get_context('spawn')
+
+
+class ShardPool(object):
+    """
+    The worker processes and the main-process side of their pipes.
+    Args:
+        size (int): number of worker processes
+    """
+    def __init__(self, size):
+        self.size = max(int(size), 1)
+        self.conns = []
+        self.processes = []
+        # Per shard: (location, key) -> Track, or None to drop it, and
+        # key -> (location, time) plan requests; both sent on flush.
+        self.tracks = [OrderedDict() for shard in range(self.size)]
+        self.plans = [OrderedDict() for shard in range(self.size)]
+        self.busy = [False] * self.size
+        self.where = {}
+        self.objects = {}
+        self.broken = False
+
+    def start(self):
+        context = _context()
+        for shard in range(self.size):
+            conn, child = context.Pipe()
+            process = context.Process(target=serve, args=(child,),
+                                      name='space-shard-%d' % shard)
+            process.daemon = True
+            process.start()
+            child.close()
+            self.conns.append(conn)
+            self.processes.append(process)
+
+    def shard(self, location):
+        """Index of the worker that owns `location`."""
+        return location.id % self.size
+
+    def track(self, obj):
+        location = obj.location
+        if location is None or not obj.pk:
+            self.forget(obj)
+            return
+        where = (self.shard(location), location.id)
+        if self.where.get(obj, where) != where:
+            self.forget(obj)
+        self.where[obj] = where
+        self.objects[obj.id] = obj
+        self.tracks[where[0]][where[1:] + (obj.id,)] = horizon.Track.of(obj)
+
+    def forget(self, obj):
+        where = self.where.pop(obj, None)
+        if where is None:
+            return
+        self.objects.pop(obj.id, None)
+        self.tracks[where[0]][where[1:] + (obj.id,)] = None
+        self.plans[where[0]].pop(obj.id, None)
+
+    def relocate(self, obj, source_location):
+        """Boundary crossing: the old shard drops the track, the new one
+        picks it up."""
+        if obj in self.where:
+            self.forget(obj)
+            self.track(obj)
+
+    def plan(self, obj, at):
+        where = self.where.get(obj)
+        if where is None:
+            return
+        plans = self.plans[where[0]]
+        plans.pop(obj.id, None)
+        plans[obj.id] = (where[1], at)
+
+    def flush(self):
+        """Send each idle worker everything queued for it."""
+        for shard in range(self.size):
+            tracks = self.tracks[shard]
+            plans = self.plans[shard]
+            if self.busy[shard] or not (tracks or plans):
+                continue
+            batch = [('track', location, key, track)
+                     for (location, key), track in tracks.items()]
+            batch.extend(('plan', location, key, at, horizon.HORIZON)
+                         for key, (location, at) in plans.items())
+            self.tracks[shard] = OrderedDict()
+            self.plans[shard] = OrderedDict()
+            try:
+                self.conns[shard].send(batch)
+            except (EOFError, OSError):
+                self._break(shard)
+                return
+            self.busy[shard] = True
+
+    def collect(self):
+        from world.space.systems import SchedulePair
+        scheduled = 0
+        for shard, conn in enumerate(self.conns):
+            try:
+                while conn.poll():
+                    replies = conn.recv()
+                    self.busy[shard] = False
+                    # Later answers for a pair overwrite earlier ones, and
+                    # a pipe delivers them in order.
+                    for planned in replies:
+                        for observer_key, contact_key, when in planned:
+                            observer = self.objects.get(observer_key)
+                            contact = self.objects.get(contact_key)
+                            if observer is None or contact is None:
+                                continue
+                            if observer.ndb.sensor_pairs is None:
+                                continue
+                            SchedulePair(observer, contact, when)
+                            scheduled += 1
+            except (EOFError, OSError):
+                self._break(shard)
+                break
+        return scheduled
+
+    def stop(self):
+        for conn in self.conns:
+            try:
+                conn.send([('stop',)])
+            except (EOFError, OSError):
+                pass
+        for process in self.processes:
+            process.join(1.0)
+            if process.is_alive():
+                process.terminate()
+        for conn in self.conns:
+            conn.close()
+        self.conns = []
+        self.processes = []
+
+    def _break(self, shard):
+        """Fall back to planning in-process; the regular sensor sweeps
+        re-plan everything within one horizon."""
+        logger.log_err("Space shard %d stopped responding; planning sensor "
+                       "crossings in-process." % shard)
+        self.broken = True
+
+
+#------------------------------------------------------------
+#
+# Worker process
+#
+#------------------------------------------------------------
+
+def serve(conn):
+    """Worker main loop: keep the tracks of the sectors this worker owns
+    and answer plan requests, one reply batch per request batch. A track
+    of None drops the spaceobj."""
+    sectors = {}
+    while True:
+        try:
+            batch = conn.recv()
+        except EOFError:
+            return
+        replies = []
+        for message in batch:
+            kind = message[0]
+            if kind == 'track':
+                kind, location, key, track = message
+                if track is not None:
+                    sectors.setdefault(location, {})[key] = track
+                    continue
+                tracks = sectors.get(location)
+                if tracks is not None:
+                    tracks.pop(key, None)
+                    if not tracks:
+                        del sectors[location]
+            elif kind == 'plan':
+                kind, location, key, at, ahead = message
+                replies.append(plan_sector(sectors.get(location, {}),
+                                           key, at, ahead))
+            elif kind == 'stop':
+                return
+        conn.send(replies)
+
+
+def plan_sector(tracks, key, at, ahead=horizon.HORIZON):
+    """Every sensor crossing involving the track `key` within `ahead`
+    seconds of `at`: its own contacts if it is sensing, and its crossings
+    of every sensing track near it.
+    Args:
+        tracks (dict): key -> Track for one sector
+        key: the track to plan for
+        at (float): time to plan from
+        ahead (float): horizon in seconds
+    Returns:
+        (list): (observer key, contact key, time or None) tuples
+    """
+    track = tracks.get(key)
+    if track is None:
+        return []
+    planned = []
+    x, y, z = track.position(at)
+    for other_key, other in tracks.items():
+        if other_key == key or not (track.sensing or other.sensing):
+            continue
+        ox, oy, oz = other.position(at)
+        dist = sqrt((ox - x) ** 2 + (oy - y) ** 2 + (oz - z) ** 2)
+        for observer_key, observer, contact in ((key, track, other),
+                                                (other_key, other, track)):
+            if not observer.sensing:
+                continue
+            radius = max(observer.sensor_range(at),
+                         observer.sensor_range(at + ahead))
+            if dist <= horizon.reach(observer, radius, ahead):
+                contact_key = other_key if observer is track else key
+                planned.append((observer_key, contact_key,
+                                horizon.crossing(observer, contact, at, ahead)))
+    return planned
@@ -0,0 +1,358 @@
+"""
+Space snapshot
+
+A binary copy of the whole simulation state, so a restart or reload doesn't
+have to unpickle every spaceobj's `pos`, `speed`, `heading`, `course`,
+`turn`, `segment` and `systems` attributes, and the engine's registry, one
+attribute at a time.
+
+The snapshot is written right after a batch flush of the space state (see
+world/space/state.py) - every SNAPSHOT_INTERVAL ticks and when the server
+stops or reloads - so it always matches the database at the moment it was
+taken. The file holds, after a fixed header:
+
+    ids      int64 dbrefs, sorted, one per spaceobj
+    motion   float64 x, y, z and speed per spaceobj (NaN when not numeric)
+    offsets  int64 start of each spaceobj's record in the record area
+    meta     pickled engine registry, {phase: [dbref, ...]}
+    records  one pickled dict per spaceobj with its remaining fields
+
+On start, `restore()` memory-maps the file and reads only the header and
+the registry; everything else is unpacked straight from the mapping when
+it is needed. A spaceobj's SpaceState and SystemHandler take their values
+from the snapshot the first time they are used instead of from its
+attributes (looking it up is a binary search on the ids, and the position
+and speed are four floats read from the motion section), and the engine
+fetches all its subscribers with one query. Restart time therefore doesn't
+depend on how many spaceobjs there are, only on how many are touched.
+
+The database stays the authority. Each snapshot carries a random token
+that is also stored in ServerConfig; the first space write to the database
+after a snapshot deletes the stored token, so a snapshot that no longer
+matches the database - after a crash, say - is never restored. Spaceobjs
+the server hasn't touched since the last restore are carried over to the
+next snapshot as they were.
+"""
+import os
+import struct
+from binascii import hexlify
+from bisect import bisect_left
+from mmap import mmap, ACCESS_READ
+from uuid import uuid4
+from django.conf import settings
+from evennia.server.models import ServerConfig
+from evennia.utils import logger
+from evennia.utils.dbserialize import from_pickle, to_pickle
+from world.space.utils import Vector3
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+SNAPSHOT_PATH = getattr(settings, 'SPACE_SNAPSHOT_PATH', os.path.join(
+    settings.GAME_DIR, 'server', 'space.snapshot'))
+# Ticks between snapshots, checked on flush ticks, so best a multiple of
+# SPACE_STATE_FLUSH_INTERVAL. 0 only snapshots on stop and reload.
+SNAPSHOT_INTERVAL = getattr(settings, 'SPACE_SNAPSHOT_INTERVAL', 300)
+TOKEN_KEY = 'space_snapshot_token'
+
+MAGIC = b'HYPSNAP1'
+# magic, token, spaceobj count, meta bytes, record bytes. Native byte
+# order throughout; the file is for this host.
+_HEADER = struct.Struct('=8s16sqqq')
+_ID = struct.Struct('=q')
+_SPAN = struct.Struct('=2q')
+_MOTION = struct.Struct('=4d')
+# Fields kept in the motion section rather than the pickled records.
+MOTION_FIELDS = ('pos', 'speed')
+RECORD_FIELDS = ('heading', 'course', 'turn', 'segment', 'systems')
+NAN = float('nan')
+
+# Returned by `restored()` for a field the snapshot doesn't hold.
+MISSING = object()
+
+# The restored snapshot, or None.
+_SNAPSHOT = [None]
+# Whether the stored token matches the snapshot file.
+_VALID = [False]
+# dbref -> spaceobj whose state or systems are loaded in this process
+_LIVE = {}
+
+
+class _Ids(object):
+    """The sorted dbrefs of a snapshot, read from the mapping on demand, so
+    that `bisect` can search them without unpacking them all."""
+    def __init__(self, memory, at, count):
+        self.memory = memory
+        self.at = at
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        if not 0 <= i < self.count:
+            raise IndexError(i)
+        return _ID.unpack_from(self.memory, self.at + 8 * i)[0]
+
+    def __iter__(self):
+        return iter(struct.unpack_from('=%dq' % self.count, self.memory, self.at))
+
+
+class Snapshot(object):
+    """
+    A snapshot file mapped into memory.
+    Args:
+        path (str): the file
+        handle (file): the open file
+        memory (mmap): the mapping of it
+    """
+    def __init__(self, path, handle, memory):
+        self.path = path
+        self.handle = handle
+        self.memory = memory
+        magic, self.token, count, meta_size, records_size = _HEADER.unpack_from(memory, 0)
+        if magic != MAGIC:
+            raise ValueError("not a space snapshot")
+        at = _HEADER.size
+        self.ids = _Ids(memory, at, count)
+        at += 8 * count
+        self.motion_at = at
+        at += 32 * count
+        self.offsets_at = at
+        at += 8 * (count + 1)
+        self.registry = pickle.loads(memory[at:at + meta_size])
+        self.records_at = at + meta_size
+        if self.records_at + records_size > len(memory):
+            raise ValueError("truncated space snapshot")
+        # index -> decoded record, with the fields not yet taken
+        self.decoded = {}
+        # dbrefs deleted since the snapshot was taken
+        self.dropped = set()
+
+    def __len__(self):
+        return len(self.ids)
+
+    def find(self, dbref):
+        """Index of `dbref` in the snapshot, or None."""
+        ids = self.ids
+        i = bisect_left(ids, dbref)
+        if i < len(ids) and ids[i] == dbref and dbref not in self.dropped:
+            return i
+        return None
+
+    def _record(self, i):
+        """The pickled record of spaceobj `i`."""
+        start, end = _SPAN.unpack_from(self.memory, self.offsets_at + 8 * i)
+        return self.memory[self.records_at + start:self.records_at + end]
+
+    def raw(self, i):
+        """Motion values and pickled record of spaceobj `i`, as stored."""
+        return (_MOTION.unpack_from(self.memory, self.motion_at + 32 * i),
+                self._record(i))
+
+    def take(self, i, field):
+        """The value of `field` for spaceobj `i`, or MISSING. Record fields
+        are handed out once; the caller keeps them from then on."""
+        if field in MOTION_FIELDS:
+            x, y, z, speed = _MOTION.unpack_from(self.memory, self.motion_at + 32 * i)
+            if field == 'speed':
+                if speed == speed:
+                    return speed
+            elif x == x:
+                return Vector3(x, y, z)
+            # NaN: the value wasn't a number and is in the record.
+        record = self.decoded.get(i)
+        if record is None:
+            record = self.decoded[i] = from_pickle(pickle.loads(self._record(i)))
+        return record.pop(field, MISSING)
+
+    def close(self):
+        self.memory.close()
+        self.handle.close()
+
+
+def restore(path=None):
+    """Map the snapshot file, if there is one that matches the database.
+    Returns:
+        (int): number of spaceobjs in it, 0 if none was restored
+    """
+    close()
+    path = path or SNAPSHOT_PATH
+    if not os.path.exists(path):
+        return 0
+    try:
+        snapshot = _open(path)
+    except Exception:
+        logger.log_trace("Space snapshot: could not read {}.".format(path))
+        return 0
+    if ServerConfig.objects.conf(TOKEN_KEY) != _hex(snapshot.token):
+        logger.log_info("Space snapshot: {} is older than the database; "
+                        "loading from the database.".format(path))
+        snapshot.close()
+        return 0
+    _SNAPSHOT[0] = snapshot
+    _VALID[0] = True
+    return len(snapshot)
+
+
+def _hex(token):
+    return hexlify(token).decode('ascii')
+
+
+def _open(path):
+    handle = open(path, 'rb')
+    try:
+        return Snapshot(path, handle, mmap(handle.fileno(), 0, access=ACCESS_READ))
+    except Exception:
+        handle.close()
+        raise
+
+
+def close():
+    """Drop the restored snapshot; its values load from the database."""
+    snapshot = _SNAPSHOT[0]
+    _SNAPSHOT[0] = None
+    if snapshot is not None:
+        snapshot.close()
+
+
+def restored(obj, field):
+    """The value of `field` for spaceobj `obj` as of the snapshot, or
+    MISSING if the snapshot doesn't have it."""
+    snapshot = _SNAPSHOT[0]
+    if snapshot is None:
+        return MISSING
+    i = snapshot.find(obj.id)
+    if i is None:
+        return MISSING
+    return snapshot.take(i, field)
+
+
+def registry():
+    """The engine registry as of the snapshot, fetched with one query.
+    Returns:
+        (dict or None): phase -> set of spaceobjs, None without a snapshot
+    """
+    snapshot = _SNAPSHOT[0]
+    # Subscriptions may have changed since; the database has them.
+    if snapshot is None or not _VALID[0]:
+        return None
+    from evennia.objects.models import ObjectDB
+    wanted = set()
+    for dbrefs in snapshot.registry.values():
+        wanted.update(dbrefs)
+    found = dict((obj.id, obj) for obj in ObjectDB.objects.filter(id__in=wanted))
+    return dict((phase, set(found[dbref] for dbref in dbrefs if dbref in found))
+                for phase, dbrefs in snapshot.registry.items())
+
+
+def track(obj):
+    """Note that the state or systems of `obj` are loaded, so the next
+    snapshot takes them from memory."""
+    _LIVE[obj.id] = obj
+
+
+def forget(obj):
+    """Leave deleted spaceobj `obj` out of future snapshots."""
+    _LIVE.pop(obj.id, None)
+    snapshot = _SNAPSHOT[0]
+    if snapshot is not None:
+        snapshot.dropped.add(obj.id)
+
+
+def invalidate():
+    """The database is about to move on from the snapshot; stop it being
+    restored. Costs a write only the first time after a snapshot."""
+    if _VALID[0]:
+        _VALID[0] = False
+        ServerConfig.objects.conf(TOKEN_KEY, delete=True)
+
+
+def _encode(obj):
+    """Motion values and pickled record of a loaded spaceobj."""
+    state = obj.state
+    pos = state.pos
+    speed = state.speed
+    record = dict((field, state.get(field)) for field in RECORD_FIELDS
+                  if field != 'systems')
+    if isinstance(pos, Vector3):
+        motion = [pos.x, pos.y, pos.z]
+    else:
+        motion = [NAN, NAN, NAN]
+        record['pos'] = pos
+    if isinstance(speed, (int, float)):
+        motion.append(float(speed))
+    else:
+        motion.append(NAN)
+        record['speed'] = speed
+    record['systems'] = obj.systems.snapshot()
+    return motion, pickle.dumps(to_pickle(record), pickle.HIGHEST_PROTOCOL)
+
+
+def save(path=None):
+    """Write every spaceobj to the snapshot file. Call it straight after
+    `state.flush_all()`, so the file matches the database.
+    Returns:
+        (int): number of spaceobjs written
+    """
+    from world.space.engine import get_engine
+    path = path or SNAPSHOT_PATH
+    old = _SNAPSHOT[0]
+    entries = {}
+    for dbref, obj in list(_LIVE.items()):
+        if not obj.pk:
+            del _LIVE[dbref]
+            continue
+        try:
+            entries[dbref] = _encode(obj)
+        except Exception:
+            logger.log_trace("Space snapshot: could not save {}.".format(obj))
+            # Keep the last snapshot rather than write one without it.
+            return 0
+    if old is not None:
+        for i, dbref in enumerate(old.ids):
+            if dbref not in entries and dbref not in old.dropped:
+                entries[dbref] = old.raw(i)
+    registry = dict((phase, sorted(obj.id for obj in members if obj.pk))
+                    for phase, members in get_engine().phases.items())
+    meta = pickle.dumps(registry, pickle.HIGHEST_PROTOCOL)
+    ids = sorted(entries)
+    motion = []
+    offsets = [0]
+    records = []
+    for dbref in ids:
+        values, record = entries[dbref]
+        motion.extend(values)
+        records.append(record)
+        offsets.append(offsets[-1] + len(record))
+    token = uuid4().bytes
+    count = len(ids)
+    partial = path + '.tmp'
+    try:
+        with open(partial, 'wb') as handle:
+            handle.write(_HEADER.pack(MAGIC, token, count, len(meta), offsets[-1]))
+            handle.write(struct.pack('=%dq' % count, *ids))
+            handle.write(struct.pack('=%dd' % (4 * count), *motion))
+            handle.write(struct.pack('=%dq' % (count + 1), *offsets))
+            handle.write(meta)
+            for record in records:
+                handle.write(record)
+            handle.flush()
+            os.fsync(handle.fileno())
+    except Exception:
+        logger.log_trace("Space snapshot: could not write {}.".format(partial))
+        return 0
+    close()
+    try:
+        os.rename(partial, path)
+    except OSError:
+        # Windows won't rename over an existing file.
+        os.remove(path)
+        os.rename(partial, path)
+    ServerConfig.objects.conf(TOKEN_KEY, _hex(token))
+    _VALID[0] = True
+    # Keep serving spaceobjs not loaded yet, now from the new file.
+    _SNAPSHOT[0] = _open(path)
+    return count
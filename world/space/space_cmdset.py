@@ -10,4 +10,5 @@ class SpaceCmdSet(CmdSet):
         """
         self.add(CmdBoard())
         self.add(CmdSpaceobj())
+        self.add(CmdSpacestat())
         self.add(CmdMan())
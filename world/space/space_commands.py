@@ -1,9 +1,19 @@
-from evennia import Command, default_cmds, search_tag, search_channel
+from evennia import Command, default_cmds, search_tag
 from evennia.utils.utils import inherits_from
 from evennia.utils.create import create_object
 from world.space.objects import *
+from world.space import links
+from world.space.announce import announce
+from world.space.fleet import FleetException, spawn_fleet
+from world.space.templates import TemplateException
 import re
 
+_NUMBER = r'(-?\d+(?:\.\d*)?)'
+_FLEET_RE = re.compile(r'(\w+)\s+x(\d+)\s+around\s+' +
+                       r'\s*,\s*'.join([_NUMBER] * 3) +
+                       r'(?:\s+spread\s+(\d+(?:\.\d*)?))?(?:\s+named\s+(.+))?$',
+                       re.I)
+
 class CmdBoard(Command):
     """
     Usage:
@@ -36,6 +46,10 @@ class CmdSpaceobj(default_cmds.MuxCommand):
         * @spaceobj/create HMS Bounty = ship
     @spaceobj/attach <spaceobj> - Attach your current location to <spaceobj> (adds consoles as well)
     @spaceobj/detach - Detach your current location from its assigned spaceobj (clears consoles as well)
+    @spaceobj/fleet <template> x<N> around <x>,<y>,<z> [spread <radius>] [named <prefix>]
+        Spawn N spaceobjs from <template> into your current location, scattered
+        within <radius> light seconds of the given position.
+        * @spaceobj/fleet galaxy x20 around 0,0,0 spread 0.5 named Armada
     """
     key = '@spaceobj'
     locks = 'perm(Builders)'
@@ -60,6 +74,19 @@ class CmdSpaceobj(default_cmds.MuxCommand):
         except TypeError:
             self.caller.msg("You must specify the type of spaceobj you want to create!")
 
+    def spawn_fleet(self, args):
+        match = _FLEET_RE.match(args.strip())
+        if not match:
+            return self.caller.msg("You might want to see 'help @spaceobj'")
+        template, count, x, y, z, spread, prefix = match.groups()
+        try:
+            fleet = spawn_fleet(template, int(count), self.caller.location,
+                                Vector3(float(x), float(y), float(z)),
+                                float(spread or 0), prefix)
+        except (TemplateException, FleetException) as err:
+            return self.caller.msg(err.msg)
+        self.caller.msg("You spawn %d spaceobjs: %s to %s." % (len(fleet), fleet[0], fleet[-1]))
+
     def func(self):
         if self.switches:
             # Create a new spaceobj <name> of type <spaceobj>
@@ -88,26 +115,21 @@ class CmdSpaceobj(default_cmds.MuxCommand):
                     return self.caller.msg("I'm sorry %s, I'm affraid I can't do that." % self.caller.key)
                 if not spaceobj:
                     return self.caller.msg("Unknown spaceobj.")
-                if spaceobj == obj.db.spaceobj:
+                if spaceobj == links.spaceobj_of(obj):
                     return self.caller.msg("%s is already attached to %s." % (obj, spaceobj))
-                if obj.db.spaceobj and not obj.db.spaceobj == spaceobj:
-                    obj.db.spaceobj.db.local.remove(obj)
-                    search_channel('Space')[0].msg("Room: %s has been removed from %s." % (obj, obj.db.spaceobj))
-                obj.db.spaceobj = spaceobj
-                if not obj in spaceobj.db.local:
-                    spaceobj.db.local.append(obj)
-                search_channel('Space')[0].msg("Rooom: %s has been added to %s." % (obj, spaceobj))
+                previous = links.attach(obj, spaceobj, links.ROOM)
+                if previous:
+                    announce("Room: %s has been removed from %s." % (obj, previous), 'rooms removed', obj)
+                announce("Room: %s has been added to %s." % (obj, spaceobj), 'rooms added', obj)
                 for x in obj.contents:
                     if x.is_typeclass("world.space.objects.Console"):
-                        if x.db.spaceobj:
-                            search_channel('Space')[0].msg("Console: %s has been removed from %s." % (x.key, x.db.spaceobj))
-                            x.db.spaceobj.db.consoles.remove(x)
-                        x.db.spaceobj = spaceobj
-                        spaceobj.db.consoles.append(x)
-                        search_channel('Space')[0].msg("Console: %s has been attached to %s." % (x.key, obj.db.spaceobj))
+                        previous = links.attach(x, spaceobj, links.CONSOLE)
+                        if previous:
+                            announce("Console: %s has been removed from %s." % (x.key, previous), 'consoles removed', x.key)
+                        announce("Console: %s has been attached to %s." % (x.key, spaceobj), 'consoles attached', x.key)
             elif "detach" in self.switches:
                 obj = self.caller.location
-                spaceobj = obj.db.spaceobj
+                spaceobj = links.spaceobj_of(obj)
                 if self.args:
                     return self.caller.msg("No arguments are necessary. If you want to remove %s from %s, just type @spaceobj/detach" % (obj, spaceobj))
                 else:
@@ -115,15 +137,12 @@ class CmdSpaceobj(default_cmds.MuxCommand):
                         return self.caller.msg("%s is not attached to a spaceobj." % obj.key)
                     for x in obj.contents:
                         if x.is_typeclass("world.space.objects.Console"):
-                            try:
-                                x.db.spaceobj.db.consoles.remove(x)
-                                x.db.spaceobj = None
-                                search_channel('Space')[0].msg("Console: %s has been removed from %s." % (x, spaceobj))
-                            except:
-                                self.caller.msg("There was a problem removing %s." % x)
-                    spaceobj.db.local.remove(obj)
-                    obj.db.spaceobj = None
-                    search_channel('Space')[0].msg("Room: %s has been removed from %s." % (obj, spaceobj))
+                            if links.detach(x, links.CONSOLE):
+                                announce("Console: %s has been removed from %s." % (x, spaceobj), 'consoles removed', x)
+                    links.detach(obj, links.ROOM)
+                    announce("Room: %s has been removed from %s." % (obj, spaceobj), 'rooms removed', obj)
+            elif "fleet" in self.switches:
+                return self.spawn_fleet(self.args)
             elif "list" in self.switches:
                 return self.caller.msg("Current Space Objects: %s" % search_tag(category="spaceobj"))
         elif self.args:
@@ -136,3 +155,35 @@ class CmdSpaceobj(default_cmds.MuxCommand):
             return self.caller.msg("%s [#%s] - %s" % (spaceobj.key, spaceobj.id, type(spaceobj)))
         else:
             return self.caller.msg("You might want to see 'help @spaceobj'")
+
+class CmdSpacestat(default_cmds.MuxCommand):
+    """
+    Usage:
+      @spacestat[/<switch>]
+
+    Shows how long each phase of the space engine takes per tick, how many
+    objects it handled, how often a tick overran the engine interval and
+    how many database writes the simulation makes per tick.
+
+    @spacestat/json - Dump the same statistics as JSON
+    @spacestat/reset - Clear the collected statistics
+    """
+    key = '@spacestat'
+    locks = 'perm(Builders)'
+    help_category = 'Space'
+
+    def func(self):
+        from world.space.engine import get_engine
+        from world.space.profiler import get_profiler
+        from world.space import state
+        profiler = get_profiler()
+        if "reset" in self.switches:
+            profiler.reset()
+            return self.caller.msg("Space engine statistics cleared.")
+        if "json" in self.switches:
+            return self.caller.msg(profiler.dump(), options={"raw": True})
+        engine = get_engine()
+        subscribed = ", ".join("%s: %d" % (phase, len(members))
+                               for phase, members in sorted(engine.phases.items()))
+        self.caller.msg(profiler.report())
+        self.caller.msg("|cSubscribed:|n %s  |cPending flush:|n %d" % (subscribed, state.pending()))
@@ -0,0 +1,222 @@
+"""
+Spatial index
+
+A uniform grid over each space location (sector room) that lets sensors
+find nearby spaceobjs with a range query instead of walking every object in
+the sector. Each grid buckets objects into cubic cells of `CELL_SIZE` light
+seconds and remembers the last known position of every member, so a query
+only measures distances to objects in the cells that overlap the search
+sphere.
+
+Grids are kept in memory only and are rebuilt lazily from
+`location.contents` the first time a location is queried after a reload.
+Whoever changes a spaceobj's position or location is expected to call
+`update_position` or `relocate` so the grid stays current.
+
+Moving spaceobjs only have a position when somebody evaluates it (see
+world/space/motion.py), so a grid remembers which of its members are moving
+and re-reads their positions on the first query after each engine tick
+(`advance()`), in one batch, vectorized when the kinematics backend is on.
+"""
+from math import floor, sqrt
+from evennia.utils.utils import inherits_from
+from world.space import kinematics, motion
+
+# Cell edge in light seconds. Roughly one maximum sensor range, so a typical
+# sweep touches a 3x3x3 block of cells.
+CELL_SIZE = 0.05
+
+_INDEXES = {}
+# Engine tick counter and time, bumped by `advance()`.
+_EPOCH = [0, None]
+
+
+class SpatialGrid(object):
+    """Uniform grid of spaceobjs keyed by cell coordinates.
+    Args:
+        cell_size (float): edge length of one cubic cell
+    """
+    def __init__(self, cell_size=CELL_SIZE):
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.where = {}
+        self.movers = set()
+        self.epoch = None
+
+    def __len__(self):
+        return len(self.where)
+
+    def __contains__(self, obj):
+        return obj in self.where
+
+    def _cell(self, x, y, z):
+        size = self.cell_size
+        return (int(floor(x / size)), int(floor(y / size)),
+                int(floor(z / size)))
+
+    def insert(self, obj, pos):
+        """Add `obj` at `pos`, or move it there if it is already indexed."""
+        x, y, z = pos
+        cell = self._cell(x, y, z)
+        old = self.where.get(obj)
+        if old is not None and old[0] != cell:
+            self._discard(obj, old[0])
+        if old is None or old[0] != cell:
+            self.cells.setdefault(cell, set()).add(obj)
+        self.where[obj] = (cell, (x, y, z))
+
+    move = insert
+
+    def remove(self, obj):
+        """Drop `obj` from the grid if present."""
+        old = self.where.pop(obj, None)
+        if old is not None:
+            self._discard(obj, old[0])
+        self.movers.discard(obj)
+
+    def _discard(self, obj, cell):
+        members = self.cells.get(cell)
+        if members is not None:
+            members.discard(obj)
+            if not members:
+                del self.cells[cell]
+
+    def set_moving(self, obj, moving):
+        """Mark `obj` as moving (re-read on refresh) or stationary."""
+        if moving:
+            self.movers.add(obj)
+        else:
+            self.movers.discard(obj)
+
+    def refresh(self):
+        """Re-read the positions of moving members, once per tick."""
+        tick, at = _EPOCH
+        if self.epoch == tick:
+            return
+        self.epoch = tick
+        movers = self.movers
+        if not movers:
+            return
+        table = {}
+        if at is not None and kinematics.enabled():
+            table = kinematics.get_backend().evaluate(at)
+        insert = self.insert
+        # Movers the backend doesn't hold are evaluated in one batch.
+        rest = []
+        for obj in list(movers):
+            pos = table.get(obj)
+            if pos is not None:
+                insert(obj, pos)
+            elif at is None or obj.state.segment is None:
+                insert(obj, obj.get_pos())
+            else:
+                rest.append(obj)
+        if rest:
+            positions = motion.positions_at(
+                [obj.state.segment for obj in rest], at)
+            for obj, pos in zip(rest, positions):
+                insert(obj, pos)
+
+    def position(self, obj):
+        """Return the indexed position of `obj`, or None."""
+        entry = self.where.get(obj)
+        return entry[1] if entry else None
+
+    def query(self, pos, radius):
+        """Find every indexed object within `radius` of `pos`.
+        Args:
+            pos (sequence): x, y, z centre of the search sphere
+            radius (float): search radius
+        Returns:
+            (list): (obj, distance) tuples, unordered
+        """
+        if radius < 0:
+            return []
+        self.refresh()
+        px, py, pz = pos
+        lo = self._cell(px - radius, py - radius, pz - radius)
+        hi = self._cell(px + radius, py + radius, pz + radius)
+        span = ((hi[0] - lo[0] + 1) * (hi[1] - lo[1] + 1) *
+                (hi[2] - lo[2] + 1))
+        if span > len(self.cells):
+            # Huge radius: cheaper to visit the occupied cells directly.
+            buckets = self.cells.values()
+        else:
+            cells = self.cells
+            buckets = [cells[(i, j, k)]
+                       for i in range(lo[0], hi[0] + 1)
+                       for j in range(lo[1], hi[1] + 1)
+                       for k in range(lo[2], hi[2] + 1)
+                       if (i, j, k) in cells]
+        r2 = radius * radius
+        where = self.where
+        found = []
+        for bucket in buckets:
+            for obj in bucket:
+                x, y, z = where[obj][1]
+                dx = x - px
+                dy = y - py
+                dz = z - pz
+                d2 = dx * dx + dy * dy + dz * dz
+                if d2 <= r2:
+                    found.append((obj, sqrt(d2)))
+        return found
+
+
+def get_index(location):
+    """Return the SpatialGrid for `location`, building it if needed."""
+    index = _INDEXES.get(location)
+    if index is None:
+        index = SpatialGrid()
+        if location is not None:
+            for obj in location.contents:
+                if inherits_from(obj, "world.space.objects.SpaceObject"):
+                    index.insert(obj, obj.get_pos())
+                    moving = obj.moving()
+                    index.set_moving(obj, moving)
+                    if moving and kinematics.enabled():
+                        kinematics.get_backend().load(obj, obj.state.segment)
+        _INDEXES[location] = index
+    return index
+
+
+def drop_index(location):
+    """Forget the grid for `location`; it is rebuilt on next use."""
+    _INDEXES.pop(location, None)
+
+
+def advance(at):
+    """Start a new engine tick at time `at`; moving members of every
+    grid are re-read on their next query."""
+    _EPOCH[0] += 1
+    _EPOCH[1] = at
+
+
+def set_moving(obj, moving):
+    """Tell the grid holding `obj` whether it is moving."""
+    index = _INDEXES.get(obj.location)
+    if index is not None:
+        index.set_moving(obj, moving)
+
+
+def update_position(obj, pos=None):
+    """Re-index `obj` at `pos`, or its current position, in its location."""
+    index = _INDEXES.get(obj.location)
+    if index is not None:
+        index.move(obj, obj.get_pos() if pos is None else pos)
+
+
+def relocate(obj, source_location):
+    """Move `obj` from the grid of `source_location` to its current one."""
+    old = _INDEXES.get(source_location)
+    if old is not None:
+        old.remove(obj)
+    update_position(obj)
+    set_moving(obj, obj.moving())
+
+
+def forget(obj):
+    """Remove `obj` from whatever grid holds it."""
+    index = _INDEXES.get(obj.location)
+    if index is not None:
+        index.remove(obj)
@@ -0,0 +1,157 @@
+"""
+Space state
+
+Write-behind cache for the spaceobj attributes the simulation rewrites while
+ships move: `pos`, `speed`, `heading`, `course`, the current `turn` and the
+motion `segment`. Reads and writes go to memory;
+changed fields are marked dirty and written to the database in one batch
+every `FLUSH_INTERVAL` engine ticks, and when the server stops or reloads.
+
+Access it through `SpaceObject.state`:
+    pos = spaceobj.state.pos
+    spaceobj.state.speed = 10.0
+
+Cached values are plain Python copies, not the database's _SaverDict and
+_SaverList wrappers, so mutating one in place does not touch the database.
+Assign it back (`state.heading = heading`) or call `state.touch('heading')`
+to have the change persisted.
+
+Anything else with a `flush()` method (the SystemHandler's pending power
+levels, for instance) can join the same batch through `mark_dirty()`.
+
+Every attribute write made by the space simulation is reported through
+`count_writes()`, so the tick profiler can show database writes per tick.
+
+Values not yet cached come from the space snapshot when one was restored
+at start (see world/space/snapshot.py), and from the database otherwise.
+"""
+from django.conf import settings
+from django.db import transaction
+from evennia.utils import logger
+from evennia.utils.dbserialize import from_pickle, to_pickle
+from world.space import snapshot
+
+HOT_FIELDS = ('pos', 'speed', 'heading', 'course', 'turn', 'segment')
+FLUSH_INTERVAL = getattr(settings, 'SPACE_STATE_FLUSH_INTERVAL', 30)
+
+_DIRTY = set()
+_WRITES = [0]
+
+
+def mark_dirty(flushable):
+    """Queue `flushable` for the next batch flush."""
+    _DIRTY.add(flushable)
+
+
+def pending():
+    """Number of objects waiting to be flushed."""
+    return len(_DIRTY)
+
+
+def count_writes(n=1):
+    """Record `n` attribute writes to the database."""
+    _WRITES[0] += n
+    if n:
+        # The database no longer matches the last snapshot.
+        snapshot.invalidate()
+
+
+def plain_copy(value):
+    """Copy of an attribute value with its _SaverDict and _SaverList
+    wrappers replaced by plain dicts and lists."""
+    return from_pickle(to_pickle(value))
+
+
+def writes():
+    """Total attribute writes recorded since the server started."""
+    return _WRITES[0]
+
+
+def flush_all():
+    """Write every pending change to the database in one transaction."""
+    if not _DIRTY:
+        return 0
+    batch = list(_DIRTY)
+    _DIRTY.clear()
+    written = 0
+    with transaction.atomic():
+        for flushable in batch:
+            try:
+                written += flushable.flush()
+            except Exception:
+                logger.log_trace("Space state: flush failed for {}.".format(flushable))
+    return written
+
+
+def _hot_field(name):
+    def fget(self):
+        return self.get(name)
+
+    def fset(self, value):
+        self.set(name, value)
+    return property(fget, fset, None, "Cached `db.{}`.".format(name))
+
+
+class SpaceState(object):
+    """Write-behind cache of one spaceobj's hot attributes.
+    Args:
+        obj (SpaceObject): the spaceobj whose attributes are cached
+    """
+    __slots__ = ('obj', '_values', '_dirty')
+
+    def __init__(self, obj):
+        self.obj = obj
+        self._values = {}
+        self._dirty = set()
+        snapshot.track(obj)
+
+    def __repr__(self):
+        return "SpaceState({}, dirty={})".format(self.obj, sorted(self._dirty))
+
+    def get(self, field):
+        """Return the cached value of `field`, loading it on first use."""
+        values = self._values
+        if field not in values:
+            value = snapshot.restored(self.obj, field)
+            if value is snapshot.MISSING:
+                value = plain_copy(self.obj.attributes.get(field))
+            values[field] = value
+        return values[field]
+
+    def set(self, field, value):
+        """Cache `value` for `field` and mark it for writing."""
+        self._values[field] = value
+        self.touch(field)
+
+    def touch(self, field):
+        """Mark `field` dirty after mutating its cached value in place."""
+        self._dirty.add(field)
+        mark_dirty(self)
+
+    def flush(self):
+        """Write dirty fields to the database. Returns the number written."""
+        obj = self.obj
+        dirty = self._dirty
+        if not obj.pk:
+            dirty.clear()
+            return 0
+        values = self._values
+        for field in dirty:
+            obj.attributes.add(field, values[field])
+        written = len(dirty)
+        count_writes(written)
+        dirty.clear()
+        return written
+
+    def discard(self):
+        """Forget cached values, including unwritten changes."""
+        self._values.clear()
+        self._dirty.clear()
+        _DIRTY.discard(self)
+
+    pos = _hot_field('pos')
+    speed = _hot_field('speed')
+    heading = _hot_field('heading')
+    course = _hot_field('course')
+    turn = _hot_field('turn')
+    segment = _hot_field('segment')
@@ -3,11 +3,23 @@ from evennia.utils.utils import inherits_from
 from evennia.utils import logger, lazy_property, delay
 from world.space.utils import *
 from functools import total_ordering
+from itertools import count
 from math import *
-from evennia import DefaultScript, create_script, search_channel, search_object
+from evennia import DefaultScript, search_channel, search_object
+from world.space.contacts import get_contacts
+from world.space.engine import get_engine, now
+from world.space import (horizon, interest, kinematics, motion, power, shards,
+                         snapshot, spatial, state, turns)
+from world.space.offload import offload
 
 SYSTEM_TYPES = ('producer', 'consumer', 'router', 'aux')
 
+# Core fields every system carries, with their defaults. System reads these
+# once into slots and tracks changes to them; anything else lives in 'extra'.
+SYSTEM_FIELDS = (('name', None), ('type', None), ('min_power', 0),
+                 ('max_power', 0), ('set_power', 0), ('current_power', 0),
+                 ('max_hp', 0), ('dmg', 0))
+
 class SystemException(Exception):
     """Base exception class raised by `System` objects.
     Args:
@@ -16,18 +28,56 @@ class SystemException(Exception):
     def __init__(self, msg):
         self.msg = msg
 
+def make_system(name, type='consumer', min_power=0, max_power=0, set_power=0,
+                current_power=0, max_hp=0, dmg=0, spaceobj=None, script=None,
+                extra={}):
+    """Build the stored data of one system.
+    Returns:
+        (dict): system data for `SystemHandler.add_many`
+    """
+    if type not in SYSTEM_TYPES:
+        raise SystemException("Invalid system type specified.")
+    return dict(name=name,
+                type=type,
+                min_power=min_power,
+                max_power=max_power,
+                set_power=set_power,
+                current_power=current_power,
+                max_hp=max_hp,
+                dmg=dmg,
+                spaceobj=spaceobj,
+                script=script,
+                extra=extra)
+
 class SystemHandler(object):
     """Factory class that instantiates System objects.
     Args:
         obj (Object): parent Object typeclass for this SystemHandler
         db_attribute (str): name of the DB attribute for system data storage
+    Note:
+        Changes made through System properties are held on the System and
+        committed by `flush()`, which rewrites the whole attribute once. The
+        space state layer calls it with its batch flush.
+
+        After a restart the systems are read from the space snapshot (see
+        world/space/snapshot.py) when there is one. `restored` is then True
+        and `attr_dict` a plain copy, until the first change that has to go
+        to the database binds the handler to the attribute (see `bind()`).
     """
     def __init__(self, obj, db_attribute='systems'):
-        if not obj.attributes.has(db_attribute):
-            obj.attributes.add(db_attribute, {})
-
-        self.attr_dict = obj.attributes.get(db_attribute)
+        self.obj = obj
+        self.db_attribute = db_attribute
         self.cache = {}
+        self.dirty = set()
+        data = snapshot.restored(obj, db_attribute)
+        self.restored = data is not snapshot.MISSING and data is not None
+        if self.restored:
+            self.attr_dict = data
+        else:
+            if not obj.attributes.has(db_attribute):
+                obj.attributes.add(db_attribute, {})
+            self.attr_dict = obj.attributes.get(db_attribute)
+        snapshot.track(obj)
 
     def __len__(self):
         """Return number of Systems in 'attr_dict'."""
@@ -35,7 +85,7 @@ class SystemHandler(object):
 
     def __setattr__(self, key, value):
         """Returns error message if system objects are assigned directly."""
-        if key in ('attr_dict', 'cache'):
+        if key in ('obj', 'db_attribute', 'attr_dict', 'cache', 'dirty', 'restored'):
             super(SystemHandler, self).__setattr__(key, value)
         else:
             raise SystemException(
@@ -69,7 +119,7 @@ class SystemHandler(object):
             if system not in self.attr_dict:
                 return None
             data = self.attr_dict[system]
-            self.cache[system] = System(data)
+            self.cache[system] = System(data, handler=self, key=system)
         return self.cache[system]
 
     def add(self, key, name, type='consumer',
@@ -78,35 +128,48 @@ class SystemHandler(object):
         if key in self.attr_dict:
             raise SystemException("System '{}' already exists.".format(key))
 
-        if type in SYSTEM_TYPES:
-            system = dict(name=name,
-                         type=type,
-                         min_power=min_power,
-                         max_power=max_power,
-                         set_power=set_power,
-                         current_power=current_power,
-                         max_hp=max_hp,
-                         dmg=dmg,
-                         spaceobj=spaceobj,
-                         script=script,
-                         extra=extra)
-
-            self.attr_dict[key] = system
+        self.bind()
+        self.attr_dict[key] = make_system(name, type, min_power, max_power,
+                                          set_power, current_power, max_hp,
+                                          dmg, spaceobj, script, extra)
+
+    def add_many(self, systems, replace=False):
+        """Add several Systems with a single write of the systems attribute.
+        Args:
+            systems (dict): key -> system data as returned by `make_system`
+            replace (bool): if True, drop every current System first
+        """
+        if replace:
+            self.dirty.clear()
+            data = {}
         else:
-            raise SystemException("Invalid system type specified.")
+            for key in systems:
+                if key in self.attr_dict:
+                    raise SystemException("System '{}' already exists.".format(key))
+            # Pending changes go out with the same write.
+            self.flush()
+            data = state.plain_copy(self.attr_dict)
+        data.update(systems)
+        self.obj.attributes.add(self.db_attribute, data)
+        state.count_writes()
+        self.attr_dict = self.obj.attributes.get(self.db_attribute)
+        self.restored = False
+        self.cache.clear()
 
     def remove(self, system):
         """Remove a System from the handler's parent object."""
         if system not in self.attr_dict:
             raise SystemException("System not found: {}".format(system))
 
+        self.bind()
         if system in self.cache:
             del self.cache[system]
+        self.dirty.discard(system)
         del self.attr_dict[system]
 
     def clear(self):
         """Remove all Systems from the handler's parent object."""
-        for system in self.all:
+        for system in list(self.all):
             self.remove(system)
 
     @property
@@ -114,32 +177,82 @@ class SystemHandler(object):
         """Return a list of all system keys in this SystemHandler."""
         return self.attr_dict.keys()
 
+    def bind(self):
+        """Swap restored snapshot data for the database attribute, so
+        changes made in place (System extras, say) are saved."""
+        if not self.restored:
+            return
+        self.restored = False
+        self.attr_dict = self.obj.attributes.get(self.db_attribute)
+        for key, system in self.cache.items():
+            if key in self.attr_dict:
+                system._data = self.attr_dict[key]
+
+    def snapshot(self):
+        """Plain copy of every System's data, with unflushed changes."""
+        systems = state.plain_copy(self.attr_dict)
+        for key, system in self.cache.items():
+            if key in systems:
+                systems[key].update(system._fields())
+        return systems
+
+    def mark_dirty(self, system):
+        """Queue the System at key `system` for the next flush."""
+        self.dirty.add(system)
+        state.mark_dirty(self)
+
+    def flush(self):
+        """Commit every changed System to the database in one write.
+        Returns the number of systems written."""
+        dirty = self.dirty
+        if not dirty:
+            return 0
+        obj = self.obj
+        if not obj.pk:
+            dirty.clear()
+            return 0
+        systems = state.plain_copy(self.attr_dict)
+        written = 0
+        for key in dirty:
+            system = self.cache.get(key)
+            if system is not None and key in systems:
+                systems[key].update(system._fields())
+                written += 1
+        dirty.clear()
+        obj.attributes.add(self.db_attribute, systems)
+        state.count_writes()
+        # Rebind the cached Systems to the freshly saved data.
+        self.attr_dict = obj.attributes.get(self.db_attribute)
+        self.restored = False
+        for key, system in self.cache.items():
+            if key in self.attr_dict:
+                system._data = self.attr_dict[key]
+        return written
+
 @total_ordering
 class System(object):
     """Represents a system on a spaceobj.
     Note:
-        See module docstring for configuration details.
+        See module docstring for configuration details. The core fields
+        are read once into slots. Assigning them updates the slot and marks
+        the system dirty on its handler rather than writing the database.
+        While a power ramp is running (see world/space/power.py) the
+        current power level is evaluated from the ramp on read.
     """
-    def __init__(self, data):
+    __slots__ = ('_data', '_handler', '_key', '_name', '_type', '_min_power',
+                 '_max_power', '_set_power', '_current_power', '_max_hp',
+                 '_dmg', '_ramp')
+
+    def __init__(self, data, handler=None, key=None):
         if not 'name' in data:
             raise SystemException(
                 "Required key not found in system data: 'name'")
         if not 'type' in data:
             raise SystemException(
                 "Required key not found in system data: 'type'")
-        self._type = data['type']
-        if not 'min_power' in data:
-            data['min_power'] = 0
-        if not 'max_power' in data:
-            data['max_power'] = 0
-        if not 'set_power' in data:
-            data['set_power'] = 0
-        if not 'current_power' in data:
-            data['current_power'] = 0
-        if not 'max_hp' in data:
-            data['max_hp'] = 0
-        if not 'dmg' in data:
-            data['dmg'] = 0
+        for field, default in SYSTEM_FIELDS:
+            if not field in data:
+                data[field] = default
         if not 'spaceobj' in data:
             data['spaceobj'] = None
         if not 'script' in data:
@@ -147,35 +260,58 @@ class System(object):
         if not 'extra' in data:
             data['extra'] = {}
 
-        self._data = data
-        self._keys = ('name', 'type', 'min_power', 'max_power',
-                      'set_power', 'current_power', 'max_hp', 'dmg', 'spaceobj', 'script', 'extra')
-        self._locked = True
+        setattr_ = object.__setattr__
+        setattr_(self, '_data', data)
+        setattr_(self, '_handler', handler)
+        setattr_(self, '_key', key)
+        for field, default in SYSTEM_FIELDS:
+            setattr_(self, '_' + field, data[field])
+        setattr_(self, '_ramp', None)
 
-        if not isinstance(data, _SaverDict):
+        if not isinstance(data, _SaverDict) and not (
+                handler is not None and handler.restored):
             logger.log_warn(
                 'Non-persistent {} class loaded.'.format(
                     type(self).__name__
                 ))
 
+    def _fields(self):
+        """Return the core fields as a plain dict."""
+        fields = dict((field, getattr(self, '_' + field))
+                      for field, default in SYSTEM_FIELDS)
+        fields['current_power'] = self.current_power
+        return fields
+
+    def _changed(self):
+        handler = self._handler
+        if handler is None:
+            self._data.update(self._fields())
+        else:
+            handler.mark_dirty(self._key)
+
     def __repr__(self):
         """Debug-friendly representation of this System."""
+        fields = self._fields()
+        for key in ('spaceobj', 'script', 'extra'):
+            fields[key] = self._data[key]
         return "{}({{{}}})".format(
             type(self).__name__,
-            ', '.join(["'{}': {!r}".format(k, self._data[k])
-                for k in self._keys if k in self._data]))
+            ', '.join(["'{}': {!r}".format(k, fields[k])
+                for k in ('name', 'type', 'min_power', 'max_power',
+                          'set_power', 'current_power', 'max_hp', 'dmg',
+                          'spaceobj', 'script', 'extra')]))
 
     def __str__(self):
         """User-friendly string representation of this `System`"""
         status = "{current_power:4} / {max_power:4}".format(
                 current_power=self.current_power,
-                max_power=self.max_power)
+                max_power=self._max_power)
         health = "{hp:4} / {max_hp:4}".format(
-                hp=(self.max_hp - self.dmg),
-                max_hp=self.max_hp
+                hp=(self._max_hp - self._dmg),
+                max_hp=self._max_hp
         )
         return "{name:12} {status} ({health})".format(
-            name=self.name,
+            name=self._name,
             status=status,
             health=health)
 
@@ -207,33 +343,38 @@ class System(object):
         else:
             raise AttributeError(
                 "{} '{}' has no attribute {!r}".format(
-                    type(self).__name__, self.name, key
+                    type(self).__name__, self._name, key
                 ))
 
     def __setattr__(self, key, value):
         """Set extra parameters as attributes.
-        Arbitrary attributes set on a System object will be
-        stored in the 'extra' key of the `_data` attribute.
-        This behavior is enabled by setting the instance
-        variable `_locked` to True.
+        Public properties are assigned through their setters; any other
+        attribute set on a System object is stored in the 'extra' key of
+        the `_data` attribute.
         """
-        propobj = getattr(self.__class__, key, None)
-        if isinstance(propobj, property):
-            if propobj.fset is None:
+        prop = _SYSTEM_PROPERTIES.get(key)
+        if prop is not None:
+            if prop.fset is None:
                 raise AttributeError("can't set attribute")
-            propobj.fset(self, value)
+            prop.fset(self, value)
+        elif key in _SYSTEM_SLOTS:
+            object.__setattr__(self, key, value)
         else:
-            if (self.__dict__.get('_locked', False) and
-                    key not in ('_keys',)):
-                self._data['extra'][key] = value
-            else:
-                super(System, self).__setattr__(key, value)
+            self._bind()
+            self._data['extra'][key] = value
 
     def __delattr__(self, key):
         """Delete extra parameters as attributes."""
         if key in self._data['extra']:
+            self._bind()
             del self._data['extra'][key]
 
+    def _bind(self):
+        """Make sure `_data` is the database copy before changing it."""
+        handler = self._handler
+        if handler is not None and handler.restored:
+            handler.bind()
+
     # Numeric operations magic
 
     def __eq__(self, other):
@@ -326,7 +467,12 @@ class System(object):
     @property
     def name(self):
         """Display name for the system."""
-        return self._data['name']
+        return self._name
+
+    @property
+    def type(self):
+        """The system's type; one of SYSTEM_TYPES."""
+        return self._type
 
     @property
     def actual(self):
@@ -337,80 +483,120 @@ class System(object):
     def min_power(self):
         """The system's minimum power level to be functional.
         """
-        return self._data['min_power']
+        return self._min_power
 
     @min_power.setter
     def min_power(self, amount):
-        self._data['min_power'] = amount
+        _setslot(self, '_min_power', amount)
+        self._changed()
 
     @property
     def max_power(self):
         """The system's maximum power level."""
-        return self._data['max_power']
+        return self._max_power
 
     @max_power.setter
     def max_power(self, amount):
-        self._data['max_power'] = amount
+        _setslot(self, '_max_power', amount)
+        self._changed()
 
     @property
     def set_power(self):
         """The systems desired power level."""
-        return self._data['set_power']
+        return self._set_power
 
     @set_power.setter
     def set_power(self, amount):
-        self._data['set_power'] = self._enforce_bounds(amount)
+        _setslot(self, '_set_power', self._enforce_bounds(amount))
+        self._changed()
 
     @property
     def current_power(self):
         """The `current` power level of the `System`."""
-        return self._data['current_power']
+        if self._ramp is None:
+            return self._current_power
+        return self.value_at(now())
 
     @current_power.setter
     def current_power(self, amount):
-        self._data['current_power'] = self._enforce_bounds(amount)
+        _setslot(self, '_ramp', None)
+        _setslot(self, '_current_power', self._enforce_bounds(amount))
+        self._changed()
 
     @property
     def max_hp(self):
         """The systems maximum hit points."""
-        return self._data['max_hp']
+        return self._max_hp
 
     @max_hp.setter
     def max_hp(self, amount):
-        self._data['max_hp'] = amount
+        _setslot(self, '_max_hp', amount)
+        self._changed()
 
     @property
     def dmg(self):
         """The systems current damage."""
-        return self._data['dmg']
+        return self._dmg
 
     @dmg.setter
     def dmg(self, amount):
-        self._data['dmg'] = amount
-        if self._data['dmg'] >= self._data['max_hp']:
-            self._data['set_power'] = 0
-            self._data['current_power'] = 0
+        _setslot(self, '_dmg', amount)
+        if amount >= self._max_hp:
+            _setslot(self, '_ramp', None)
+            _setslot(self, '_set_power', 0)
+            _setslot(self, '_current_power', 0)
+        self._changed()
 
     @property
     def extra(self):
         """Returns a list containing available extra data keys."""
         return self._data['extra'].keys()
 
+    # Power ramps
+
+    @property
+    def ramping(self):
+        """True while a power ramp is running."""
+        return self._ramp is not None
+
+    @property
+    def ramp(self):
+        """The running ramp as (start, slope, target), or None."""
+        return self._ramp
+
+    @property
+    def ramp_start(self):
+        """Power level at the start of the running ramp."""
+        return self._current_power
+
+    def start_ramp(self, at, slope):
+        """Ramp from the current level towards set_power from time `at`,
+        at `slope` power units per second."""
+        _setslot(self, '_ramp', (at, slope, self._set_power))
+
+    def value_at(self, at):
+        """Power level at time `at` under the running ramp."""
+        return power.ramp_value(self._current_power, self._ramp, at)
+
+    def settle(self, at):
+        """End the running ramp, fixing the level it had at time `at`."""
+        amount = self.value_at(at)
+        self.current_power = amount
+        return amount
+
     # Private members
 
     def _enforce_bounds(self, value):
         """Ensures that incoming value falls within system's range."""
-        if self.set_power is not None and value >= self.max_power:
-            return self.max_power
-        if self.current_power is not None and value >= self.max_power:
-            return self.max_power
+        if value >= self._max_power:
+            return self._max_power
         return value
 
     def percent(self):
-        return "{:.0%}".format(float(self.current_power) / float(self.max_power))
+        return "{:.0%}".format(float(self.current_power) / float(self._max_power))
 
     def health(self):
-        return (float(self.max_hp) - float(self.dmg)) / float(self.max_hp)
+        return (float(self._max_hp) - float(self._dmg)) / float(self._max_hp)
 
     def destroyed(self):
         if self.health() <= 0:
@@ -418,10 +604,15 @@ class System(object):
         else:
             return False
     def online(self):
-        if self.current_power >= self.min_power and not self.destroyed():
+        if self.current_power >= self._min_power and not self.destroyed():
             return True
         else:
             return False
+
+_setslot = object.__setattr__
+_SYSTEM_SLOTS = frozenset(System.__slots__)
+_SYSTEM_PROPERTIES = dict((key, value) for key, value in vars(System).items()
+                          if isinstance(value, property))
 """
 Maximum sublight speed is 74,770kps (~1/4 speed of light)
 Sublight engines have a setting to determine their maximum
@@ -432,296 +623,393 @@ speed as a percentage of this maximum. For example:
 
 #------------------------------------------------------------
 #
-# SpaceHandler - Each spaceobj that NEEDS one will create it
-# when needed. If the object isn't doing anything that requires
-# updates, it will stop itself. The plan is for any and all
-# UpdateFoo scripts to be in here and called as needed by the
-# associated commands or external events.
+# SpaceHandler - Legacy per-spaceobj ticker. Movement, sensors
+# and power are now advanced by the global SpaceEngine (see
+# world/space/engine.py). Handlers left over in the database
+# hand their actions over to the engine when they start and
+# are then removed on script validation.
 #
 #------------------------------------------------------------
 
 class SpaceHandler(DefaultScript):
     """
-    Facilitates movement and related functions of spaceobjs
+    Deprecated. Migrates its actions to the SpaceEngine.
     """
 
     def at_script_creation(self):
         self.key = "update_spaceobj"
-        self.desc = "Makes space objects work!"
-        self.interval = 1
-        self.persistent = True
+        self.desc = "Superseded by the space engine."
+        self.persistent = False
         self.db.update = []
 
-    def _init_target(self, target):
-        """
-        This initializes handler back-reference on spaceobj
-        """
-        self.obj.ndb.space_handler = self
-
-    def _cleanup_target(self, target):
-        del self.obj.ndb.space_handler
-
     def at_start(self):
-        self._init_target(self.db.target)
-
-    def at_stop(self):
-        self._cleanup_target(self.db.target)
-
-    def at_repeat(self):
-        for action in self.db.update:
-            action(self.obj)
-
-    def add_action(self, action):
-        self.db.update.append(action)
+        engine = get_engine()
+        phases = {'UpdateHeading': 'heading', 'UpdatePosition': 'position',
+                  'UpdateSensors': 'sensors', 'UpdatePower': 'power'}
+        for action in self.db.update or []:
+            phase = phases.get(getattr(action, '__name__', None))
+            if phase and self.obj:
+                engine.subscribe(self.obj, phase)
+        self.db.update = []
 
-    def del_action(self, action):
-        self.db.update.remove(action)
-        if len(self.db.update) < 1:
-            self.stop()
+    def is_valid(self):
+        return False
 
 #------------------------------------------------------------
 #
-# UpdateHeading - Update the heading and course of a spaceobj
-# which is used in UpdatePosition to produce movement
+# UpdateHeading - Start, re-plan or finish a turn towards the
+# desired heading. Turns are analytic (see world/space/turns.py):
+# heading and course are interpolated on demand, and the engine
+# calls back once, when the turn is complete.
 #
 #------------------------------------------------------------
 
 def UpdateHeading(target, *semote):
-    if not target.ndb.space_handler:
-        target.ndb.space_handler = create_script("world.space.system.SpaceHandler", obj=target)
-    if not UpdateHeading in target.ndb.space_handler.db.update:
-        target.ndb.space_handler.add_action(UpdateHeading)
-    rate = 10.0  # TODO: come up with turn rate code; hardcoded for now id:20
-    xy = target.db.heading['xy']
-    z = target.db.heading['z']
-    dxy = (target.db.d_heading['xy'] - xy + 360) % 360
-    dz = (target.db.d_heading['z'] - z + 360) % 360
-    dxy2 = dxy * dxy
-    dz2 = dz * dz
-    if dxy2 < 0.25 and dz2 < 0.25:
-        target.db.heading['xy'] = target.db.d_heading['xy']
-        target.db.heading['z'] = target.db.d_heading['z']
-        target.db.course = head2course(target.db.heading['xy'], target.db.heading['z'])
-        for console in target.db.consoles:
-            if "helm" in console.db.current_modes:
-                console.notify("Now heading %s." %
-                               format_bearing(target.heading()))
+    engine = get_engine()
+    state = target.state
+    current = now()
+    heading = target.heading()
+    d_heading = target.db.d_heading
+    turn = turns.plan(heading, (d_heading['xy'], d_heading['z']), current)
+    if turn is None:
+        state.heading = {'xy': d_heading['xy'], 'z': d_heading['z']}
+        state.course = head2course(d_heading['xy'], d_heading['z'])
+        state.turn = None
+        UpdatePosition(target)
+        target.bus.notify("Now heading %s." %
+                          format_bearing(target.heading()), "helm")
         target.semote("steadies on course.")
-        target.ndb.space_handler.del_action(UpdateHeading)
+        engine.unsubscribe(target, 'heading')
         return
-    dist = rate / sqrt(dxy2 + dz2)
-    yawmsg = ''
-    pitchmsg = ''
-    if not target.db.heading['xy'] == target.db.d_heading['xy']:
-        if ((target.db.heading['xy'] - target.db.d_heading['xy']) % 360) > 180:
-            #Turn starboard
-            yawmsg = 'turn starboard'
-            target.db.heading['xy'] += round(dxy * dist + 360,2) % 360
-        else:
-            #Turn port
-            yawmsg = 'turn port'
-            target.db.heading['xy'] -= round(dxy * dist + 360,2) % 360
-    if not target.db.heading['z'] == target.db.d_heading['z']:
-        if ((target.db.heading['z'] - target.db.d_heading['z']) % 360) > 180:
-            #Pitch up
-            pitchmsg = 'pitch up'
-            target.db.heading['z'] += round(dz * dist + 360,2) % 360
-        else:
-            #Pitch down
-            pitchmsg = 'pitch down'
-            target.db.heading['z'] -= round(dz * dist + 360,2) % 360
-    if (yawmsg or pitchmsg) and semote:
-        target.semote("begins to %s%s%s." % (yawmsg, " and " if yawmsg and pitchmsg else "", pitchmsg))
-    if dist >= 1.0:
-        target.db.heading['xy'] = target.db.d_heading['xy']
-        target.db.heading['z'] = target.db.d_heading['z']
-    target.db.course = head2course(target.db.heading['xy'], target.db.heading['z'])
+    # Re-planning from the interpolated heading keeps a turn in progress on
+    # the same path, so this is also how the engine resumes after a reload.
+    state.heading = {'xy': heading[0], 'z': heading[1]}
+    state.turn = turn
+    engine.subscribe(target, 'heading')
+    engine.schedule(turns.finish(turn), _turn_due, target, turn)
+    if semote:
+        target.semote("begins to %s." % turns.describe(turn))
+    UpdatePosition(target)
+
+
+def _turn_due(target, turn):
+    """Engine timer callback; ignored if the turn has been re-planned."""
+    if target.pk and target.state.turn == turn:
+        UpdateHeading(target)
 
 #------------------------------------------------------------
 #
-# UpdatePosition - Update the db.pos attribute on a spaceobj
-# according to vector of db.course * (db.speed[0] / 1000.0)
-#
-# target.db.speed has the following values: [<current speed>, <desired speed>, <max speed>]
+# UpdatePosition - Start a new dead-reckoning motion segment
+# (see world/space/motion.py) from where the ship is now. Call
+# it whenever speed, heading or position changes; the engine
+# calls it back when an acceleration ends and, while a moving
+# ship turns, every TURN_STEP seconds (less often in a sector
+# nobody is watching). A cruising ship needs no updates at all.
 #
 #------------------------------------------------------------
 
+# Seconds between course corrections of a moving ship that is turning.
+TURN_STEP = 1.0
+
 
-def UpdatePosition(target):
-    if not target.ndb.space_handler:
-        target.ndb.space_handler = create_script(SpaceHandler, obj=target)
-    if not UpdatePosition in target.ndb.space_handler.db.update:
-        target.ndb.space_handler.add_action(UpdatePosition)
-    # clunky speed handling code here
-    speed = target.db.speed
-    #CHANGE THIS to get from engines
-    dspeed = target.db.d_speed
-    maxspeed = target.maxspeed()
+def UpdatePosition(target, pos=None, speed=None):
+    engine = get_engine()
+    state = target.state
+    current = now()
+    previous = state.segment
+    if pos is None:
+        pos = target.get_pos()
+    if speed is None:
+        speed = target.speed()
     # TODO: semote speed change to ship rooms, at least for 'major' speed changes; ie 'the ship shakes as it accelerates' id:22
-    # need to add!
-    if not speed == dspeed:
-        rate = 10  # CHANGEME hardcoded accelleration rate for now
-        if dspeed > speed:
-            speed += rate
-            if speed > dspeed:
-                speed = dspeed
-            if speed > maxspeed:
-                speed = maxspeed
+    segment = motion.plan(pos, target.course(), speed, target.db.d_speed,
+                          target.maxspeed(), current)
+    state.segment = segment
+    state.pos = pos
+    state.speed = speed
+    moving = motion.moving(segment)
+    spatial.update_position(target, pos)
+    spatial.set_moving(target, moving)
+    if kinematics.enabled():
+        if moving:
+            kinematics.get_backend().load(target, segment)
         else:
-            speed -= rate
-            if speed < dspeed:
-                speed = dspeed
-        target.db.speed = speed
-        if speed == dspeed:
-            for console in target.db.consoles:
-                if "helm" in console.db.current_modes:
-                    console.notify("Speed is now %s." % (format_speed(speed)))
-    if speed == 0.0 and dspeed == 0.0:
-        target.ndb.space_handler.del_action(UpdatePosition)
-        #Speed is in kps
-    target.db.pos += Vector3(target.db.course).scale(
-        target.speed() / 299792)
-    return
+            kinematics.get_backend().remove(target)
+    if previous is not None and motion.ramping(previous) and current >= previous[5]:
+        target.bus.notify("Speed is now %s." % (format_speed(speed)), "helm")
+    UpdateSensorPairs(target)
+    due = segment[5] if motion.ramping(segment) else None
+    if moving and state.turn is not None:
+        if interest.sector_awake(target.location):
+            step = current + TURN_STEP
+        else:
+            step = current + interest.IDLE_TURN_STEP
+        due = step if due is None else min(due, step)
+    if due is None:
+        engine.unsubscribe(target, 'position')
+    else:
+        engine.subscribe(target, 'position')
+        engine.schedule(due, _position_due, target, segment)
+
+
+def _position_due(target, segment):
+    """Engine timer callback; ignored if the segment has been replaced."""
+    if target.pk and target.state.segment == segment:
+        UpdatePosition(target)
 
 #------------------------------------------------------------
 #
-# UpdateSensors - Handle updating sensor contacts and range/bearing
-# dist3d can be moved to the spaceobj
+# UpdateSensors - Handle updating sensor contacts and range/bearing.
+# A full sweep takes the contacts in range from the location's
+# spatial index, then predicts when every ship that could get
+# there within the sensor horizon will cross the range (see
+# world/space/horizon.py) and schedules those crossings with the
+# engine. The sweep is repeated when the horizon runs out, and a
+# single pair is re-planned whenever either ship changes course
+# or speed (UpdateSensorPairs). Call it whenever the sensors come
+# online, go offline or change power. The predictions of a big
+# sweep run on the offload thread pool (world/space/offload.py),
+# or, with SPACE_SHARDS set, on the shard owning the location
+# (world/space/shards.py). Spaceobjs nobody is watching skip all
+# of this until somebody is (world/space/interest.py).
 #
 #------------------------------------------------------------
 
+_SENSOR_STAMPS = count()
+
 
 def UpdateSensors(target):
-    # Check if there's a handler, make one if needed
-    if not target.ndb.space_handler:
-        target.ndb.space_handler = create_script(SpaceHandler, obj=target)
-    if not UpdateSensors in target.ndb.space_handler.db.update:
-        target.ndb.space_handler.add_action(UpdateSensors)
-    contacts = []
-    for contact in target.location.contents:
-        if inherits_from(contact, "world.space.objects.SpaceObject"):
-                contacts.append(contact)
+    engine = get_engine()
+    sensors = target.systems.sensors
+    contacts = get_contacts(target)
+    online = sensors.online()
+    current = now()
+    if online and not interest.observed(target):
+        # Nobody is watching; sensors sleep until somebody is (see
+        # world/space/interest.py). Stay registered so a reload asks again.
+        target.ndb.sensor_pairs = None
+        target.ndb.sensor_sweep = None
+        engine.subscribe(target, 'sensors')
+        return
+    in_range = {}
+    if online:
+        index = spatial.get_index(target.location)
+        pos = target.get_pos()
+        radius = target.sensor_range()
+        horizon.note_range(radius)
+        # The index is refreshed once per engine step, so search as far as
+        # anything could have moved since and measure the candidates now.
+        for contact, dist in index.query(pos, horizon.reach(target, radius,
+                                                            engine.interval or 1)):
+            if contact != target:
+                dist = target.dist3d(contact)
+                if dist <= radius:
+                    in_range[contact] = dist
+    # identify new contacts we can see based on sensor range and
+    # put them in our contact list
+    gained = [contact for contact in in_range if contact not in contacts]
+    for contact in gained:
+        contacts.gain(contact, current, in_range[contact])
+    # drop contacts we can't see any more, including everything once the
+    # sensors go offline
+    lost = [contact for contact in contacts if contact not in in_range]
+    for contact in lost:
+        contacts.lose(contact)
+    # After a reload the engine's first sweeps only rebuild the contact
+    # tables; there is nothing new to tell the helm.
+    if not engine.ndb.rearming:
+        _report_contacts(target, gained, lost)
+    if not online:
+        target.ndb.sensor_pairs = None
+        target.ndb.sensor_sweep = None
+        engine.unsubscribe(target, 'sensors')
+        return
+    engine.subscribe(target, 'sensors')
+    target.ndb.sensor_pairs = {}
+    if shards.enabled():
+        shards.plan(target, current)
+    else:
+        _plan_sweep(target, [contact for contact, dist in
+                             index.query(pos, horizon.reach(target, radius))
+                             if contact != target], current)
+    sweep = next(_SENSOR_STAMPS)
+    target.ndb.sensor_sweep = sweep
+    engine.schedule(current + horizon.HORIZON, _sensor_sweep_due, target, sweep)
+
+
+def UpdateSensorPairs(target, source_location=None):
+    """
+    Re-plan the sensor crossings between `target` and everything around it
+    after its course, speed, position or location changed.
+    """
+    current = now()
+    # With shards the checks stay here and the planning goes to a worker.
+    local = not shards.enabled()
+    if source_location is not None and source_location != target.location:
+        shards.relocate(target, source_location)
+        for observer in list(get_engine().phases['sensors']):
+            if observer.location == source_location:
+                _check_pair(observer, target)
+    if target.ndb.sensor_pairs is not None:
+        for contact in list(target.ndb.sensor_pairs):
+            _check_pair(target, contact)
+            if local:
+                _plan_pair(target, contact, current)
+    location = target.location
+    # Nothing senses in a sleeping sector.
+    if location is None or not interest.sector_awake(location):
+        return
+    for observer, dist in spatial.get_index(location).query(target.get_pos(), horizon.reach(target)):
+        if observer != target and observer.ndb.sensor_pairs is not None:
+            _check_pair(observer, target)
+            if local:
+                _plan_pair(observer, target, current)
+    if not local:
+        shards.plan(target, current)
+
+
+def _plan_pair(observer, contact, at):
+    """Schedule the next time `contact` crosses the range of `observer`."""
+    SchedulePair(observer, contact, horizon.next_crossing(observer, contact, at))
+
+
+def SchedulePair(observer, contact, crossing):
+    """
+    Track `contact` as a pair of `observer`, checking it again at time
+    `crossing` (None if it never crosses within the horizon). Replaces any
+    crossing planned for the pair before.
+    """
+    stamp = next(_SENSOR_STAMPS)
+    observer.ndb.sensor_pairs[contact] = stamp
+    if crossing is not None:
+        get_engine().schedule(crossing, _sensor_crossing_due, observer, contact, stamp)
+
+
+def _plan_sweep(observer, contacts, at):
+    """Plan every pair of a full sweep. The predictions only need Tracks,
+    so a big sweep runs them off the reactor and schedules the crossings
+    when they come back, skipping pairs re-planned in the meantime."""
+    pairs = observer.ndb.sensor_pairs
+    stamps = []
     for contact in contacts:
-        # identify new contacts we can see based on sensor range
-        # put them in our contact list and notify consoles
-        if target.dist3d(contact) <= target.sensor_range():
-            if not contact in target.systems.sensors.contacts and contact != target:
-                # TODO: Figure out flags that we want to use
-                target.systems.sensors.contacts[contact]=["Initial",100]
-                for console in target.db.consoles:
-                    if "helm" in console.db.current_modes:
-                        console.notify("New contact %s bearing %s %s" % (contact, format_bearing(target.bearing_to(contact)), target.dist3d(contact)))
-        # drop contacts we can't see any more from our contact list and
-        # notify consoles
-        if target.dist3d(contact) > target.sensor_range():
-            if contact in target.systems.sensors.contacts and contact != target:
-                for console in target.db.consoles:
-                    if "helm" in console.db.current_modes:
-                        console.notify("Lost contact %s last seen bearing %s %s" % (contact, format_bearing(target.bearing_to(contact)), target.dist3d(contact)))
-                del target.systems.sensors.contacts[contact]
-    # Clean things up when the sensors go offline
-    for contact in target.systems.sensors.contacts.keys():
-        if not contact in contacts:
-            for console in target.db.consoles:
-                if "helm" in console.db.current_modes:
-                    console.notify("Lost contact %s last seen bearing %s %s" % (contact, format_bearing(target.bearing_to(contact)), target.dist3d(contact)))
-            del target.systems.sensors.contacts[contact]
-    if not target.systems.sensors.online():
-        for contact in target.systems.sensors.contacts:
-            for console in target.db.consoles:
-                if "helm" in console.db.current_modes:
-                    console.notify("Lost contact %s last seen bearing %s %s" % (contact, format_bearing(target.bearing_to(contact)), target.dist3d(contact)))
-                    del target.systems.sensors.contacts[contact]
-        target.ndb.space_handler.del_action(UpdateSensors)
+        stamp = next(_SENSOR_STAMPS)
+        pairs[contact] = stamp
+        stamps.append(stamp)
+    deferred = offload(horizon.crossings, horizon.Track.of(observer),
+                       [horizon.Track.of(contact) for contact in contacts],
+                       at, size=len(contacts))
+    deferred.addCallback(_apply_sweep, observer, contacts, stamps)
+    deferred.addErrback(lambda failure: logger.log_err(
+        "UpdateSensors: sweep failed for %s:\n%s" % (observer, failure.getTraceback())))
+
+
+def _apply_sweep(crossings, observer, contacts, stamps):
+    pairs = observer.ndb.sensor_pairs
+    if not observer.pk or pairs is None:
+        return
+    engine = get_engine()
+    for contact, stamp, crossing in zip(contacts, stamps, crossings):
+        if crossing is not None and pairs.get(contact) == stamp:
+            engine.schedule(crossing, _sensor_crossing_due, observer, contact, stamp)
+
+
+def _check_pair(observer, contact):
+    """Gain or lose `contact` according to where it is right now."""
+    contacts = get_contacts(observer)
+    dist = observer.dist3d(contact) if contact.pk else None
+    visible = (dist is not None and contact.location == observer.location and
+               dist <= observer.sensor_range())
+    if visible and contact not in contacts:
+        contacts.gain(contact, now(), dist)
+        _report_contacts(observer, [contact], [])
+    elif not visible and contact in contacts:
+        contacts.lose(contact)
+        _report_contacts(observer, [], [contact])
+
+
+def _report_contacts(target, gained, lost):
+    """Notify helm consoles, solving bearings for every change in one pass."""
+    bus = target.bus
+    if not (gained or lost) or not bus.manned("helm"):
+        return
+    changed, ranges, bearings, _ = target.contact_solution(gained + lost, sort=False)
+    contacts = get_contacts(target)
+    for contact, dist, bearing in zip(changed, ranges, bearings):
+        contacts.note(contact, dist, bearing)
+        if contact in gained:
+            msg = "New contact %s bearing %s %s" % (contact, format_bearing(bearing), dist)
+        else:
+            msg = "Lost contact %s last seen bearing %s %s" % (contact, format_bearing(bearing), dist)
+        bus.notify(msg, "helm")
+
+
+def _sensor_crossing_due(observer, contact, stamp):
+    """Engine timer callback for a predicted crossing."""
+    pairs = observer.ndb.sensor_pairs
+    if not observer.pk or pairs is None or pairs.get(contact) != stamp:
+        return
+    _check_pair(observer, contact)
+    if contact.pk and contact.location == observer.location:
+        _plan_pair(observer, contact, now())
+    else:
+        del pairs[contact]
+
+
+def _sensor_sweep_due(target, sweep):
+    """Engine timer callback when the sensor horizon runs out."""
+    if target.pk and target.ndb.sensor_sweep == sweep:
+        UpdateSensors(target)
 
 #------------------------------------------------------------
 #
-# UpdatePower - Engineering code to handle power allocation and subsystem performance
+# UpdatePower - Engineering code to handle power allocation and
+# subsystem performance. Event driven: each call settles the
+# power ramps up to now, notifies consoles of anything that
+# came online, went offline or reached its setting, re-plans
+# the ramps with world.space.power and asks the engine to call
+# back when the next of those events is due. Call it whenever a
+# set_power changes.
 #
 #------------------------------------------------------------
 def UpdatePower(target):
-    # Check if there's a handler, make one if needed
-    if not target.ndb.space_handler:
-        target.ndb.space_handler = create_script(SpaceHandler, obj=target)
-    if not UpdatePower in target.ndb.space_handler.db.update:
-        target.ndb.space_handler.add_action(UpdatePower)
-    producing = []
-    consuming = []
+    engine = get_engine()
+    systems = [target.systems.get(key) for key in target.systems.all]
     grid = target.systems.power_grid
-    for system in target.systems.all:
-        system = target.systems[system]
-        if system._data['type'] == 'producer':
-            if system.set_power != system.current_power:
-                producing.append(system)
-        if system._data['type'] == 'consumer':
-            if system.set_power != system.current_power:
-                consuming.append(system)
-    if not producing and not consuming:
-        return target.ndb.space_handler.del_action(UpdatePower)
-    if producing:
-        rate = grid.rate / len(producing)
-    for system in producing:
-        if system.set_power > system.current_power:
-            if system.current_power + rate > system.set_power:
-                rate = system.set_power - system.current_power
-            if not system.online() and system.current_power + rate >= system.min_power:
-                system.current_power += rate
-                for console in target.db.consoles:
-                    console.notify("{} online.".format(system.name))
-            else:
-                system.current_power += rate
-            if system.current_power > system.max_power:
-                system.current_power = system.max_power
-            if system.set_power == system.current_power:
-                producing.remove(system)
-                for console in target.db.consoles:
-                    console.notify("{} output now at {}".format(system.name, system.percent()))
-        if system.set_power < system.current_power:
-            if system.current_power - rate < system.set_power:
-                rate = system.current_power - system.set_power
-            if system.online() and system.current_power - rate < system.min_power:
-                for console in target.db.consoles:
-                    console.notify("{} offline.".format(system.name))
-            system.current_power -= rate
-            if system.current_power < 0:
-                system.set_power = 0
-                system.current_power = 0
-            if system.set_power == system.current_power:
-                producing.remove(system)
-                for console in target.db.consoles:
-                    console.notify("{} output now at {}".format(system.name, system.percent()))
-    #Rate adjusted to account for the number of systems currently routing power
-    if consuming:
-        rate = grid.rate / len(consuming)
-    for system in consuming:
-        if system.set_power > system.current_power:
-            if system.current_power + rate > system.set_power:
-                rate = system.set_power - system.current_power
-            if not system.online() and system.current_power + rate >= system.min_power:
-                system.current_power += rate
-                for console in target.db.consoles:
-                    console.notify("{} online.".format(system.name))
-                if system == target.systems.sensors:
-                    UpdateSensors(target)
-            else:
-                system.current_power += rate
-            if system.current_power > system.max_power:
-                system.current_power = system.max_power
-            if system.set_power == system.current_power:
-                consuming.remove(system)
-                for console in target.db.consoles:
-                    console.notify("{} now at {}".format(system.name, system.percent()))
-        if system.set_power < system.current_power:
-            if system.current_power - rate < system.set_power:
-                rate = system.current_power - system.set_power
-            if system.online() and system.current_power - rate < system.min_power:
-                for console in target.db.consoles:
-                    console.notify("{} offline.".format(system.name))
-            system.current_power -= rate
-            if system.current_power < 0:
-                system.set_power = 0
-                system.current_power = 0
-            if system.set_power == system.current_power:
-                consuming.remove(system)
-                for console in target.db.consoles:
-                    console.notify("{} now at {}".format(system.name, system.percent()))
+    rate = grid.rate if grid else 0
+    current = now()
+    events = []
+    # Replay events that came due since the last plan at their exact
+    # times, so a late wake-up doesn't skew how the grid was shared.
+    due = target.ndb.power_due
+    while due is not None and due <= current:
+        events += power.settle(systems, due)
+        due = power.plan(systems, rate, due)
+    events += power.settle(systems, current)
+    due = power.plan(systems, rate, current)
+    target.ndb.power_due = due
+    if due is None:
+        engine.unsubscribe(target, 'power')
+    else:
+        engine.subscribe(target, 'power')
+        engine.schedule(due, _power_due, target, due)
+    sensors = target.systems.sensors
+    if sensors is not None and (sensors.ramping or
+                                any(system is sensors for system, event in events)):
+        # Sensor range follows sensor power; re-plan contact crossings.
+        UpdateSensors(target)
+    for system, event in events:
+        if event == 'online':
+            msg = "{} online.".format(system.name)
+        elif event == 'offline':
+            msg = "{} offline.".format(system.name)
+        elif system.type == 'producer':
+            msg = "{} output now at {}".format(system.name, system.percent())
+        else:
+            msg = "{} now at {}".format(system.name, system.percent())
+        target.bus.notify(msg)
+
+
+def _power_due(target, due):
+    """Engine timer callback; ignored if the plan has changed since."""
+    if target.pk and target.ndb.power_due == due:
+        UpdatePower(target)
@@ -34,6 +34,10 @@ Component: Provides functionality to SpaceObject
 
                     Ranges: Point blank(<=1k), Close(1-10k), Medium(50k), Long(100k), Extended(200k)
 """
+from copy import deepcopy
+from django.db import transaction
+from world.space.systems import SystemException, make_system
+
 class TemplateException(Exception):
     def __init__(self, msg):
         self.msg = msg
@@ -43,23 +47,54 @@ STATION_TEMPLATES = ['defaultstation']
 
 ALL_TEMPLATES = (SHIP_TEMPLATES + STATION_TEMPLATES)
 
+# Template name -> CompiledTemplate, filled by compile_templates().
+_COMPILED = {}
+
 def apply_template(spaceobj, template, reset=False):
     """Set a spaceobj's systems and initialize
     Args:
         spaceobj (SpaceObject): the space object being initialized
-        name (str): single system to apply
+        template (str): name of the template to apply
         reset (bool): if True, remove any current system and apply the named system
     """
+    template = get_template(template)
+    spaceobj.db.spaceframe = template.name
+    spaceobj.systems.add_many(template.build(), replace=reset)
+
+def apply_templates(spaceobjs, template, reset=False):
+    """Apply one template to many spaceobjs in a single transaction.
+    Args:
+        spaceobjs (iterable): the space objects being initialized
+        template (str): name of the template to apply
+        reset (bool): if True, remove their current systems first
+    """
+    template = get_template(template)
+    with transaction.atomic():
+        for spaceobj in spaceobjs:
+            spaceobj.db.spaceframe = template.name
+            spaceobj.systems.add_many(template.build(), replace=reset)
+
+def compile_templates():
+    """Validate and compile every template in ALL_TEMPLATES, so a broken
+    template fails at server start rather than at the first spawn.
+    Returns:
+        (int): number of templates compiled
+    """
+    compiled = {}
+    for tname in ALL_TEMPLATES:
+        compiled[tname] = CompiledTemplate(load_template(tname))
+    _COMPILED.clear()
+    _COMPILED.update(compiled)
+    return len(compiled)
+
+def get_template(template):
+    """Return the CompiledTemplate named `template`."""
     tname = template.lower()
     if tname not in ALL_TEMPLATES:
         raise TemplateException('Invalid template.')
-
-    template = load_template(tname)
-    spaceobj.db.spaceframe = template.name
-    if reset:
-        spaceobj.systems.clear()
-    for key, kwargs in template.systems.iteritems():
-        spaceobj.systems.add(key, **kwargs)
+    if tname not in _COMPILED:
+        _COMPILED[tname] = CompiledTemplate(load_template(tname))
+    return _COMPILED[tname]
 
 def load_template(template):
     template = template.title()
@@ -69,6 +104,33 @@ def load_template(template):
         raise TemplateException("Invalid template specified.")
     return template
 
+class CompiledTemplate(object):
+    """
+    A template checked and expanded into complete system data once, so
+    applying it only copies dicts.
+    Args:
+        template (Template): the template to compile
+    """
+    def __init__(self, template):
+        self.name = template.name
+        self.systems = {}
+        for key, kwargs in template.systems.items():
+            try:
+                system = make_system(**kwargs)
+            except (SystemException, TypeError) as err:
+                raise TemplateException("{}: system '{}': {}".format(
+                    template.name, key, getattr(err, 'msg', err)))
+            if system['min_power'] > system['max_power']:
+                raise TemplateException(
+                    "{}: system '{}': min_power is above max_power.".format(
+                        template.name, key))
+            self.systems[key] = system
+
+    def build(self):
+        """Fresh system data for one spaceobj."""
+        return dict((key, dict(system, extra=deepcopy(system['extra'])))
+                    for key, system in self.systems.items())
+
 class Template(object):
     """
     Sane defaults for all templates
@@ -82,7 +144,7 @@ class Template(object):
             'core': {'type': 'producer', 'name': 'Core', 'min_power': 1, 'max_power': 100, 'max_hp': 100, 'extra': {}},
             'ftl_engines': {'name': 'FTL Engines', 'min_power': 10, 'max_power': 100, 'max_hp': 100, 'extra': {}},
             'sublight_engines': {'name': 'Sublight Engines', 'min_power': 10, 'max_power': 100, 'max_hp': 100, 'extra': {}},
-            'sensors': {'name': 'Sensors', 'min_power': 10, 'max_power': 1750, 'max_hp': 100, 'extra': ({'contacts': {}})},
+            'sensors': {'name': 'Sensors', 'min_power': 10, 'max_power': 1750, 'max_hp': 100, 'extra': {}},
             'beam_control': {'name': 'Beam Control', 'min_power': 10, 'max_power': 100, 'max_hp': 100, 'extra': {}},
             'torpedo_control': {'name': 'Torpedo Control', 'min_power': 10, 'max_power': 100, 'max_hp': 100, 'extra': {}},
             'shield_manager': {'name': 'Shield Manager', 'min_power': 10, 'max_power': 100, 'max_hp': 100, 'extra': {}},
@@ -0,0 +1,13 @@
+"""
+Space tests
+
+Tests for the space simulation, one module per feature. They run the real
+world/space code on the stand-ins for Evennia, Django and Twisted, on a
+simulated engine clock, so they need neither a server nor a game database.
+From the game directory:
+
+    python -m unittest discover -s world/space/tests -t .
+
+The stand-ins can't replace a Django that is already set up, so under
+`evennia test` the tests that need them are skipped.
+"""
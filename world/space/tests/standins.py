@@ -0,0 +1,557 @@
+"""
+Stand-ins
+
+Just enough of Evennia, Django and Twisted for the space simulation to run
+in a plain Python process, on Python 2 or 3, with neither installed: no
+server, no game settings module and no database. The offline benchmark
+(world/space/benchmark.py) and the space tests in this package run on
+them; the game itself never imports this module.
+
+`install()` registers small modules under the real names in sys.modules,
+so the world/space code imports them unchanged. Objects keep their
+attributes, tags, `db` and `ndb` in plain dicts, and `create_object`,
+`create_script`, `search_tag`, `search_script`, ServerConfig and ObjectDB
+work on in-memory registries that `reset()` empties. Twisted's Deferreds
+fire synchronously, as they do in world/space/offload.py whenever the
+reactor isn't running.
+
+Usage (before anything imports Evennia or Django):
+    from world.space.tests import standins
+    standins.install(SPACE_KINEMATICS_BACKEND='numpy')
+    from world.space.objects import Ship
+"""
+import copy
+import os
+import sys
+import tempfile
+import traceback
+import types
+from itertools import count
+
+# id -> object, for every object and script created and not deleted
+OBJECTS = {}
+# (tag, category) -> set of objects carrying it
+TAGS = {}
+# ServerConfig key -> value
+CONFIG = {}
+# channel key -> messages sent to it
+CHANNELS = {}
+# (callback, args, kwargs) handed to `delay()` and not yet run
+DELAYED = []
+# Whether `install()` has run.
+_INSTALLED = [False]
+_IDS = count(1)
+
+
+def installed():
+    """True if the stand-ins are in place."""
+    return _INSTALLED[0]
+
+
+def install(**settings):
+    """Register the stand-in modules. Keyword arguments become Django
+    settings, over the defaults in `Settings`. Calling it again only
+    updates the settings.
+    Returns:
+        (Settings): the stand-in `django.conf.settings`
+    """
+    if _INSTALLED[0]:
+        conf = sys.modules['django.conf'].settings
+        conf.__dict__.update(settings)
+        return conf
+    for name in ('django', 'evennia'):
+        if name in sys.modules:
+            raise RuntimeError("%s is already imported; install the stand-ins "
+                               "before anything imports it." % name)
+    _module('django')
+    conf = _module('django.conf', settings=Settings(**settings))
+    _module('django.db', transaction=_Transaction())
+    _module('evennia', DefaultObject=DefaultObject, DefaultScript=DefaultScript,
+            create_script=create_script, search_script=search_script,
+            search_channel=search_channel, search_object=search_object,
+            search_tag=search_tag)
+    logger = _module('evennia.utils.logger', log_info=_log, log_warn=_log,
+                     log_err=_log, log_dep=_log, log_trace=log_trace)
+    _module('evennia.utils', logger=logger, lazy_property=lazy_property,
+            delay=delay)
+    _module('evennia.utils.utils', inherits_from=inherits_from)
+    _module('evennia.utils.dbserialize', _SaverDict=_SaverDict,
+            _SaverList=_SaverList, to_pickle=to_pickle, from_pickle=from_pickle)
+    _module('evennia.utils.create', create_object=create_object,
+            create_script=create_script)
+    _module('evennia.server')
+    _module('evennia.server.models', ServerConfig=ServerConfig)
+    _module('evennia.objects')
+    _module('evennia.objects.models', ObjectDB=ObjectDB)
+    _module('twisted')
+    _module('twisted.internet', defer=_module('twisted.internet.defer',
+                                              Deferred=Deferred,
+                                              maybeDeferred=maybeDeferred,
+                                              succeed=succeed),
+            reactor=_Reactor(), threads=_module('twisted.internet.threads'))
+    _module('twisted.python')
+    _module('twisted.python.threadpool', ThreadPool=None)
+    _INSTALLED[0] = True
+    return conf.settings
+
+
+def _module(name, **attributes):
+    module = types.ModuleType(str(name))
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    parent, _, child = name.rpartition('.')
+    if parent in sys.modules:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def reset():
+    """Forget every object, script, tag, config value, channel message and
+    pending delay."""
+    for registry in (OBJECTS, TAGS, CONFIG, CHANNELS):
+        registry.clear()
+    del DELAYED[:]
+
+
+def run_delayed():
+    """Run every callback handed to `delay()` so far, as if their time had
+    come. Returns how many ran."""
+    ran = 0
+    while DELAYED:
+        callback, args, kwargs = DELAYED.pop(0)
+        callback(*args, **kwargs)
+        ran += 1
+    return ran
+
+#------------------------------------------------------------
+#
+# Django
+#
+#------------------------------------------------------------
+
+class Settings(object):
+    """Game settings: unset names raise AttributeError, so the space code
+    falls back to its own defaults."""
+    def __init__(self, **settings):
+        self.GAME_DIR = os.path.dirname(os.path.dirname(os.path.dirname(
+            os.path.abspath(__file__))))
+        # Never overwrite the game's own snapshot.
+        self.SPACE_SNAPSHOT_PATH = os.path.join(
+            tempfile.gettempdir(), 'space-standins-%d.snapshot' % os.getpid())
+        self.__dict__.update(settings)
+
+
+class _Transaction(object):
+    """`django.db.transaction`: atomic() is a no-op context manager."""
+    def atomic(self):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+#------------------------------------------------------------
+#
+# Evennia
+#
+#------------------------------------------------------------
+
+def _log(message='', *args, **kwargs):
+    sys.stderr.write('%s\n' % message)
+
+
+def log_trace(message='', *args, **kwargs):
+    traceback.print_exc()
+    _log(message)
+
+
+_MISSING = object()
+
+
+class lazy_property(object):
+    """Evennia's lazy_property: computed on first access, then cached in
+    the instance dict."""
+    def __init__(self, func):
+        self.func = func
+        self.__name__ = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        value = obj.__dict__.get(self.__name__, _MISSING)
+        if value is _MISSING:
+            value = obj.__dict__[self.__name__] = self.func(obj)
+        return value
+
+
+def delay(timedelay, callback, *args, **kwargs):
+    """Queue `callback` for `run_delayed()`; there is no reactor to wait."""
+    DELAYED.append((callback, args, kwargs))
+
+
+def inherits_from(obj, parent):
+    """True if `obj` (an instance or class) has `parent` (a class or its
+    python path) among its classes, compared by path as Evennia does."""
+    cls = obj if isinstance(obj, type) else type(obj)
+    paths = ['%s.%s' % (klass.__module__, klass.__name__) for klass in cls.__mro__]
+    if isinstance(parent, type):
+        parent = '%s.%s' % (parent.__module__, parent.__name__)
+    return parent in paths
+
+
+class _SaverDict(dict):
+    pass
+
+
+class _SaverList(list):
+    pass
+
+
+def to_pickle(data):
+    """A plain copy of `data`, with _Saver wrappers replaced."""
+    if isinstance(data, dict):
+        return dict((to_pickle(key), to_pickle(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return [to_pickle(value) for value in data]
+    if isinstance(data, tuple):
+        return tuple(to_pickle(value) for value in data)
+    if isinstance(data, (set, frozenset)):
+        return type(data)(to_pickle(value) for value in data)
+    if isinstance(data, DefaultObject):
+        return data
+    return copy.copy(data)
+
+
+def from_pickle(data, db_obj=None):
+    return to_pickle(data)
+
+
+def _saver(data):
+    """`data` as the database hands it back: dicts and lists wrapped."""
+    if isinstance(data, dict):
+        return _SaverDict((key, _saver(value)) for key, value in data.items())
+    if isinstance(data, list):
+        return _SaverList(_saver(value) for value in data)
+    return data
+
+
+class Attributes(dict):
+    """An object's AttributeHandler, backed by the dict itself. Stored dicts
+    and lists come back as _SaverDicts and _SaverLists, as they do from the
+    database, though changing them in place is all it takes to save them."""
+    def has(self, key):
+        return key in self
+
+    def add(self, key, value, **kwargs):
+        self[key] = _saver(value)
+
+    def get(self, key, default=None, **kwargs):
+        return dict.get(self, key, default)
+
+    def batch_add(self, *pairs, **kwargs):
+        for pair in pairs:
+            self.add(pair[0], pair[1])
+
+    def remove(self, key, **kwargs):
+        self.pop(key, None)
+
+
+class Holder(object):
+    """`obj.db` and `obj.ndb`: unset names read as None."""
+    def __init__(self, store=None):
+        object.__setattr__(self, '_store', {} if store is None else store)
+
+    def __getattr__(self, name):
+        return self._store.get(name)
+
+    def __setattr__(self, name, value):
+        if isinstance(self._store, Attributes):
+            self._store.add(name, value)
+        else:
+            self._store[name] = value
+
+    def __delattr__(self, name):
+        self._store.pop(name, None)
+
+
+class Tags(object):
+    """An object's TagHandler, indexed for `search_tag`."""
+    def __init__(self, obj):
+        self.obj = obj
+        self.tags = set()
+
+    def add(self, tag, category=None, **kwargs):
+        self.tags.add((tag, category))
+        TAGS.setdefault((tag, category), set()).add(self.obj)
+
+    def remove(self, tag, category=None, **kwargs):
+        self.tags.discard((tag, category))
+        TAGS.get((tag, category), set()).discard(self.obj)
+
+    def get(self, tag=None, category=None, **kwargs):
+        return [key for key, cat in self.tags
+                if (tag is None or key == tag) and cat == category]
+
+    def clear(self):
+        for tag, category in list(self.tags):
+            self.remove(tag, category)
+
+
+class DefaultObject(object):
+    """
+    A database-free Evennia object. Its `location` keeps the contents of
+    both ends up to date; `move_to` also calls the move hooks.
+    Args:
+        key (str): name
+        location (DefaultObject): where it is
+    """
+    has_account = False
+
+    def __init__(self, key='', location=None):
+        self.id = self.pk = next(_IDS)
+        self.key = key
+        self.contents = []
+        self.attributes = Attributes()
+        self.db = Holder(self.attributes)
+        self.ndb = Holder()
+        self.tags = Tags(self)
+        self._location = None
+        self.location = self.home = location
+        OBJECTS[self.id] = self
+
+    def __str__(self):
+        return self.key
+
+    def __repr__(self):
+        return '<%s %s(#%s)>' % (type(self).__name__, self.key, self.id)
+
+    def _get_name(self):
+        return self.key
+
+    def _set_name(self, name):
+        self.key = name
+    name = property(_get_name, _set_name)
+
+    @property
+    def dbref(self):
+        return '#%s' % self.id
+
+    def _get_location(self):
+        return self._location
+
+    def _set_location(self, location):
+        if self._location is not None and self in self._location.contents:
+            self._location.contents.remove(self)
+        self._location = location
+        if location is not None:
+            location.contents.append(self)
+    location = property(_get_location, _set_location)
+
+    def move_to(self, destination, quiet=False, **kwargs):
+        source = self.location
+        self.location = destination
+        self.at_after_move(source)
+        return True
+
+    def delete(self):
+        if not self.pk:
+            return False
+        self.at_object_delete()
+        self.location = None
+        self.tags.clear()
+        OBJECTS.pop(self.id, None)
+        self.pk = None
+        return True
+
+    def msg(self, *args, **kwargs):
+        pass
+
+    def msg_contents(self, *args, **kwargs):
+        pass
+
+    def at_object_creation(self):
+        pass
+
+    def at_after_move(self, source_location, **kwargs):
+        pass
+
+    def at_object_delete(self):
+        return True
+
+
+class DefaultScript(DefaultObject):
+    """A database-free Evennia script; nothing calls `at_repeat` for it."""
+    def __init__(self, key=''):
+        super(DefaultScript, self).__init__(key)
+        self.interval = 0
+        self.persistent = False
+        self.desc = ''
+
+    def at_script_creation(self):
+        pass
+
+    def at_start(self):
+        pass
+
+    def at_stop(self):
+        pass
+
+    def at_repeat(self):
+        pass
+
+
+def create_object(typeclass, key=None, location=None, home=None,
+                  attributes=None, tags=None, **kwargs):
+    """Make an object of `typeclass` and run its creation hook, then give it
+    `attributes` ((key, value) pairs) and `tags` ((tag, category) pairs)."""
+    obj = typeclass(key or '', location)
+    if home is not None:
+        obj.home = home
+    obj.at_object_creation()
+    for tag in tags or ():
+        obj.tags.add(*tag)
+    for pair in attributes or ():
+        obj.attributes.add(pair[0], pair[1])
+    return obj
+
+
+def create_script(typeclass, key=None, **kwargs):
+    """Make a script of `typeclass` and start it."""
+    script = typeclass(key or '')
+    script.at_script_creation()
+    if key:
+        script.key = key
+    script.at_start()
+    return script
+
+
+def search_script(key):
+    return [obj for obj in OBJECTS.values()
+            if isinstance(obj, DefaultScript) and obj.key == key]
+
+
+def search_object(key, **kwargs):
+    return [obj for obj in OBJECTS.values() if obj.key == key or obj.dbref == key]
+
+
+def search_tag(key=None, category=None, **kwargs):
+    return list(TAGS.get((key, category), ()))
+
+
+class Channel(object):
+    """A channel that keeps what it is sent in CHANNELS."""
+    pk = 1
+
+    def __init__(self, key):
+        self.key = key
+
+    def msg(self, message, *args, **kwargs):
+        CHANNELS.setdefault(self.key, []).append(message)
+
+
+def search_channel(key):
+    return [Channel(key)]
+
+
+class _ConfigManager(object):
+    def conf(self, key, value=None, delete=False, default=None):
+        if delete:
+            CONFIG.pop(key, None)
+        elif value is not None:
+            CONFIG[key] = value
+        else:
+            return CONFIG.get(key, default)
+
+
+class ServerConfig(object):
+    objects = _ConfigManager()
+
+
+class _ObjectManager(object):
+    def filter(self, id__in=(), **kwargs):
+        return [OBJECTS[dbref] for dbref in id__in if dbref in OBJECTS]
+
+
+class ObjectDB(object):
+    objects = _ObjectManager()
+
+#------------------------------------------------------------
+#
+# Twisted
+#
+#------------------------------------------------------------
+
+class _Reactor(object):
+    running = False
+
+    def addSystemEventTrigger(self, *args, **kwargs):
+        pass
+
+
+class Failure(object):
+    def __init__(self):
+        self.type, self.value = sys.exc_info()[:2]
+        self.traceback = traceback.format_exc()
+
+    def getTraceback(self):
+        return self.traceback
+
+
+class Deferred(object):
+    """A Deferred whose callbacks run as soon as it has a result."""
+    def __init__(self):
+        self.called = False
+        self.result = None
+        self.callbacks = []
+
+    def addCallbacks(self, callback, errback=None, callbackArgs=(),
+                     errbackArgs=()):
+        self.callbacks.append(((callback, callbackArgs), (errback, errbackArgs)))
+        self._run()
+        return self
+
+    def addCallback(self, callback, *args):
+        return self.addCallbacks(callback, None, args)
+
+    def addErrback(self, errback, *args):
+        return self.addCallbacks(None, errback, errbackArgs=args)
+
+    def addBoth(self, callback, *args):
+        return self.addCallbacks(callback, callback, args, args)
+
+    def callback(self, result):
+        self.called = True
+        self.result = result
+        self._run()
+
+    def _run(self):
+        while self.called and self.callbacks:
+            success, failure = self.callbacks.pop(0)
+            func, args = failure if isinstance(self.result, Failure) else success
+            if func is None:
+                continue
+            try:
+                self.result = func(self.result, *args)
+            except Exception:
+                self.result = Failure()
+
+
+def succeed(result):
+    deferred = Deferred()
+    deferred.callback(result)
+    return deferred
+
+
+def maybeDeferred(func, *args, **kwargs):
+    deferred = Deferred()
+    try:
+        result = func(*args, **kwargs)
+    except Exception:
+        result = Failure()
+    if isinstance(result, Deferred):
+        return result
+    deferred.callback(result)
+    return deferred
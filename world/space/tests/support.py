@@ -0,0 +1,80 @@
+"""
+Shared setup for the space tests. Import it before anything from
+world/space, so the stand-ins are in place first.
+"""
+import random
+import unittest
+from world.space.tests import standins
+
+try:
+    standins.install()
+except RuntimeError:
+    # A real Evennia is set up, as under `evennia test`.
+    pass
+
+from evennia import create_script
+from typeclasses.objects import Object
+from world.space import announce, benchmark, interest, links, snapshot
+from world.space import spatial, state
+from world.space import engine as engine_module
+from world.space.objects import Ship
+
+START = 1000.0
+
+# For tests that only run on the stand-ins.
+needs_standins = unittest.skipUnless(standins.installed(),
+                                     "needs the space stand-ins")
+
+
+@needs_standins
+class SpaceTestCase(unittest.TestCase):
+    """Gives each test an engine on a simulated clock starting at START and
+    an empty sector, and clears the simulation's module state after it."""
+
+    def setUp(self):
+        self.clock = [START]
+        engine_module.set_clock(lambda: self.clock[0])
+        self.engine = create_script(engine_module.SpaceEngine,
+                                    key=engine_module.ENGINE_KEY)
+        engine_module._ENGINE = self.engine
+        self.sector = Object('Sector')
+        self.ships = []
+
+    def tearDown(self):
+        for ship in self.ships:
+            links.forget(ship)
+            interest.forget(ship)
+            snapshot.forget(ship)
+        spatial.drop_index(self.sector)
+        interest.drop_sector(self.sector)
+        snapshot.close()
+        snapshot._VALID[0] = False
+        state._DIRTY.clear()
+        announce._PENDING.clear()
+        announce._WINDOW[0] = False
+        engine_module._ENGINE = None
+        engine_module.set_clock()
+        standins.reset()
+
+    def spawn(self, count, watched=True):
+        """Spawn `count` ships from the templates, as the benchmark does."""
+        ships = benchmark.spawn(Ship, count, self.sector, 1000.0,
+                                random.Random(0))
+        for ship in ships:
+            if watched:
+                interest.watch(ship)
+        self.ships.extend(ships)
+        return ships
+
+    def advance(self, until, step=1.0):
+        """Tick the engine every `step` seconds up to `until`."""
+        while self.clock[0] < until:
+            self.clock[0] += step
+            self.engine.at_repeat()
+
+    def notices(self, ship):
+        """Collect the console notifications of `ship` as (time, message)."""
+        sent = []
+        ship.bus.notify = lambda msg, *args, **kwargs: sent.append(
+            (engine_module.now(), msg))
+        return sent
@@ -0,0 +1,49 @@
+from world.space.tests import standins
+from world.space.tests.support import SpaceTestCase
+from world.space import announce
+
+
+class TestAnnounce(SpaceTestCase):
+
+    def sent(self):
+        return standins.CHANNELS.get(announce.CHANNEL_KEY, [])
+
+    def test_channel_is_looked_up_once(self):
+        lookups = []
+        search = announce.search_channel
+
+        def counted(key):
+            lookups.append(key)
+            return search(key)
+        announce.search_channel = counted
+        del announce._CHANNEL[:]
+        try:
+            for n in range(3):
+                announce.send('message %d' % n)
+        finally:
+            announce.search_channel = search
+        self.assertEqual(lookups, [announce.CHANNEL_KEY])
+        self.assertEqual(len(self.sent()), 3)
+
+    def test_burst_is_batched_and_summarized(self):
+        announce.announce('first')
+        for n in range(announce.SUMMARY_NAMES + 1):
+            announce.announce('Console %d attached.' % n,
+                              'consoles attached', 'Console %d' % n)
+        announce.announce('last')
+        self.assertEqual(self.sent(), ['first'])
+        self.assertEqual(standins.run_delayed(), 2)
+        self.assertEqual(self.sent()[1:], [
+            '6 consoles attached: Console 0, Console 1, Console 2, '
+            'Console 3, Console 4 and 1 more.\nlast'])
+        # The window has closed; the next announcement goes straight out.
+        announce.announce('later')
+        self.assertEqual(self.sent()[-1], 'later')
+
+    def test_short_run_is_sent_in_full(self):
+        announce.announce('first')
+        for n in range(announce.SUMMARY_THRESHOLD):
+            announce.announce('Console %d attached.' % n, 'consoles attached')
+        standins.run_delayed()
+        self.assertEqual(self.sent()[1], 'Console 0 attached.\n'
+                         'Console 1 attached.\nConsole 2 attached.')
@@ -0,0 +1,46 @@
+import random
+import unittest
+from world.space import utils
+from world.space.utils import Vector3
+
+
+def _scene(count, seed=0):
+    rng = random.Random(seed)
+    origin = (rng.uniform(-1, 1), rng.uniform(-1, 1), rng.uniform(-1, 1))
+    heading = (rng.uniform(0, 360), rng.uniform(-90, 90))
+    points = [(round(rng.uniform(-1, 1), 4), round(rng.uniform(-1, 1), 4),
+               round(rng.uniform(-1, 1), 4)) for i in range(count)]
+    velocities = [(rng.uniform(-9, 9), 0.0, 0.0) for i in range(count)]
+    return origin, heading, points, velocities
+
+
+class TestBearings(unittest.TestCase):
+
+    def test_solve_contacts_matches_bearing_between(self):
+        origin, heading, points, velocities = _scene(utils.BATCH_MIN - 1)
+        ranges, bearings, relative = utils.solve_contacts(
+            origin, heading, (1.0, 0, 0), points, velocities)
+        for point, velocity, distance, bearing, rel in zip(
+                points, velocities, ranges, bearings, relative):
+            self.assertEqual(bearing, utils.bearing_between(origin, point, *heading))
+            self.assertAlmostEqual(distance, (Vector3(*point) - Vector3(*origin)).length)
+            self.assertEqual(rel, (velocity[0] - 1.0, 0.0, 0.0))
+
+    def test_rank_contacts_sorts_by_range(self):
+        origin, heading, points, velocities = _scene(10)
+        order, ranges, bearings, _ = utils.rank_contacts(
+            origin, heading, (0, 0, 0), points, velocities)
+        self.assertEqual(ranges, sorted(ranges))
+        self.assertEqual(bearings, [utils.bearing_between(origin, points[i], *heading)
+                                    for i in order])
+
+    @unittest.skipIf(utils.np is None, "needs NumPy")
+    def test_numpy_bearings_match(self):
+        origin, heading, points, velocities = _scene(500)
+        ranges, bearings, relative = utils._solve_contacts_np(
+            origin, heading, (0, 0, 0), points, velocities)
+        for point, velocity, distance, bearing, rel in zip(
+                points, velocities, ranges, bearings, relative):
+            self.assertEqual(bearing, utils.bearing_between(origin, point, *heading))
+            self.assertAlmostEqual(distance, (Vector3(*point) - Vector3(*origin)).length)
+            self.assertEqual(rel, tuple(velocity))
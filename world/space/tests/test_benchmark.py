@@ -0,0 +1,30 @@
+import unittest
+from world.space.tests import standins
+from world.space.tests.support import needs_standins
+from world.space import benchmark
+from world.space import engine as engine_module
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+@needs_standins
+class TestBenchmark(unittest.TestCase):
+
+    def test_run_size(self):
+        result = benchmark.run_size(10, ticks=5)
+        self.assertEqual(result['ships'], 10)
+        self.assertEqual(result['observed'], 10)
+        self.assertGreater(result['ticks_per_s'], 0)
+        self.assertIn('db_writes', result['profile'])
+        # Nothing is left behind for the next run.
+        self.assertIsNone(engine_module._ENGINE)
+        self.assertEqual(standins.OBJECTS, {})
+
+    def test_run_prints_a_row_per_size(self):
+        out = StringIO()
+        results = benchmark.run((5, 10), ticks=2, out=out, observed=0.5)
+        self.assertEqual([result['observed'] for result in results], [3, 5])
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
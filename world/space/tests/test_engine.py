@@ -0,0 +1,78 @@
+from world.space.tests.support import SpaceTestCase, START
+from world.space import state, systems
+from world.space import engine as engine_module
+from world.space.utils import Vector3
+
+
+class TestRegistry(SpaceTestCase):
+
+    def test_registry_is_written_once_per_flush(self):
+        ships = self.spawn(20)
+        self.engine.flush()
+        writes = state.writes()
+        for ship in ships:
+            self.engine.subscribe(ship, 'position')
+            self.engine.subscribe(ship, 'heading')
+        self.assertEqual(state.writes(), writes)
+        self.assertEqual(self.engine.flush(), 2)
+        self.assertEqual(state.writes(), writes + 1)
+        self.assertEqual(set(self.engine.db.registry['position']), set(ships))
+        self.assertEqual(self.engine.flush(), 0)
+
+    def test_unsubscribe_reaches_the_registry(self):
+        ship, = self.spawn(1)
+        self.engine.subscribe(ship, 'position')
+        self.engine.flush()
+        self.engine.unsubscribe(ship, 'position')
+        self.assertEqual(self.engine.flush(), 1)
+        self.assertEqual(list(self.engine.db.registry['position']), [])
+
+
+class TestCatchUp(SpaceTestCase):
+
+    def contact_times(self, step):
+        """Two ships 0.06 light seconds apart, one closing at 100 km/s.
+        Returns when each gained or lost the other, in simulated time."""
+        log = []
+
+        def report(target, gained, lost):
+            if gained or lost:
+                log.append((round(engine_module.now(), 4), target.key,
+                            len(gained), len(lost)))
+        systems._report_contacts, report = report, systems._report_contacts
+        try:
+            a, b = self.spawn(2)
+            systems.UpdatePosition(a, Vector3(0, 0, 0))
+            systems.UpdatePosition(b, Vector3(0.06, 0, 0))
+            systems.UpdateSensors(a)
+            systems.UpdateSensors(b)
+            b.setheading((270, 0))
+            b.setspeed(100)
+            self.advance(START + 200, step)
+        finally:
+            systems._report_contacts = report
+        return sorted(log)
+
+    def restart(self):
+        self.tearDown()
+        self.setUp()
+
+    def test_contact_time_does_not_depend_on_tick_spacing(self):
+        expected = self.contact_times(1.0)
+        # Each ship picks the other up once, and nothing is lost.
+        self.assertEqual([entry[1:] for entry in expected],
+                         [('Ship 0', 1, 0), ('Ship 1', 1, 0)])
+        for step in (1.5, 7.0):
+            self.restart()
+            self.assertEqual(self.contact_times(step), expected)
+
+    def test_contact_time_with_starved_frame_budget(self):
+        expected = self.contact_times(1.0)
+        self.restart()
+        budget = engine_module.FRAME_BUDGET
+        engine_module.FRAME_BUDGET = 1e-12
+        try:
+            self.assertEqual(self.contact_times(1.0), expected)
+        finally:
+            engine_module.FRAME_BUDGET = budget
+        self.assertEqual(engine_module.lag(), 0)
@@ -0,0 +1,50 @@
+from world.space.tests import standins
+from world.space.tests.support import SpaceTestCase
+from world.space import announce, spatial
+from world.space.fleet import FleetException, MAX_FLEET, spawn_fleet
+from world.space.objects import Station
+from world.space.utils import Vector3
+
+
+class TestFleet(SpaceTestCase):
+
+    def spawn_fleet(self, *args, **kwargs):
+        fleet = spawn_fleet(*args, **kwargs)
+        self.ships.extend(fleet)
+        return fleet
+
+    def test_spawn_fleet(self):
+        center = Vector3(1, 2, 3)
+        fleet = self.spawn_fleet('defaultship', 5, self.sector, center,
+                                 spread=1.0, prefix='Wing')
+        self.assertEqual([ship.key for ship in fleet],
+                         ['Wing %d' % n for n in range(1, 6)])
+        index = spatial.get_index(self.sector)
+        for ship in fleet:
+            self.assertEqual(ship.location, self.sector)
+            self.assertTrue(ship.systems.all)
+            self.assertTrue(ship.tags.get(ship.key, category='spaceobj'))
+            self.assertLessEqual((ship.get_pos() - center).length, 1.0 + 1e-9)
+            self.assertEqual(index.position(ship), ship.get_pos())
+
+    def test_station_template_spawns_stations(self):
+        fleet = self.spawn_fleet('defaultstation', 2, self.sector,
+                                 Vector3(0, 0, 0))
+        self.assertTrue(all(isinstance(obj, Station) for obj in fleet))
+
+    def test_fleet_size_is_bounded(self):
+        for count in (0, MAX_FLEET + 1):
+            self.assertRaises(FleetException, spawn_fleet, 'defaultship',
+                              count, self.sector, Vector3(0, 0, 0))
+
+    def test_fleet_is_announced_once(self):
+        self.spawn_fleet('defaultship', 5, self.sector, Vector3(0, 0, 0),
+                         prefix='Wing')
+        messages = standins.CHANNELS[announce.CHANNEL_KEY]
+        self.assertEqual(len(messages), 1)
+        self.assertIn('Wing 1 to Wing 5', messages[0])
+
+    def test_quiet_fleet_is_not_announced(self):
+        self.spawn_fleet('defaultship', 2, self.sector, Vector3(0, 0, 0),
+                         quiet=True)
+        self.assertNotIn(announce.CHANNEL_KEY, standins.CHANNELS)
@@ -0,0 +1,31 @@
+import unittest
+# Installs the stand-ins; horizon reads its settings from django.conf.
+from world.space.tests import support
+from world.space import horizon
+from world.space.motion import LIGHT_SPEED
+
+
+class TestCrossing(unittest.TestCase):
+
+    def setUp(self):
+        # Stationary, with a sensor range of one light second.
+        self.observer = horizon.Track((0, 0, 0), power=1.0, scale=1.0)
+
+    def test_linear_crossing_lands_past_the_boundary(self):
+        contact = horizon.Track((0, 0, 0), (0.0, (-5, 0, 0), (1, 0, 0),
+                                            LIGHT_SPEED, 0.0, 0.0))
+        found = horizon.crossing(self.observer, contact, 0.0)
+        self.assertAlmostEqual(found, 4.0 + horizon.PRECISION, places=6)
+        self.assertLess(horizon._gap(self.observer, contact, found), 0)
+        found = horizon.crossing(self.observer, contact, found)
+        self.assertAlmostEqual(found, 6.0 + horizon.PRECISION, places=6)
+        self.assertGreater(horizon._gap(self.observer, contact, found), 0)
+
+    def test_brief_pass_while_accelerating(self):
+        # In range for about 0.9 seconds, between two whole seconds.
+        contact = horizon.Track((0, 0, 0), (0.0, (-5, 0.9, 0), (1, 0, 0),
+                                            1.5 * LIGHT_SPEED, 1.0, 30.0))
+        found = horizon.crossing(self.observer, contact, 0.0)
+        self.assertIsNotNone(found)
+        self.assertAlmostEqual(found, 3.04, places=1)
+        self.assertLess(horizon._gap(self.observer, contact, found), 0)
@@ -0,0 +1,46 @@
+from world.space.tests.support import SpaceTestCase
+from typeclasses.objects import Object
+from world.space import interest, spatial, systems
+from world.space.contacts import get_contacts
+from world.space.utils import Vector3
+
+
+class TestInterest(SpaceTestCase):
+
+    def setUp(self):
+        super(TestInterest, self).setUp()
+        self.home = Object('Home')
+        self.addCleanup(spatial.drop_index, self.home)
+        self.addCleanup(interest.drop_sector, self.home)
+
+    def test_watched_ship_keeps_its_sector_awake(self):
+        ship, = self.spawn(1, watched=False)
+        self.assertFalse(interest.sector_awake(self.sector))
+        interest.watch(ship)
+        self.assertTrue(interest.sector_awake(self.sector))
+        interest.unwatch(ship)
+        self.assertFalse(interest.sector_awake(self.sector))
+
+    def test_reset_moves_interest_home(self):
+        ship, = self.spawn(1)
+        ship.home = self.home
+        self.assertTrue(interest.sector_awake(self.sector))
+        self.assertFalse(interest.sector_awake(self.home))
+        ship.reset()
+        self.assertEqual(ship.location, self.home)
+        self.assertFalse(interest.sector_awake(self.sector))
+        self.assertTrue(interest.sector_awake(self.home))
+        self.assertEqual(spatial.get_index(self.home).position(ship),
+                         Vector3(0, 0, 0))
+        self.assertIsNone(spatial.get_index(self.sector).position(ship))
+
+    def test_reset_drops_contacts_left_behind(self):
+        a, b = self.spawn(2)
+        systems.UpdatePosition(a, Vector3(0.01, 0, 0))
+        systems.UpdatePosition(b, Vector3(0.02, 0, 0))
+        systems.UpdateSensors(a)
+        systems.UpdateSensors(b)
+        self.assertIn(b, get_contacts(a).objects())
+        b.home = self.home
+        b.reset()
+        self.assertNotIn(b, get_contacts(a).objects())
@@ -0,0 +1,41 @@
+from world.space.tests.support import SpaceTestCase, START
+from world.space import power, systems
+
+
+class TestPower(SpaceTestCase):
+
+    def events(self, system, at):
+        """Drive `system` the way UpdatePower does, from time `at` until it
+        settles. Returns (seconds after `at`, event) pairs."""
+        start = at
+        events = []
+        due = power.plan([system], 1.0, at)
+        while due is not None:
+            events.extend((round(due - start, 6), event)
+                          for _, event in power.settle([system], due))
+            due = power.plan([system], 1.0, due)
+        return events
+
+    def test_ramp_crosses_minimum_both_ways(self):
+        ship, = self.spawn(1)
+        sensors = ship.systems.sensors
+        sensors.max_power = 10.0
+        sensors.min_power = 5.0
+        sensors.current_power = 10.0
+        sensors.set_power = 0.0
+        self.assertEqual(self.events(sensors, START),
+                         [(5.0, 'offline'), (10.0, 'done')])
+        sensors.set_power = 10.0
+        self.assertEqual(self.events(sensors, START),
+                         [(5.0, 'online'), (10.0, 'done')])
+
+    def test_update_power_notifies_at_event_times(self):
+        ship, = self.spawn(1)
+        sent = self.notices(ship)
+        sensors = ship.systems.sensors
+        sensors.set_power = sensors.min_power / 2.0
+        systems.UpdatePower(ship)
+        self.advance(START + 600)
+        self.assertEqual(sensors.current_power, sensors.set_power)
+        self.assertFalse(self.engine.is_subscribed(ship, 'power'))
+        self.assertTrue(any(msg.endswith('offline.') for _, msg in sent))
@@ -0,0 +1,91 @@
+import os
+import random
+import shutil
+import tempfile
+from world.space.tests.support import SpaceTestCase, START
+from world.space import benchmark, snapshot, state
+
+
+class _Logger(object):
+    """Keeps what the snapshot logs instead of printing it."""
+    def __init__(self):
+        self.messages = []
+
+    def log_info(self, message):
+        self.messages.append(message)
+
+    log_trace = log_info
+
+
+class TestSnapshot(SpaceTestCase):
+
+    def setUp(self):
+        super(TestSnapshot, self).setUp()
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'space.snapshot')
+        self.logger, snapshot.logger = snapshot.logger, _Logger()
+
+    def tearDown(self):
+        snapshot.logger = self.logger
+        super(TestSnapshot, self).tearDown()
+        shutil.rmtree(self.folder)
+
+    def restart(self, ships):
+        """Drop every cached state, as a reload does."""
+        for ship in ships:
+            for name in ('state', 'systems'):
+                ship.__dict__.pop(name, None)
+        snapshot._LIVE.clear()
+        snapshot.close()
+        snapshot._VALID[0] = False
+
+    def test_round_trip(self):
+        ships = self.spawn(20)
+        benchmark.drive(ships, random.Random(1))
+        self.advance(START + 10)
+        state.flush_all()
+        self.assertEqual(snapshot.save(self.path), len(ships))
+        expected = dict((ship.id, (ship.get_pos(), ship.speed(), ship.heading(),
+                                   ship.systems.snapshot())) for ship in ships)
+        self.restart(ships)
+        self.assertEqual(snapshot.restore(self.path), len(ships))
+        for ship in ships:
+            pos, speed, heading, stored = expected[ship.id]
+            self.assertEqual(ship.get_pos(), pos)
+            self.assertEqual(ship.speed(), speed)
+            self.assertEqual(ship.heading(), heading)
+            self.assertEqual(ship.systems.snapshot(), stored)
+        self.assertEqual(
+            dict((phase, set(members))
+                 for phase, members in snapshot.registry().items() if members),
+            dict((phase, set(members))
+                 for phase, members in self.engine.phases.items() if members))
+
+    def test_untouched_spaceobjs_carry_over(self):
+        ships = self.spawn(5)
+        state.flush_all()
+        snapshot.save(self.path)
+        self.restart(ships)
+        snapshot.restore(self.path)
+        ships[0].state.speed = 7.0
+        state.flush_all()
+        self.assertEqual(snapshot.save(self.path), len(ships))
+        self.restart(ships)
+        self.assertEqual(snapshot.restore(self.path), len(ships))
+        self.assertEqual(ships[0].speed(), 7.0)
+
+    def test_stale_snapshot_is_not_restored(self):
+        ship, = self.spawn(1)
+        state.flush_all()
+        self.assertEqual(snapshot.save(self.path), 1)
+        ship.state.speed = 3.0
+        state.flush_all()
+        self.assertEqual(snapshot.restore(self.path), 0)
+        self.assertIn('older than the database', snapshot.logger.messages[-1])
+
+    def test_missing_or_corrupt_file_is_not_restored(self):
+        self.assertEqual(snapshot.restore(self.path), 0)
+        with open(self.path, 'wb') as handle:
+            handle.write(b'not a snapshot at all, just some bytes')
+        self.assertEqual(snapshot.restore(self.path), 0)
+        self.assertIn('could not read', snapshot.logger.messages[-1])
@@ -0,0 +1,31 @@
+from world.space.tests.support import SpaceTestCase, START
+from world.space import turns
+
+
+class TestTurns(SpaceTestCase):
+
+    def test_heading_is_interpolated_until_the_turn_completes(self):
+        ship, = self.spawn(1)
+        sent = self.notices(ship)
+        ship.setheading((90, 0))
+        finish = START + 90 / turns.TURN_RATE
+        self.advance(START + 4)
+        self.assertEqual(ship.heading(), [4 * turns.TURN_RATE, 0.0])
+        self.assertTrue(self.engine.is_subscribed(ship, 'heading'))
+        self.advance(finish + 1)
+        self.assertEqual(ship.heading(), [90.0, 0.0])
+        self.assertIsNone(ship.state.turn)
+        self.assertFalse(self.engine.is_subscribed(ship, 'heading'))
+        done = [at for at, msg in sent if msg.startswith('Now heading')]
+        self.assertEqual(len(done), 1)
+        self.assertAlmostEqual(done[0], finish)
+
+    def test_new_heading_replans_from_the_turn_in_progress(self):
+        ship, = self.spawn(1)
+        ship.setheading((90, 0))
+        self.advance(START + 3)
+        ship.setheading((0, 0))
+        self.assertEqual(ship.heading(), [30.0, 0.0])
+        self.advance(START + 3 + 30 / turns.TURN_RATE + 1)
+        self.assertEqual(ship.heading(), [0.0, 0.0])
+        self.assertIsNone(ship.state.turn)
@@ -0,0 +1,41 @@
+import random
+import unittest
+from world.space import motion
+from world.space.utils import (Vector3, add_scaled_all, distances_from,
+                               offsets_from)
+
+
+class TestVector3(unittest.TestCase):
+
+    def test_add_scaled_is_in_place(self):
+        v = Vector3(1, 2, 3)
+        self.assertIs(v.add_scaled((1, -1, 0.5), 2), v)
+        self.assertEqual(v, Vector3(3, 0, 4))
+        self.assertEqual(v.add_scaled(Vector3(1, 1, 1), -3), Vector3(0, -3, 1))
+
+    def test_batch_helpers_match_one_at_a_time(self):
+        rng = random.Random(0)
+        origin = (rng.uniform(-9, 9), rng.uniform(-9, 9), rng.uniform(-9, 9))
+        points = [Vector3(rng.uniform(-9, 9), rng.uniform(-9, 9), rng.uniform(-9, 9))
+                  for i in range(20)]
+        self.assertEqual(distances_from(origin, points),
+                         [(point - Vector3(origin)).length for point in points])
+        self.assertEqual(offsets_from(origin, points),
+                         [tuple(point - Vector3(origin)) for point in points])
+        scalars = [rng.uniform(-1, 1) for point in points]
+        vectors = [Vector3(origin) for point in points]
+        add_scaled_all(vectors, points, scalars)
+        self.assertEqual(vectors, [Vector3(origin) + point * k
+                                   for point, k in zip(points, scalars)])
+
+
+class TestMotion(unittest.TestCase):
+
+    def test_positions_at_matches_position_at(self):
+        rng = random.Random(0)
+        segments = [motion.plan((rng.uniform(-1, 1), 0, 0), (0.6, 0.8, 0),
+                                rng.uniform(0, 50), rng.uniform(0, 100), 100, 0.0)
+                    for i in range(20)]
+        for at in (0.0, 3.0, 30.0):
+            self.assertEqual(motion.positions_at(segments, at),
+                             [motion.position_at(segment, at) for segment in segments])
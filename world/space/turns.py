@@ -0,0 +1,87 @@
+"""
+Turns
+
+Analytic model of a spaceobj changing heading. A turn is stored as one
+record - start time, start heading, target heading and turn rate - and the
+heading at any moment is interpolated from it on demand, so nothing has to
+step the heading while the ship comes about. Yaw and pitch each take the
+short way round and move together, so the ship sweeps a straight line
+through (xy, z) at `rate` degrees per second.
+
+The record lives in `SpaceObject.state.turn`:
+    (start_time, start_xy, start_z, target_xy, target_z, rate)
+
+UpdateHeading in world/space/systems.py starts turns and asks the engine to
+wake it once, when the turn is complete.
+"""
+from math import sqrt
+
+# Degrees per second; hardcoded until ships get a turn rate of their own.
+TURN_RATE = 10.0
+# Headings closer than this (in degrees) count as already reached.
+TOLERANCE = 0.5
+
+
+def _delta(start, target):
+    """Signed short-way-round difference from `start` to `target`."""
+    return (target - start + 180) % 360 - 180
+
+
+def plan(heading, target, at, rate=TURN_RATE):
+    """Start a turn from `heading` to `target` at time `at`.
+    Args:
+        heading (sequence): current [xy, z] heading
+        target (sequence): desired [xy, z] heading
+        at (float): time the turn starts
+        rate (float): turn rate in degrees per second
+    Returns:
+        (tuple or None): the turn record, or None if `heading` is already
+        within TOLERANCE of `target`
+    """
+    xy, z = heading
+    txy, tz = target
+    dxy = _delta(xy, txy)
+    dz = _delta(z, tz)
+    if dxy * dxy + dz * dz < TOLERANCE * TOLERANCE:
+        return None
+    return (at, xy, z, txy, tz, float(rate))
+
+
+def duration(turn):
+    """Seconds the turn takes from its start."""
+    at, xy, z, txy, tz, rate = turn
+    dxy = _delta(xy, txy)
+    dz = _delta(z, tz)
+    return sqrt(dxy * dxy + dz * dz) / rate
+
+
+def finish(turn):
+    """Time the turn is complete."""
+    return turn[0] + duration(turn)
+
+
+def heading_at(turn, at):
+    """Heading [xy, z] under `turn` at time `at`."""
+    start, xy, z, txy, tz, rate = turn
+    total = duration(turn)
+    elapsed = at - start
+    if elapsed >= total:
+        return [txy, tz]
+    if elapsed <= 0:
+        return [xy, z]
+    part = elapsed / total
+    return [round((xy + _delta(xy, txy) * part) % 360, 2),
+            round(z + _delta(z, tz) * part, 2)]
+
+
+def describe(turn):
+    """Words for what the ship is doing, e.g. 'turn port and pitch up'."""
+    at, xy, z, txy, tz, rate = turn
+    dxy = _delta(xy, txy)
+    dz = _delta(z, tz)
+    moves = []
+    if dxy:
+        moves.append('turn starboard' if dxy > 0 else 'turn port')
+    if dz:
+        moves.append('pitch up' if dz > 0 else 'pitch down')
+    return ' and '.join(moves)
@@ -1,5 +1,13 @@
 from math import *
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Contact counts at which solve_contacts switches to NumPy, when available.
+BATCH_MIN = 32
+
 def format_speed(speed):
     kps = 1
     Mmps = 1000
@@ -77,6 +85,110 @@ def get_zang(p1, p2):
     z1 = p2[2]
     return atan2(r1 - r0, z1 - z0)
 
+#------------------------------------------------------------
+#
+# round_half - Rounds half away from zero, as round() does on
+# Python 2. Python 3's round() and numpy.round() round half to
+# even, and not always the same way, so bearings use this on
+# every interpreter and _round_half_np in the NumPy path.
+#
+#------------------------------------------------------------
+
+def round_half(value, places=0):
+    scale = 10.0 ** places
+    return copysign(floor(abs(value) * scale + 0.5), value) / scale
+
+
+def _round_half_np(values, places=0):
+    scale = 10.0 ** places
+    return np.copysign(np.floor(np.abs(values) * scale + 0.5), values) / scale
+
+#------------------------------------------------------------
+#
+# bearing_between - Bearing [xyang, zang] in degrees from p1 to
+# p2, relative to the given heading. Works straight off the
+# coordinates, so no intermediate vector is built.
+#
+#------------------------------------------------------------
+
+def bearing_between(p1, p2, xyhead=0, zhead=0):
+    ax, ay, az = p1
+    bx, by, bz = p2
+    x = round_half(bx - ax, 4)
+    y = round_half(by - ay, 4)
+    z = round_half(bz - az, 4)
+    xyang = (round_half(degrees(atan2(x, y)), 2) - xyhead) % 360
+    if xyang > 180:
+        xyang -= 360
+    zang = (round_half(degrees(atan2(z, sqrt(x * x + y * y))), 2) - zhead) % 360
+    if zang > 180:
+        zang -= 360
+    return [xyang, zang]
+
+#------------------------------------------------------------
+#
+# solve_contacts - Range, bearing and relative velocity from an
+# observer at origin to every point. Ranges and velocities come
+# from the batch helpers and bearings from bearing_between, or
+# all of it in NumPy for larger batches; velocities are in the
+# same units as given.
+#
+#------------------------------------------------------------
+
+def solve_contacts(origin, heading, velocity, points, velocities):
+    """
+    Args:
+        origin (sequence): observer x, y, z
+        heading (sequence): observer [xyhead, zhead] in degrees
+        velocity (sequence): observer vx, vy, vz
+        points (list): contact positions
+        velocities (list): contact velocities, parallel to points
+    Returns:
+        (tuple): (ranges, bearings, relative velocities) lists, parallel
+        to points
+    """
+    if not points:
+        return [], [], []
+    if np is not None and len(points) >= BATCH_MIN:
+        return _solve_contacts_np(origin, heading, velocity, points, velocities)
+    xyhead, zhead = heading
+    bearings = [bearing_between(origin, point, xyhead, zhead) for point in points]
+    return (distances_from(origin, points), bearings,
+            offsets_from(velocity, velocities))
+
+
+def rank_contacts(origin, heading, velocity, points, velocities, sort=True):
+    """
+    solve_contacts, optionally ordered by increasing range.
+    Returns:
+        (tuple): (order, ranges, bearings, relative velocities), where
+        order lists the indexes into points in result order
+    """
+    ranges, bearings, relative = solve_contacts(origin, heading, velocity,
+                                                points, velocities)
+    order = list(range(len(points)))
+    if sort and points:
+        order.sort(key=ranges.__getitem__)
+        ranges = [ranges[i] for i in order]
+        bearings = [bearings[i] for i in order]
+        relative = [relative[i] for i in order]
+    return order, ranges, bearings, relative
+
+
+def _solve_contacts_np(origin, heading, velocity, points, velocities):
+    xyhead, zhead = heading
+    d = np.asarray([tuple(p) for p in points], dtype=float) - tuple(origin)
+    ranges = np.sqrt((d * d).sum(axis=1))
+    # bearing_between, step for step.
+    x, y, z = _round_half_np(d, 4).T
+    xyang = (_round_half_np(np.degrees(np.arctan2(x, y)), 2) - xyhead) % 360
+    xyang[xyang > 180] -= 360
+    zang = (_round_half_np(np.degrees(np.arctan2(z, np.sqrt(x * x + y * y))), 2) - zhead) % 360
+    zang[zang > 180] -= 360
+    relative = np.asarray([tuple(v) for v in velocities], dtype=float) - tuple(velocity)
+    bearings = [list(b) for b in zip(xyang.tolist(), zang.tolist())]
+    return ranges.tolist(), bearings, [tuple(v) for v in relative.tolist()]
+
 #------------------------------------------------------------
 #
 # head2course - Converts <xyhead> and <zhead> degrees into
@@ -104,11 +216,17 @@ def head2course(xyhead, zhead):
 #
 # Vector3 - Creates a 3D vector for space objects.
 #
+# Components live in three float slots rather than a list, so
+# a vector is one small object and component access is a plain
+# attribute read. The in-place methods (add_scaled, __iadd__,
+# scale, ...) never allocate; prefer them in code that runs
+# every tick, and the batch helpers below for many vectors.
+#
 #------------------------------------------------------------
 
 class Vector3(object):
 
-    __slots__ = ('_v',)
+    __slots__ = ('_x', '_y', '_z')
 
     _gameobjects_vector = 3
 
@@ -117,24 +235,35 @@ class Vector3(object):
         containing at least 3 values. No arguments result in a null vector.
         """
         if len(args) == 3:
-            self._v = list(map(float, args[:3]))
-            return
-
-        if not args:
-            self._v = [0., 0., 0.]
+            x, y, z = args
+        elif not args:
+            x = y = z = 0.
         elif len(args) == 1:
-            self._v = list(map(float, args[0][:3]))
+            x, y, z = args[0][:3]
         else:
             raise ValueError("Vector3.__init__ takes 0, 1 or 3 parameters")
+        self._x = float(x)
+        self._y = float(y)
+        self._z = float(z)
+
+    def __getstate__(self):
+        return (self._x, self._y, self._z)
+
+    def __setstate__(self, state):
+        if len(state) == 2:
+            # Pickles from the old list-backed Vector3: (None, {'_v': [...]})
+            state = state[1]['_v']
+        self._x, self._y, self._z = state
 
     @classmethod
     def from_points(cls, p1, p2):
 
-        v = cls.__new__(cls, object)
+        v = cls.__new__(cls)
         ax, ay, az = p1
         bx, by, bz = p2
-        v._v = [round(bx - ax,4), round(by - ay,4), round(bz - az,4)]
-
+        v._x = round(bx - ax, 4)
+        v._y = round(by - ay, 4)
+        v._z = round(bz - az, 4)
         return v
 
     @classmethod
@@ -143,88 +272,85 @@ class Vector3(object):
         Warning: There is no checking (for efficiency) here: x, y, z _must_ be
         floats.
         """
-        v = cls.__new__(cls, object)
-        v._v = [round(x,6), round(y,6), round(z,6)]
+        v = cls.__new__(cls)
+        v._x = x
+        v._y = y
+        v._z = z
         return v
 
     @classmethod
     def from_iter(cls, iterable):
         """Creates a Vector3 from an iterable containing at least 3 values."""
         next = iter(iterable).__next__
-        v = cls.__new__(cls, object)
-        v._v = [float(next()), float(next()), float(next())]
+        v = cls.__new__(cls)
+        v._x = float(next())
+        v._y = float(next())
+        v._z = float(next())
         return v
 
     @classmethod
     def _from_float_sequence(cls, sequence):
-        v = cls.__new__(cls, object)
-        v._v = list(sequence[:3])
+        v = cls.__new__(cls)
+        v._x, v._y, v._z = sequence[:3]
         return v
 
     def copy(self):
         """Returns a copy of this vector."""
 
-        v = self.__new__(self.__class__, object)
-        v._v = self._v[:]
+        v = self.__new__(self.__class__)
+        v._x = self._x
+        v._y = self._y
+        v._z = self._z
         return v
-        # return self.from_floats(self._v[0], self._v[1], self._v[2])
 
     __copy__ = copy
 
     def _get_x(self):
-        return self._v[0]
+        return self._x
 
     def _set_x(self, x):
         try:
-            self._v[0] = 1.0 * x
+            self._x = 1.0 * x
         except:
             raise TypeError("Must be a number")
     x = property(_get_x, _set_x, None, "x component.")
 
     def _get_y(self):
-        return self._v[1]
+        return self._y
 
     def _set_y(self, y):
         try:
-            self._v[1] = 1.0 * y
+            self._y = 1.0 * y
         except:
             raise TypeError("Must be a number")
     y = property(_get_y, _set_y, None, "y component.")
 
     def _get_z(self):
-        return self._v[2]
+        return self._z
 
     def _set_z(self, z):
         try:
-            self._v[2] = 1.0 * z
+            self._z = 1.0 * z
         except:
             raise TypeError("Must be a number")
     z = property(_get_z, _set_z, None, "z component.")
 
     def _get_length(self):
-        x, y, z = self._v
+        x = self._x
+        y = self._y
+        z = self._z
         return sqrt(x * x + y * y + z * z)
 
     def _set_length(self, length):
-        v = self._v
-        try:
-            x, y, z = v
-            l = length / sqrt(x * x + y * y + z * z)
-        except ZeroDivisionError:
-            v[0] = 0.
-            v[1] = 0.
-            v[2] = 0.
-            return self
-
-        v[0] = x * l
-        v[1] = y * l
-        v[2] = z * l
+        self.set_length(length)
 
     length = property(_get_length, _set_length, None, "Length of the vector")
 
     def unit(self):
         """Returns a unit vector."""
-        x, y, z = self._v
+        x = self._x
+        y = self._y
+        z = self._z
         l = sqrt(x * x + y * y + z * z)
         return self.from_floats(x / l, y / l, z / l)
 
@@ -234,27 +360,33 @@ class Vector3(object):
         y -- y component
         z -- z component
         """
-
-        v = self._v
         try:
-            v[0] = x * 1.0
-            v[1] = y * 1.0
-            v[2] = z * 1.0
+            self._x = x * 1.0
+            self._y = y * 1.0
+            self._z = z * 1.0
         except TypeError:
             raise TypeError("Must be a number")
         return self
 
+    def add_scaled(self, other, k):
+        """Adds other * k to this vector in place, without building the
+        intermediate vector. Equivalent to v += Vector3(other) * k.
+        other -- Vector or sequence of 3 values
+        k -- Scalar multiplier
+        """
+        ox, oy, oz = other
+        self._x += ox * k
+        self._y += oy * k
+        self._z += oz * k
+        return self
+
     def __str__(self):
 
-        x, y, z = self._v
-        return "(%s, %s, %s)" % (x,
-                                 y,
-                                 z)
+        return "(%s, %s, %s)" % (self._x, self._y, self._z)
 
     def __repr__(self):
 
-        x, y, z = self._v
-        return "Vector3(%s, %s, %s)" % (x, y, z)
+        return "Vector3(%s, %s, %s)" % (self._x, self._y, self._z)
 
     def __len__(self):
 
@@ -262,14 +394,14 @@ class Vector3(object):
 
     def __iter__(self):
         """Iterates the components in x, y, z order."""
-        return iter(self._v[:])
+        return iter((self._x, self._y, self._z))
 
     def __getitem__(self, index):
         """Retrieves a component, given its index.
         index -- 0, 1 or 2 for x, y or z
         """
         try:
-            return self._v[index]
+            return (self._x, self._y, self._z)[index]
         except IndexError:
             raise IndexError(
                 "There are 3 values in this object, index should be 0, 1 or 2!")
@@ -279,225 +411,197 @@ class Vector3(object):
         index -- 0, 1 or 2 for x, y or z
         value -- New (float) value of component
         """
-
         try:
-            self._v[index] = 1.0 * value
-        except IndexError:
-            raise IndexError(
-                "There are 3 values in this object, index should be 0, 1 or 2!")
+            value = 1.0 * value
         except TypeError:
             raise TypeError("Must be a number")
+        if index < 0:
+            index += 3
+        if index == 0:
+            self._x = value
+        elif index == 1:
+            self._y = value
+        elif index == 2:
+            self._z = value
+        else:
+            raise IndexError(
+                "There are 3 values in this object, index should be 0, 1 or 2!")
 
     def __eq__(self, rhs):
         """Test for equality
         rhs -- Vector or sequence of 3 values
         """
-
-        x, y, z = self._v
-        xx, yy, zz = rhs
-        return x == xx and y == yy and z == zz
+        try:
+            xx, yy, zz = rhs
+        except (TypeError, ValueError):
+            return False
+        return self._x == xx and self._y == yy and self._z == zz
 
     def __ne__(self, rhs):
         """Test of inequality
         rhs -- Vector or sequenece of 3 values
         """
-
-        x, y, z = self._v
-        xx, yy, zz = rhs
-        return x != xx or y != yy or z != zz
+        return not self.__eq__(rhs)
 
     def __hash__(self):
 
-        return hash(self._v)
+        return hash((self._x, self._y, self._z))
 
     def __add__(self, rhs):
         """Returns the result of adding a vector (or collection of 3 numbers)
         from this vector.
-        rhs -- Vector or sequence of 2 values
+        rhs -- Vector or sequence of 3 values
         """
-
-        x, y, z = self._v
         ox, oy, oz = rhs
-        return self.from_floats(x + ox, y + oy, z + oz)
+        return self.from_floats(self._x + ox, self._y + oy, self._z + oz)
 
     def __iadd__(self, rhs):
         """Adds another vector (or a collection of 3 numbers) to this vector.
-        rhs -- Vector or sequence of 2 values
+        rhs -- Vector or sequence of 3 values
         """
         ox, oy, oz = rhs
-        v = self._v
-        v[0] += ox
-        v[1] += oy
-        v[2] += oz
+        self._x += ox
+        self._y += oy
+        self._z += oz
         return self
 
     def __radd__(self, lhs):
         """Adds vector to this vector (right version)
         lhs -- Left hand side vector or sequence
         """
-
-        x, y, z = self._v
+        if lhs == 0:
+            # Lets sum() start from its default of 0.
+            return self.copy()
         ox, oy, oz = lhs
-        return self.from_floats(x + ox, y + oy, z + oz)
+        return self.from_floats(self._x + ox, self._y + oy, self._z + oz)
 
     def __sub__(self, rhs):
         """Returns the result of subtracting a vector (or collection of
         3 numbers) from this vector.
         rhs -- 3 values
         """
-
-        x, y, z = self._v
         ox, oy, oz = rhs
-        return self.from_floats(x - ox, y - oy, z - oz)
+        return self.from_floats(self._x - ox, self._y - oy, self._z - oz)
 
-    def _isub__(self, rhs):
+    def __isub__(self, rhs):
         """Subtracts another vector (or a collection of 3 numbers) from this
         vector.
         rhs -- Vector or sequence of 3 values
         """
-
         ox, oy, oz = rhs
-        v = self._v
-        v[0] -= ox
-        v[1] -= oy
-        v[2] -= oz
+        self._x -= ox
+        self._y -= oy
+        self._z -= oz
         return self
 
+    _isub__ = __isub__
+
     def __rsub__(self, lhs):
         """Subtracts a vector (right version)
         lhs -- Left hand side vector or sequence
         """
-
-        x, y, z = self._v
         ox, oy, oz = lhs
-        return self.from_floats(ox - x, oy - y, oz - z)
+        return self.from_floats(ox - self._x, oy - self._y, oz - self._z)
 
     def scalar_mul(self, scalar):
 
-        v = self._v
-        v[0] *= scalar
-        v[1] *= scalar
-        v[2] *= scalar
+        self._x *= scalar
+        self._y *= scalar
+        self._z *= scalar
 
     def vector_mul(self, vector):
 
         x, y, z = vector
-        v = self._v
-        v[0] *= x
-        v[1] *= y
-        v[2] *= z
+        self._x *= x
+        self._y *= y
+        self._z *= z
 
     def get_scalar_mul(self, scalar):
 
-        x, y, z = self._v
-        return self.from_floats(x * scalar, y * scalar, z * scalar)
+        return self.from_floats(self._x * scalar, self._y * scalar, self._z * scalar)
 
     def get_vector_mul(self, vector):
 
-        x, y, z = self._v
         xx, yy, zz = vector
-        return self.from_floats(x * xx, y * yy, z * zz)
+        return self.from_floats(self._x * xx, self._y * yy, self._z * zz)
 
     def __mul__(self, rhs):
         """Return the result of multiplying this vector by another vector, or
         a scalar (single number).
         rhs -- Vector, sequence or single value.
         """
-
-        x, y, z = self._v
         if hasattr(rhs, "__getitem__"):
             ox, oy, oz = rhs
-            return self.from_floats(x * ox, y * oy, z * oz)
+            return self.from_floats(self._x * ox, self._y * oy, self._z * oz)
         else:
-            return self.from_floats(x * rhs, y * rhs, z * rhs)
+            return self.from_floats(self._x * rhs, self._y * rhs, self._z * rhs)
 
     def __imul__(self, rhs):
         """Multiply this vector by another vector, or a scalar
         (single number).
         rhs -- Vector, sequence or single value.
         """
+        return self.scale(rhs)
 
-        v = self._v
-        if hasattr(rhs, "__getitem__"):
-            ox, oy, oz = rhs
-            v[0] *= ox
-            v[1] *= oy
-            v[2] *= oz
-        else:
-            v[0] *= rhs
-            v[1] *= rhs
-            v[2] *= rhs
-
-        return self
+    __rmul__ = __mul__
 
-    def __rmul__(self, lhs):
-
-        x, y, z = self._v
-        if hasattr(lhs, "__getitem__"):
-            ox, oy, oz = lhs
-            return self.from_floats(x * ox, y * oy, z * oz)
-        else:
-            return self.from_floats(x * lhs, y * lhs, z * lhs)
-
-    def __div__(self, rhs):
+    def __truediv__(self, rhs):
         """Return the result of dividing this vector by another vector, or a scalar (single number)."""
 
-        x, y, z = self._v
         if hasattr(rhs, "__getitem__"):
             ox, oy, oz = rhs
-            return self.from_floats(x / ox, y / oy, z / oz)
+            return self.from_floats(self._x / ox, self._y / oy, self._z / oz)
         else:
-            return self.from_floats(x / rhs, y / rhs, z / rhs)
+            return self.from_floats(self._x / rhs, self._y / rhs, self._z / rhs)
 
-    def __idiv__(self, rhs):
+    def __itruediv__(self, rhs):
         """Divide this vector by another vector, or a scalar (single number)."""
 
-        v = self._v
         if hasattr(rhs, "__getitem__"):
-            v[0] /= ox
-            v[1] /= oy
-            v[2] /= oz
+            ox, oy, oz = rhs
+            self._x /= ox
+            self._y /= oy
+            self._z /= oz
         else:
-            v[0] /= rhs
-            v[1] /= rhs
-            v[2] /= rhs
+            self._x /= rhs
+            self._y /= rhs
+            self._z /= rhs
 
         return self
 
-    def __rdiv__(self, lhs):
+    def __rtruediv__(self, lhs):
 
-        x, y, z = self._v
         if hasattr(lhs, "__getitem__"):
             ox, oy, oz = lhs
-            return self.from_floats(ox / x, oy / y, oz / z)
+            return self.from_floats(ox / self._x, oy / self._y, oz / self._z)
         else:
-            return self.from_floats(lhs / x, lhs / y, lhs / z)
+            return self.from_floats(lhs / self._x, lhs / self._y, lhs / self._z)
+
+    __div__ = __truediv__
+    __idiv__ = __itruediv__
+    __rdiv__ = __rtruediv__
 
     def scalar_div(self, scalar):
 
-        v = self._v
-        v[0] /= scalar
-        v[1] /= scalar
-        v[2] /= scalar
+        self._x /= scalar
+        self._y /= scalar
+        self._z /= scalar
 
     def vector_div(self, vector):
 
         x, y, z = vector
-        v = self._v
-        v[0] /= x
-        v[1] /= y
-        v[2] /= z
+        self._x /= x
+        self._y /= y
+        self._z /= z
 
     def get_scalar_div(self, scalar):
 
-        x, y, z = self.scalar
-        return self.from_floats(x / scalar, y / scalar, z / scalar)
+        return self.from_floats(self._x / scalar, self._y / scalar, self._z / scalar)
 
     def get_vector_div(self, vector):
 
-        x, y, z = self._v
         xx, yy, zz = vector
-        return self.from_floats(x / xx, y / yy, z / zz)
+        return self.from_floats(self._x / xx, self._y / yy, self._z / zz)
 
     def __neg__(self):
         """Returns the negation of this vector (a vector pointing in the opposite direction.
@@ -505,8 +609,7 @@ class Vector3(object):
         print -v1
         >>> (-1,-2,-3)
         """
-        x, y, z = self._v
-        return self.from_floats(-x, -y, -z)
+        return self.from_floats(-self._x, -self._y, -self._z)
 
     def __pos__(self):
 
@@ -514,8 +617,9 @@ class Vector3(object):
 
     def __bool__(self):
 
-        x, y, z = self._v
-        return bool(x or y or z)
+        return bool(self._x or self._y or self._z)
+
+    __nonzero__ = __bool__
 
     def __call__(self, keys):
         """Returns a tuple of the values in a vector
@@ -524,37 +628,38 @@ class Vector3(object):
         v('zyx') -> (3.0, 2.0, 1.0)
         """
         ord_x = ord('x')
-        v = self._v
+        v = (self._x, self._y, self._z)
         return tuple(v[ord(c) - ord_x] for c in keys)
 
     def as_tuple(self):
         """Returns a tuple of the x, y, z components. A little quicker than
         tuple(vector)."""
 
-        return tuple(self._v)
+        return (self._x, self._y, self._z)
 
     def scale(self, scale):
         """Scales the vector by onther vector or a scalar. Same as the
         *= operator.
         scale -- Value to scale the vector by
         """
-        v = self._v
         if hasattr(scale, "__getitem__"):
             ox, oy, oz = scale
-            v[0] *= ox
-            v[1] *= oy
-            v[2] *= oz
+            self._x *= ox
+            self._y *= oy
+            self._z *= oz
         else:
-            v[0] *= scale
-            v[1] *= scale
-            v[2] *= scale
+            self._x *= scale
+            self._y *= scale
+            self._z *= scale
 
         return self
 
     def get_length(self):
         """Calculates the length of the vector."""
 
-        x, y, z = self._v
+        x = self._x
+        y = self._y
+        z = self._z
         return sqrt(x * x + y * y + z * z)
     get_magnitude = get_length
 
@@ -562,19 +667,18 @@ class Vector3(object):
         """Sets the length of the vector. (Normalizes it then scales it)
         new_length -- The new length of the vector.
         """
-        v = self._v
+        x = self._x
+        y = self._y
+        z = self._z
         try:
-            x, y, z = v
             l = new_length / sqrt(x * x + y * y + z * z)
         except ZeroDivisionError:
-            v[0] = 0.0
-            v[1] = 0.0
-            v[2] = 0.0
+            self._x = self._y = self._z = 0.0
             return self
 
-        v[0] = x * l
-        v[1] = y * l
-        v[2] = z * l
+        self._x = x * l
+        self._y = y * l
+        self._z = z * l
 
         return self
 
@@ -582,73 +686,66 @@ class Vector3(object):
         """Returns the distance of this vector to a point.
         p -- A position as a vector, or collection of 3 values.
         """
-        ax, ay, az = self._v
         bx, by, bz = p
-        dx = ax - bx
-        dy = ay - by
-        dz = az - bz
+        dx = self._x - bx
+        dy = self._y - by
+        dz = self._z - bz
         return sqrt(dx * dx + dy * dy + dz * dz)
 
     def get_distance_to_squared(self, p):
         """Returns the squared distance of this vector to a point.
         p -- A position as a vector, or collection of 3 values.
         """
-        ax, ay, az = self._v
         bx, by, bz = p
-        dx = ax - bx
-        dy = ay - by
-        dz = az - bz
+        dx = self._x - bx
+        dy = self._y - by
+        dz = self._z - bz
         return dx * dx + dy * dy + dz * dz
 
     def normalize(self):
         """Scales the vector to be length 1."""
-        v = self._v
-        x, y, z = v
+        x = self._x
+        y = self._y
+        z = self._z
         l = sqrt(x * x + y * y + z * z)
         try:
-            v[0] /= l
-            v[1] /= l
-            v[2] /= l
+            self._x = x / l
+            self._y = y / l
+            self._z = z / l
         except ZeroDivisionError:
-            v[0] = 0.0
-            v[1] = 0.0
-            v[2] = 0.0
+            self._x = self._y = self._z = 0.0
         return self
 
     def get_normalized(self):
 
-        x, y, z = self._v
+        x = self._x
+        y = self._y
+        z = self._z
         l = sqrt(x * x + y * y + z * z)
         try:
             return self.from_floats(x / l, y / l, z / l)
         except ZeroDivisionError:
-            return self.from_floats(0, 0, 0)
+            return self.from_floats(0., 0., 0.)
 
     def in_sphere(self, sphere):
         """Returns true if this vector (treated as a position) is contained in
         the given sphere.
         """
 
-        return distance3d(sphere.position, self) <= sphere.radius
+        return self.get_distance_to(sphere.position) <= sphere.radius
 
     def dot(self, other):
         """Returns the dot product of this vector with another.
         other -- A vector or tuple
         """
-        x, y, z = self._v
         ox, oy, oz = other
-        return x * ox + y * oy + z * oz
+        return self._x * ox + self._y * oy + self._z * oz
 
     def cross(self, other):
         """Returns the cross product of this vector with another.
         other -- A vector or tuple
         """
-
-        x, y, z = self._v
-        bx, by, bz = other
-        return self.from_floats(y * bz - by * z,
-                                z * bx - bz * x,
-                                x * by - bx * y)
+        return self.from_floats(*self.cross_tuple(other))
 
     def cross_tuple(self, other):
         """Returns the cross product of this vector with another, as a tuple.
@@ -656,7 +753,9 @@ class Vector3(object):
         other -- A vector or tuple
         """
 
-        x, y, z = self._v
+        x = self._x
+        y = self._y
+        z = self._z
         bx, by, bz = other
         return (y * bz - by * z,
                 z * bx - bz * x,
@@ -666,3 +765,36 @@ class Vector3(object):
 def center3d(points):
 
     return sum(Vector3(p) for p in points) / len(points)
+
+#------------------------------------------------------------
+#
+# Batch helpers - Operate on many vectors at once without
+# building temporaries. Each takes parallel sequences and
+# works element by element.
+#
+#------------------------------------------------------------
+
+def add_scaled_all(vectors, others, scalars):
+    """In place, vectors[i] += others[i] * scalars[i] for every i."""
+    for v, other, k in zip(vectors, others, scalars):
+        v.add_scaled(other, k)
+
+
+def distances_from(origin, points):
+    """Returns a list of distances from origin to each point."""
+    ax, ay, az = origin
+    result = []
+    append = result.append
+    for p in points:
+        bx, by, bz = p
+        dx = bx - ax
+        dy = by - ay
+        dz = bz - az
+        append(sqrt(dx * dx + dy * dy + dz * dz))
+    return result
+
+
+def offsets_from(origin, points):
+    """Returns a list of (dx, dy, dz) tuples from origin to each point."""
+    ax, ay, az = origin
+    return [(bx - ax, by - ay, bz - az) for bx, by, bz in points]